@@ -0,0 +1,38 @@
+"""
+command line entry point
+
+usage:
+	python -m kerbmath serve [--conf kerbol.ini] [--host 127.0.0.1] [--port 8642] [--workers N]
+	python -m kerbmath bench [benchmark options]
+"""
+import sys
+
+def main(args = None):
+	import argparse
+	cli = argparse.ArgumentParser(prog = "python -m kerbmath", description = "Kerbal Space Program mathematics module")
+	commands = cli.add_subparsers(dest = "command", required = True)
+
+	serve = commands.add_parser("serve", help = "run the local JSON-RPC computation server")
+	serve.add_argument("--conf", default = "kerbol.ini", help = "system configuration file (default: kerbol.ini)")
+	serve.add_argument("--host", default = "127.0.0.1", help = "address to listen on (default: 127.0.0.1)")
+	serve.add_argument("--port", type = int, default = 8642, help = "port to listen on; 0 picks a free one (default: 8642)")
+	serve.add_argument("--workers", type = int, default = None, help = "worker processes for simulations (default: one per CPU, 0: none)")
+	serve.add_argument("--window", type = float, default = 0.002, help = "request coalescing window in seconds (default: 0.002)")
+	serve.add_argument("--maxbatch", type = int, default = 4096, help = "orbits per batch that are run without waiting (default: 4096)")
+
+	commands.add_parser("bench", help = "run the benchmark suite (see python -m kerbmath.bench --help)", add_help = False)
+
+	if args == None:
+		args = sys.argv[1:]
+	if args[:1] == ["bench"]:
+		from kerbmath.bench import main as benchmain
+		return benchmain(args[1:])
+
+	args = cli.parse_args(args)
+	if args.command == "serve":
+		from kerbmath.serve import serve
+		serve(args.conf, args.host, args.port, args.workers, args.window, args.maxbatch)
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
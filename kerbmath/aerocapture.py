@@ -0,0 +1,246 @@
+"""
+batched aerocapture simulation
+
+integrates many atmospheric entry cases at once as (N, 6) state arrays,
+optionally spread across a process pool
+"""
+import numpy as np
+
+from kerbmath.util import *
+from kerbmath.integrate import DormandPrince, hermite, crossings
+from kerbmath.trajectory import dragaccel
+from kerbmath.vectorarray import norm
+from kerbmath.elements import stateelements, elementstate
+
+#outcome codes, as stored in the 'outcome' column of the result table
+OUTCOMES = ("captured", "escaped", "crashed", "timeout")
+CAPTURED, ESCAPED, CRASHED, TIMEOUT = range(4)
+
+RESULTDTYPE = np.dtype([
+	("hp", float),
+	("ventry", float),
+	("d", float),
+	("incl", float),
+	("outcome", np.int8),
+	("t", float),
+	("hmin", float),
+	("exitrp", float),
+	("exitra", float),
+	("exitincl", float),
+	("exitomega", float),
+])
+
+class CaptureModel:
+	"""
+	the picklable physical parameters of a body that the simulation needs
+	"""
+	def __init__(self, body, tabulate = None):
+		"""
+		body
+			central body
+		tabulate
+			if not None, the atmosphere is replaced by a lookup table with this many entries
+		"""
+		self.mu = body.mu()
+		self.radius = body.radius
+		self.entryr = body.radius + body.atm.cutoff
+		self.rotrate = 2 * pi / body.rotperiod
+		self.atm = body.atm
+		if tabulate != None:
+			self.atm = self.atm.tabulate(tabulate)
+
+	def accel(self, d):
+		"""
+		d
+			drag coefficients, shape (N,)
+		returns
+			in-place derivative function fun(t, y, out) for states of shape (N, 6)
+		"""
+		return dragaccel(self.mu, self.radius, self.rotrate, self.atm, d)
+
+def simulatechunk(model, y, d, rtol, atol, tmax):
+	"""
+	simulate a chunk of entry cases in one process
+
+	model
+		CaptureModel
+	y
+		entry states, shape (N, 6)
+	d
+		drag coefficients, shape (N,)
+	rtol, atol
+		integration tolerances
+	tmax
+		maximum simulated time per case (s)
+	returns
+		outcome, t, hmin, exit states as arrays
+
+	periapsis passages, exit and impact are located per case within the
+	integration steps, so the results do not depend on the other cases of the chunk
+	"""
+	n = len(y)
+	outcome = np.full(n, TIMEOUT, dtype = np.int8)
+	tend = np.full(n, float(tmax))
+	hmin = norm(y[:, :3]) - model.radius
+	yend = y.copy()
+
+	#indices into the chunk of the cases that are still simulated
+	idx = np.arange(n)
+	solver = DormandPrince(model.accel(d), 0, y, rtol = rtol, atol = atol, inplace = True)
+
+	while len(idx) > 0:
+		t = solver.step(tmax)
+		y0, f0, y1, f1, h = solver.yold, solver.k[0], solver.y, solver.f, solver.hlast
+
+		def interpolation(rows):
+			#the states of some cases at fractions of the last step
+			return hermite(y0[rows], f0[rows], y1[rows], f1[rows], h)
+
+		r1 = norm(y1[:, :3])
+		rdot0 = np.einsum("ij,ij->i", y0[:, :3], y0[:, 3:])
+		rdot1 = np.einsum("ij,ij->i", y1[:, :3], y1[:, 3:])
+
+		#periapsis passages: the radial velocity turns positive
+		peri = np.flatnonzero((rdot0 < 0) & (rdot1 >= 0))
+		speri = np.zeros(len(idx))
+		if len(peri) > 0:
+			interp = interpolation(peri)
+			def radialvelocity(s):
+				yi = interp(s)
+				return np.einsum("ij,ij->i", yi[:, :3], yi[:, 3:])
+			speri[peri] = crossings(radialvelocity, np.zeros(len(peri)), 1)
+			hperi = norm(interp(speri[peri])[:, :3]) - model.radius
+			hmin[idx[peri]] = np.minimum(hmin[idx[peri]], hperi)
+
+		crashed = r1 < model.radius
+		exited = (r1 > model.entryr) & (rdot1 > 0)
+		timeout = ~crashed & ~exited & (t >= tmax)
+		done = crashed | exited | timeout
+		if not done.any():
+			continue
+
+		#the exact crossings of the surface and of the top of the atmosphere
+		#(an exit follows the periapsis, if that was in the same step)
+		for mask, r, lo in ((crashed, model.radius, np.zeros(len(idx))), (exited, model.entryr, speri)):
+			rows = np.flatnonzero(mask)
+			if len(rows) == 0:
+				continue
+			interp = interpolation(rows)
+			s = crossings(lambda s: norm(interp(s)[:, :3]) - r, lo[rows], 1)
+			tend[idx[rows]] = solver.told + s * h
+			yend[idx[rows]] = interp(s)
+
+		outcome[idx[crashed]] = CRASHED
+		hmin[idx[crashed]] = 0
+		#captured or escaped is decided from the exit orbit later
+		outcome[idx[exited]] = CAPTURED
+		tend[idx[timeout]] = t
+		yend[idx[timeout]] = y1[timeout]
+		hmin[idx[timeout]] = np.minimum(hmin[idx[timeout]], r1[timeout] - model.radius)
+
+		#drop the finished cases from the solver state
+		keep = ~done
+		idx = idx[keep]
+		d = d[keep]
+		solver.fun = model.accel(d)
+		solver.y = y1[keep]
+		solver.f = f1[keep]
+
+	return outcome, tend, hmin, yend
+
+def aerocapture(body, hp, ventry, d = 0.2, incl = 0, workers = None, chunksize = 2000, rtol = 1e-8, atol = 1e-6, tmax = 86400, tabulate = None):
+	"""
+	simulate many atmospheric entries at once
+
+	body
+		central body; must have an atmosphere
+	hp
+		periapsis heights over surface of the incoming trajectories (km)
+	ventry
+		velocities at atmospheric entry (m/s); the incoming orbits must reach the entry radius,
+		else an exception is raised
+	d
+		drag coefficients
+	incl
+		inclinations of the incoming trajectories (deg)
+	workers
+		number of worker processes; None means one per CPU, 0 runs in this process
+	chunksize
+		number of cases per worker task
+	rtol, atol
+		integration tolerances
+	tmax
+		maximum simulated time per case (s)
+	tabulate
+		if not None, evaluate the atmosphere from a lookup table with this many entries
+
+	hp, ventry, d and incl are broadcast against each other
+	returns
+		numpy structured array (see RESULTDTYPE); outcome indexes OUTCOMES
+	"""
+	if body.atm.cutoff <= 0:
+		raise Exception("Body has no atmosphere")
+
+	hp, ventry, d, incl = (np.ravel(x) for x in np.broadcast_arrays(
+		np.asarray(hp, dtype = float),
+		np.asarray(ventry, dtype = float),
+		np.asarray(d, dtype = float),
+		np.asarray(incl, dtype = float)))
+
+	model = CaptureModel(body, tabulate)
+
+	#incoming trajectories, from the entry velocity via vis-viva
+	rp = hp * 1000 + body.radius
+	if not np.all(rp < model.entryr):
+		raise Exception("All periapses must lie within the atmosphere")
+	with np.errstate(divide = "ignore"):
+		a = 1 / (2 / model.entryr - ventry * ventry / model.mu)
+	ra = np.where(np.isfinite(a), 2 * a - rp, -inf)
+	#too slow to get back to the entry radius: no such entry state exists
+	if np.any((a > 0) & (ra < model.entryr)):
+		raise Exception("Orbit completely within atmosphere: ventry too low for the periapsis")
+	q = rp / ra
+	e = (1 - q) / (1 + q)
+	#(the clip only absorbs rounding errors at the apsides)
+	theta = -np.degrees(np.arccos(np.clip((rp * (1 + e) / model.entryr - 1) / e, -1, 1)))
+	vr, vv = elementstate(model.mu, rp, ra, incl, 0, theta)
+	y = np.concatenate((vr, vv), axis = 1)
+
+	chunks = [slice(start, start + chunksize) for start in range(0, len(y), chunksize)]
+	args = [(model, y[c], d[c], rtol, atol, tmax) for c in chunks]
+
+	if workers == 0 or len(chunks) == 1:
+		results = [simulatechunk(*arg) for arg in args]
+	else:
+		from concurrent.futures import ProcessPoolExecutor
+		with ProcessPoolExecutor(max_workers = workers) as pool:
+			results = list(pool.map(simulatechunk, *zip(*args)))
+
+	outcome, t, hmin, yend = (np.concatenate(x) for x in zip(*results))
+
+	result = np.zeros(len(y), dtype = RESULTDTYPE)
+	result["hp"] = hp
+	result["ventry"] = ventry
+	result["d"] = d
+	result["incl"] = incl
+	result["t"] = t
+	result["hmin"] = hmin
+
+	exitrp, exitra, exitincl, exitomega = stateelements(model.mu, yend[:, :3], yend[:, 3:])
+	exited = outcome == CAPTURED
+	outcome[exited & (exitra < 0)] = ESCAPED
+	result["outcome"] = outcome
+	for name, val in (("exitrp", exitrp), ("exitra", exitra), ("exitincl", exitincl), ("exitomega", exitomega)):
+		result[name] = np.where(exited, val, nan)
+
+	return result
+
+def summary(result):
+	"""
+	result
+		result table of aerocapture()
+	returns
+		dict of outcome name: number of cases
+	"""
+	counts = np.bincount(result["outcome"], minlength = len(OUTCOMES))
+	return dict(zip(OUTCOMES, counts.tolist()))
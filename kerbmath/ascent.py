@@ -0,0 +1,373 @@
+"""
+batched launch ascent simulation
+
+simulates many gravity turn ascents at once as (N, 7) state arrays
+(position, velocity, mass), from the equator of a body into orbit.
+
+the vessel starts at the surface, moving with the rotation of the body, and
+burns at full thrust; its pitch (from the local vertical towards the east)
+follows the gravity turn profile
+
+	pitch = 90 deg * clip((h - turnstart) / (turnend - turnstart), 0, 1) ** shape
+
+until the apoapsis reaches the target. it then coasts out of the atmosphere,
+and is circularized at apoapsis with an impulsive burn.
+
+all motion stays in the equatorial plane.
+"""
+import numpy as np
+
+from kerbmath.util import *
+from kerbmath.integrate import DormandPrince
+from kerbmath.vectorarray import norm, normalize, axpy, rotvvector, gravity
+
+#standard gravity, for converting specific impulse to exhaust velocity (m/s^2)
+G0 = 9.81
+
+#outcome codes, as stored in the 'outcome' column of the result table
+OUTCOMES = ("orbit", "suborbital", "fuel", "crashed", "timeout")
+ORBIT, SUBORBITAL, FUEL, CRASHED, TIMEOUT = range(5)
+
+RESULTDTYPE = np.dtype([
+	("turnstart", float),
+	("turnend", float),
+	("shape", float),
+	("thrust", float),
+	("isp", float),
+	("m0", float),
+	("mdry", float),
+	("d", float),
+	("outcome", np.int8),
+	("t", float),
+	("mfinal", float),
+	("dv", float),
+	("circdv", float),
+	("total", float),
+	("rp", float),
+	("ra", float),
+])
+
+class AscentModel:
+	"""
+	the picklable physical parameters of a body that the simulation needs
+	"""
+	def __init__(self, body, tabulate = None):
+		"""
+		body
+			the body to launch from
+		tabulate
+			if not None, the atmosphere is replaced by a lookup table with this many entries
+		"""
+		self.mu = body.mu()
+		self.radius = body.radius
+		self.entryr = body.radius + body.atm.cutoff
+		self.rotrate = 2 * pi / body.rotperiod
+		self.atm = body.atm
+		if tabulate != None and body.atm.cutoff > 0:
+			self.atm = self.atm.tabulate(tabulate)
+
+	def accel(self, thrust, massflow, d, turnstart, turnend, shape):
+		"""
+		thrust, massflow
+			thrust (N) and mass flow (kg/s) of each vessel, shape (N,)
+			the simulation sets them to 0 in place at engine cutoff
+		d, turnstart, turnend, shape
+			drag coefficients and gravity turn profiles (heights in m), shape (N,)
+		returns
+			in-place derivative function fun(t, y, out) for states of shape (N, 7)
+		"""
+		n = len(thrust)
+		invturn = 1 / np.maximum(turnend - turnstart, 1e-9)
+		halfd = 0.5 * d
+		vvdelta, up, east = np.empty((n, 3)), np.empty((n, 3)), np.empty((n, 3))
+		r, vdelta, h, pitch, tmp, along = (np.empty(n) for i in range(6))
+
+		def fun(t, y, out):
+			vr = y[:, :3]
+			vv = y[:, 3:6]
+			accel = out[:, 3:6]
+			norm(vr, out = r)
+
+			#air velocity is the rotation of the body around its z axis
+			rotvvector(self.rotrate, vr, out = vvdelta)
+			np.subtract(vv, vvdelta, out = vvdelta)
+			norm(vvdelta, out = vdelta)
+
+			out[:, :3] = vv
+			gravity(self.mu, vr, out = accel, norms = r, tmp = tmp)
+
+			#drag, along the air velocity
+			np.subtract(r, self.radius, out = h)
+			adrag = self.atm.rho(h)
+			adrag *= vdelta
+			adrag *= halfd
+			np.multiply(vvdelta, adrag[:, None], out = vvdelta)
+			accel -= vvdelta
+
+			#thrust, pitched from the local vertical towards the east
+			np.subtract(h, turnstart, out = pitch)
+			np.multiply(pitch, invturn, out = pitch)
+			np.clip(pitch, 0, 1, out = pitch)
+			np.power(pitch, shape, out = pitch)
+			np.multiply(pitch, pi / 2, out = pitch)
+			normalize(vr, 1, out = up, norms = tmp)
+			rotvvector(1, up, out = east)
+			np.divide(thrust, y[:, 6], out = tmp)
+			np.cos(pitch, out = along)
+			np.multiply(along, tmp, out = along)
+			axpy(along, up, accel, tmp = vvdelta)
+			np.sin(pitch, out = along)
+			np.multiply(along, tmp, out = along)
+			axpy(along, east, accel, tmp = vvdelta)
+
+			np.negative(massflow, out = out[:, 6])
+
+		return fun
+
+def apoapsis(mu, vr, vv):
+	"""
+	vr, vv
+		position and velocity vectors, shape (N, 3)
+	returns
+		apoapsis radii (m) of the osculating orbits, inf for escape trajectories
+	"""
+	r = norm(vr)
+	v2 = np.einsum("ij,ij->i", vv, vv)
+	hvec = np.cross(vr, vv)
+	h2 = np.einsum("ij,ij->i", hvec, hvec)
+	with np.errstate(divide = "ignore", invalid = "ignore"):
+		a = 1 / (2 / r - v2 / mu)
+		e = np.sqrt(np.maximum(1 - h2 / (mu * a), 0))
+		return np.where(a > 0, a * (1 + e), inf)
+
+def simulatechunk(model, params, ratarget, rtol, atol, hmax, tmax):
+	"""
+	simulate a chunk of ascents in one process
+
+	model
+		AscentModel
+	params
+		dict of thrust, isp, m0, mdry, d, turnstart, turnend, shape (heights in m): arrays of shape (N,)
+	ratarget
+		apoapsis radius (m) at which the engines are cut off
+	rtol, atol, hmax, tmax
+		integration tolerances, maximum step size and maximum simulated time (s)
+	returns
+		outcome, end time, end states (N, 7) and whether the propellant ran out
+		before the target apoapsis, as arrays
+		'orbit' is not decided here: those cases end as 'suborbital'
+	"""
+	n = len(params["thrust"])
+	outcome = np.full(n, TIMEOUT, dtype = np.int8)
+	tend = np.full(n, float(tmax))
+
+	#start on the equator at the x axis, moving with the surface
+	y = np.zeros((n, 7))
+	y[:, 0] = model.radius
+	rotvvector(model.rotrate, y[:, :3], out = y[:, 3:6])
+	y[:, 6] = params["m0"]
+	yend = y.copy()
+
+	#indices into the chunk of the cases that are still simulated
+	idx = np.arange(n)
+	thrust = params["thrust"].copy()
+	massflow = thrust / (params["isp"] * G0)
+	mdry = params["mdry"]
+	#cases whose propellant ran out before the target apoapsis was reached
+	empty = np.zeros(n, dtype = bool)
+
+	def accel():
+		return model.accel(thrust, massflow, params["d"][idx], params["turnstart"][idx],
+			params["turnend"][idx], params["shape"][idx])
+
+	solver = DormandPrince(accel(), 0, y, rtol = rtol, atol = atol, hmax = hmax, inplace = True)
+	ra = apoapsis(model.mu, y[:, :3], y[:, 3:6])
+
+	while len(idx) > 0:
+		t = solver.step(tmax)
+		y = solver.y
+		vr = y[:, :3]
+		r = norm(vr)
+		raold = ra
+		ra = apoapsis(model.mu, vr, y[:, 3:6])
+
+		#engine cutoff at the target apoapsis or when the propellant is used up
+		burning = thrust > 0
+		reached = burning & (ra >= ratarget)
+		dry = burning & (y[:, 6] <= mdry[idx])
+		cutoff = reached | dry
+		if cutoff.any():
+			#how long each engine burned too long in the last step:
+			#the apoapsis is interpolated linearly, the mass is linear in time
+			h = solver.hlast
+			with np.errstate(divide = "ignore", invalid = "ignore"):
+				overreach = np.where(reached, h * (ra - ratarget) / (ra - raold), 0)
+				overdry = np.where(dry, (mdry[idx] - y[:, 6]) / massflow, 0)
+			overreach = np.clip(np.nan_to_num(overreach, posinf = 0), 0, h)
+			overdry = np.clip(np.nan_to_num(overdry), 0, h)
+			empty[idx[dry & (overdry >= overreach)]] = True
+			overtime = np.maximum(overreach, overdry)[:, None]
+
+			#take back the thrust of that time, to first order
+			thrustf = solver.f.copy()
+			thrust[cutoff] = 0
+			massflow[cutoff] = 0
+			solver.fun(t, y, solver.f)
+			thrustf -= solver.f
+			y[:, :3] -= 0.5 * overtime * overtime * thrustf[:, 3:6]
+			y[:, 3:] -= overtime * thrustf[:, 3:]
+			solver.fun(t, y, solver.f)
+			r = norm(vr)
+			ra = apoapsis(model.mu, vr, y[:, 3:6])
+
+		coasting = thrust == 0
+		crashed = r < model.radius
+		#out of the atmosphere the orbit does not change any more
+		left = coasting & (r >= model.entryr)
+		falling = coasting & ~left & (np.einsum("ij,ij->i", vr, y[:, 3:6]) < 0)
+		done = crashed | left | falling | (t >= tmax)
+		if not done.any():
+			continue
+
+		outcome[idx[left | falling]] = SUBORBITAL
+		outcome[idx[crashed]] = CRASHED
+		tend[idx[done]] = t
+		yend[idx[done]] = y[done]
+
+		#drop the finished cases from the solver state
+		keep = ~done
+		idx = idx[keep]
+		thrust = thrust[keep]
+		massflow = massflow[keep]
+		ra = ra[keep]
+		solver.y = y[keep]
+		solver.f = solver.f[keep]
+		solver.fun = accel()
+
+	return outcome, tend, yend, empty
+
+def ascent(body, turnstart, turnend, shape = 0.5, thrust = 200e3, isp = 320, m0 = 16e3, mdry = 4e3, d = 0.2,
+		hatarget = None, workers = None, chunksize = 2000, rtol = 1e-8, atol = 1e-6, hmax = 0.5, tmax = 3600, tabulate = None):
+	"""
+	simulate many gravity turn ascents at once
+
+	body
+		the body to launch from (at the equator, eastwards)
+	turnstart
+		heights over surface (km) where the gravity turn starts
+	turnend
+		heights over surface (km) where the vessel is horizontal
+	shape
+		exponent of the pitch profile; < 1 turns early, > 1 late
+	thrust
+		engine thrust (N)
+	isp
+		specific impulse (s)
+	m0
+		launch masses (kg)
+	mdry
+		masses without propellant (kg)
+	d
+		drag coefficients
+	hatarget
+		target apoapsis height over surface (km) at which the engines are cut off
+		defaults to 10 km above the lowest stable orbit (Body.minorbitr)
+	workers
+		number of worker processes; None means one per CPU, 0 runs in this process
+	chunksize
+		number of cases per worker task
+	rtol, atol
+		integration tolerances
+	hmax
+		maximum step size (s); the engine cutoff within a step is interpolated
+	tmax
+		maximum simulated time per case (s)
+	tabulate
+		if not None, evaluate the atmosphere from a lookup table with this many entries
+
+	turnstart to d are broadcast against each other
+	returns
+		OrbitArray of the orbits that the 'orbit' cases reach before circularization,
+		in the order of np.flatnonzero(result["outcome"] == ORBIT),
+		and the result table (see RESULTDTYPE, outcome indexes OUTCOMES):
+		dv is the ascent dv isp * G0 * ln(m0 / mfinal) (m/s), circdv the dv of
+		circularization at apoapsis, total their sum
+	"""
+	from kerbmath.orbitarray import OrbitArray
+	from kerbmath.elements import stateelements
+
+	names = ("turnstart", "turnend", "shape", "thrust", "isp", "m0", "mdry", "d")
+	columns = np.broadcast_arrays(*(np.asarray(x, dtype = float) for x in (turnstart, turnend, shape, thrust, isp, m0, mdry, d)))
+	params = {name: np.ravel(x).copy() for name, x in zip(names, columns)}
+	if not np.all(params["mdry"] < params["m0"]):
+		raise Exception("mdry must be < m0")
+
+	if hatarget == None:
+		ratarget = body.minorbitr() + 10e3
+	else:
+		ratarget = hatarget * 1000 + body.radius
+
+	model = AscentModel(body, tabulate)
+	simparams = dict(params)
+	simparams["turnstart"] = params["turnstart"] * 1000
+	simparams["turnend"] = params["turnend"] * 1000
+
+	n = len(params["thrust"])
+	chunks = [slice(start, start + chunksize) for start in range(0, n, chunksize)]
+	args = [(model, {name: x[c] for name, x in simparams.items()}, ratarget, rtol, atol, hmax, tmax) for c in chunks]
+
+	if workers == 0 or len(chunks) == 1:
+		results = [simulatechunk(*arg) for arg in args]
+	else:
+		from concurrent.futures import ProcessPoolExecutor
+		with ProcessPoolExecutor(max_workers = workers) as pool:
+			results = list(pool.map(simulatechunk, *zip(*args)))
+
+	outcome, t, yend, empty = (np.concatenate(x) for x in zip(*results))
+
+	result = np.zeros(n, dtype = RESULTDTYPE)
+	for name in names:
+		result[name] = params[name]
+	result["t"] = t
+	result["mfinal"] = yend[:, 6]
+	result["dv"] = params["isp"] * G0 * np.log(params["m0"] / yend[:, 6])
+
+	rp, ra, incl, omega = stateelements(body.mu(), yend[:, :3], yend[:, 3:6])
+	result["rp"] = rp
+	result["ra"] = ra
+
+	#the coast ended out of the atmosphere with an apoapsis that allows a stable orbit
+	orbit = (outcome == SUBORBITAL) & (ra >= body.minorbitr())
+	orbit &= norm(yend[:, :3]) >= model.entryr
+	outcome[orbit] = ORBIT
+	outcome[(outcome == SUBORBITAL) & empty] = FUEL
+	result["outcome"] = outcome
+
+	orbits = OrbitArray(body, rp[orbit], ra[orbit], incl[orbit], omega[orbit])
+	result["circdv"] = nan
+	result["circdv"][orbit] = orbits.circ()
+	result["total"] = result["dv"] + result["circdv"]
+
+	return orbits, result
+
+def summary(result):
+	"""
+	result
+		result table of ascent()
+	returns
+		dict of outcome name: number of cases
+	"""
+	counts = np.bincount(result["outcome"], minlength = len(OUTCOMES))
+	return dict(zip(OUTCOMES, counts.tolist()))
+
+def cheapest(result):
+	"""
+	result
+		result table of ascent()
+	returns
+		the record of the 'orbit' case with the lowest total dv, or None if no case reached orbit
+	"""
+	orbit = np.flatnonzero(result["outcome"] == ORBIT)
+	if len(orbit) == 0:
+		return None
+	return result[orbit[np.argmin(result["total"][orbit])]]
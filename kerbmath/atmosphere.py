@@ -1,7 +1,22 @@
 from math import *
 from kerbmath.util import *
 
+#all height-dependent methods accept either a number or a numpy array of heights;
+#numpy is only imported when arrays are used
+
+def isnumber(h):
+	"""
+	returns
+		True if h is a plain number (the fast, numpy-free path)
+	"""
+	return isinstance(h, (float, int))
+
 class Atmosphere:
+	"""
+	exponential atmosphere; pressure and density decrease by e every scale height
+
+	base class for other atmosphere profiles, which override p and rho
+	"""
 	def __init__(self, cutoff = 0, scaleh = 0, p0 = 0, rho0 = 0):
 		"""
 		cutoff
@@ -13,7 +28,22 @@ class Atmosphere:
 		rho0
 			The surface density (kg/m^3)
 		"""
-		self.__dict__.update(locals())
+		self.cutoff = cutoff
+		self.scaleh = scaleh
+		self.p0 = p0
+		self.rho0 = rho0
+
+		#avoid the division in the hot path
+		if scaleh > 0:
+			self.invscaleh = 1 / scaleh
+		else:
+			self.invscaleh = inf
+
+	def __getstate__(self):
+		#the body is not needed for pickling, e.g. for worker processes
+		state = self.__dict__.copy()
+		state.pop("body", None)
+		return state
 
 	def p(self, h):
 		"""
@@ -22,9 +52,15 @@ class Atmosphere:
 		returns
 			Pressure at h (N/m^2)
 		"""
-		if h >= self.cutoff:
-			return 0
-		return self.p0 * exp(-h / self.scaleh)
+		if isnumber(h):
+			if h >= self.cutoff:
+				return 0
+			return self.p0 * exp(-h * self.invscaleh)
+
+		import numpy as np
+		h = np.asarray(h, dtype = float)
+		with np.errstate(over = "ignore", invalid = "ignore"):
+			return np.where(h < self.cutoff, self.p0 * np.exp(-h * self.invscaleh), 0)
 
 	def rho(self, h):
 		"""
@@ -35,7 +71,15 @@ class Atmosphere:
 		"""
 		#TODO check whether this is really true
 		#in RL, rho ~ 1/T and rho ~ p
-		return self.rho0 * self.p(h)/self.p0
+		if isnumber(h):
+			if h >= self.cutoff:
+				return 0
+			return self.rho0 * exp(-h * self.invscaleh)
+
+		import numpy as np
+		h = np.asarray(h, dtype = float)
+		with np.errstate(over = "ignore", invalid = "ignore"):
+			return np.where(h < self.cutoff, self.rho0 * np.exp(-h * self.invscaleh), 0)
 
 	def accel(self, h, v, d = 0.2):
 		"""
@@ -59,6 +103,168 @@ class Atmosphere:
 		returns
 			Terminal velocity (F_G = F_D, m/s)
 		"""
-		if h > self.cutoff:
-			return inf
-		return sqrt(self.body.accel(h)/(0.5 * self.rho(h) * d))
+		if isnumber(h):
+			if h > self.cutoff:
+				return inf
+			return sqrt(self.body.accel(h + self.body.radius) / (0.5 * self.rho(h) * d))
+
+		import numpy as np
+		h = np.asarray(h, dtype = float)
+		with np.errstate(divide = "ignore"):
+			return np.sqrt(self.body.accel(h + self.body.radius) / (0.5 * self.rho(h) * d))
+
+	def tabulate(self, n = 4096):
+		"""
+		precompute this atmosphere as a lookup table, for hot loops
+
+		n
+			number of table entries between the surface and the cutoff height
+		returns
+			TableAtmosphere
+		"""
+		import numpy as np
+		heights = np.linspace(0, self.cutoff, n)
+		#sample the top just below the cutoff, so the last piece does not fade to 0
+		sampleh = np.minimum(heights, np.nextafter(self.cutoff, 0))
+		result = TableAtmosphere(self.cutoff, heights, self.p(sampleh), self.rho(sampleh))
+		if "body" in self.__dict__:
+			result.body = self.body
+
+		return result
+
+class TableAtmosphere(Atmosphere):
+	"""
+	piecewise atmosphere profile, given as pressure and density at sample heights
+
+	between the samples, the logarithms of pressure and density are interpolated linearly,
+	so each piece is exponential. below the lowest sample, the lowest piece is extrapolated.
+	if the samples are uniformly spaced, lookups are O(1).
+	"""
+	def __init__(self, cutoff, heights, p, rho):
+		"""
+		cutoff
+			The cutoff height (m)
+		heights
+			sample heights (m), ascending
+		p
+			pressures at the sample heights (N/m^2)
+		rho
+			densities at the sample heights (kg/m^3)
+		"""
+		import numpy as np
+		heights = np.asarray(heights, dtype = float)
+		if len(heights) < 2:
+			raise Exception("At least two samples are needed")
+		if not np.all(np.diff(heights) > 0):
+			raise Exception("Sample heights must be ascending")
+
+		p = np.asarray(p, dtype = float)
+		rho = np.asarray(rho, dtype = float)
+
+		super().__init__(cutoff = cutoff, p0 = float(p[0]), rho0 = float(rho[0]))
+		self.heights = heights
+		#log(0) = -inf gives exp(-inf) = 0, which is what we want
+		with np.errstate(divide = "ignore", invalid = "ignore"):
+			self.logp = np.log(p)
+			self.logrho = np.log(rho)
+			#slopes of the log values per piece; pieces that end at 0 fade out linearly
+			self.slopep = np.diff(self.logp) / np.diff(heights)
+			self.sloperho = np.diff(self.logrho) / np.diff(heights)
+		self.fades = bool(np.any(p[1:] == 0) or np.any(rho[1:] == 0))
+
+		steps = np.diff(heights)
+		self.uniform = bool(np.allclose(steps, steps[0]))
+		self.h0 = float(heights[0])
+		self.invdh = 1 / float(steps[0])
+
+		#plain lists for the numpy-free scalar path
+		self.heightlist = heights.tolist()
+		self.logplist = self.logp.tolist()
+		self.logrholist = self.logrho.tolist()
+
+	@classmethod
+	def fromfile(cls, filename, cutoff = None):
+		"""
+		load a profile from a text file with the columns
+		height (m), pressure (N/m^2), density (kg/m^3)
+		lines starting with '#' are ignored
+
+		filename
+			the file
+		cutoff
+			cutoff height (m); defaults to the highest sample height
+		"""
+		import numpy as np
+		heights, p, rho = np.loadtxt(filename, ndmin = 2, unpack = True)
+		if cutoff == None:
+			cutoff = float(heights[-1])
+
+		return cls(cutoff, heights, p, rho)
+
+	def tabulate(self, n = 4096):
+		#a uniform table that is at least as fine is already fast
+		if self.uniform and len(self.heights) >= n:
+			return self
+		return super().tabulate(n)
+
+	def interpolate(self, h, logvals, slopes, logvallist):
+		"""
+		h
+			height or heights (m)
+		logvals
+			logarithms of the sample values
+		slopes
+			slopes of logvals per piece
+		logvallist
+			logvals, as list
+		returns
+			interpolated value(s), 0 above the cutoff height
+		"""
+		if isnumber(h):
+			if h >= self.cutoff:
+				return 0
+			if self.uniform:
+				idx = int((h - self.h0) * self.invdh)
+			else:
+				from bisect import bisect_right
+				idx = bisect_right(self.heightlist, h) - 1
+			idx = min(max(idx, 0), len(logvallist) - 2)
+			h0, h1 = self.heightlist[idx], self.heightlist[idx + 1]
+			v0, v1 = logvallist[idx], logvallist[idx + 1]
+			if v1 == -inf:
+				return exp(v0) * (h1 - h) / (h1 - h0)
+			return exp(v0 + (v1 - v0) * (h - h0) / (h1 - h0))
+
+		import numpy as np
+		h = np.asarray(h, dtype = float)
+		if self.uniform:
+			idx = ((h - self.h0) * self.invdh).astype(np.intp)
+		else:
+			idx = np.searchsorted(self.heights, h, side = "right") - 1
+		np.clip(idx, 0, len(logvals) - 2, out = idx)
+		dh = h - self.heights[idx]
+		with np.errstate(invalid = "ignore", over = "ignore"):
+			result = np.exp(logvals[idx] + slopes[idx] * dh)
+			if self.fades:
+				fade = logvals[idx + 1] == -inf
+				result = np.where(fade, np.exp(logvals[idx]) * (1 - dh / (self.heights[idx + 1] - self.heights[idx])), result)
+		result[h >= self.cutoff] = 0
+		return result
+
+	def p(self, h):
+		"""
+		h
+			Height (m)
+		returns
+			Pressure at h (N/m^2)
+		"""
+		return self.interpolate(h, self.logp, self.slopep, self.logplist)
+
+	def rho(self, h):
+		"""
+		h
+			Height (m)
+		returns
+			Air density at h (kg/m^3)
+		"""
+		return self.interpolate(h, self.logrho, self.sloperho, self.logrholist)
@@ -0,0 +1,323 @@
+"""
+benchmark suite
+
+micro benchmarks time single calls of the hot paths (scalar and batched where both exist),
+macro benchmarks time whole workflows such as aerobraking, reading the config and startup.
+all times are reported per operation, so scalar and batched variants are comparable.
+
+usage:
+	python -m kerbmath.bench [--save baseline.json] [--compare baseline.json] [--threshold 0.1]
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+from kerbmath.util import *
+
+#registered benchmarks: (name, kind, ops, setup function)
+BENCHMARKS = []
+
+def benchmark(name, kind = "micro", ops = 1):
+	"""
+	decorator that registers a benchmark
+
+	the decorated function is called with the System and returns a function
+	without arguments, which is the code that is timed
+
+	name
+		benchmark name, such as 'orbit.init'
+	kind
+		'micro' or 'macro'
+	ops
+		number of operations that one call of the timed function does
+	"""
+	def register(setup):
+		BENCHMARKS.append((name, kind, ops, setup))
+		return setup
+	return register
+
+def defaultconf():
+	"""
+	returns
+		path of kerbol.ini, in the current directory or next to the package
+	"""
+	if os.path.exists("kerbol.ini"):
+		return "kerbol.ini"
+	return os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "kerbol.ini")
+
+def makesystem(conf):
+	"""
+	returns
+		a quiet System with the configuration loaded
+	"""
+	from kerbmath.system import System
+	system = System(globalorbits = False, printorbits = False, printbodies = False)
+	system.readconf(conf)
+	return system
+
+#number of orbits for the batched benchmarks and their scalar equivalents
+BATCH = 1000
+
+def testorbits(system, n = BATCH):
+	"""
+	returns
+		list of n reproducible elliptic orbits around kerbin (not registered)
+	"""
+	from kerbmath.orbit import Orbit
+	kerbin = system.kerbin
+	rp = [kerbin.radius + 80e3 + 1e3 * i for i in range(n)]
+	ra = [r + 2e6 + 5e3 * i for i, r in enumerate(rp)]
+	return [Orbit.fromapsides(kerbin, p, a, incl = i % 30, register = False) for i, (p, a) in enumerate(zip(rp, ra))]
+
+@benchmark("orbit.init", ops = 100)
+def benchorbitinit(system):
+	from kerbmath.orbit import Orbit
+	kerbin = system.kerbin
+	def run():
+		for i in range(100):
+			Orbit(kerbin, hp = 80, ha = 800 + i)
+		system.clearorbits(None)
+	return run
+
+@benchmark("orbit.fromapsides", ops = 100)
+def benchfromapsides(system):
+	from kerbmath.orbit import Orbit
+	kerbin = system.kerbin
+	def run():
+		for i in range(100):
+			Orbit.fromapsides(kerbin, 680e3, 1400e3 + i, register = False)
+	return run
+
+def scalarbench(method, *args):
+	def setup(system):
+		orbits = testorbits(system)
+		def run():
+			for orb in orbits:
+				#the caches would hide the cost of the calculation
+				object.__setattr__(orb, "_cache", None)
+				getattr(orb, method)(*args)
+			#some methods register temporary orbits
+			system.clearorbits(None)
+		return run
+	return setup
+
+def batchbench(method, *args):
+	def setup(system):
+		from kerbmath.orbitarray import OrbitArray
+		orbits = OrbitArray.fromorbits(testorbits(system))
+		def run():
+			getattr(orbits, method)(*args)
+		return run
+	return setup
+
+for method, args in (("vp", ()), ("chra", (12e6,)), ("circ", ()), ("escape", ()), ("chir", (2.5e6, 45))):
+	benchmark("orbit." + method, ops = BATCH)(scalarbench(method, *args))
+	benchmark("orbitarray." + method, ops = BATCH)(batchbench(method, *args))
+
+@benchmark("orbit.aerobrake", kind = "macro")
+def benchaerobrake(system):
+	from kerbmath.orbit import Orbit
+	orb = Orbit.fromapsides(system.kerbin, system.kerbin.radius + 30e3, 12e6, register = False)
+	def run():
+		orb.aerobrake()
+	return run
+
+@benchmark("aerocapture", kind = "macro", ops = 200)
+def benchaerocapture(system):
+	import numpy as np
+	from kerbmath.aerocapture import aerocapture
+	hp = np.linspace(20, 60, 200)
+	def run():
+		aerocapture(system.kerbin, hp, 3000, workers = 0)
+	return run
+
+@benchmark("ascent", kind = "macro", ops = 100)
+def benchascent(system):
+	import numpy as np
+	from kerbmath.ascent import ascent
+	turnstart, turnend = np.meshgrid(np.linspace(1, 10, 10), np.linspace(30, 70, 10))
+	def run():
+		ascent(system.kerbin, turnstart, turnend, workers = 0)
+	return run
+
+@benchmark("system.readconf", kind = "macro")
+def benchreadconf(system):
+	conf = system.benchconf
+	def run():
+		makesystem(conf)
+	return run
+
+@benchmark("startup", kind = "macro")
+def benchstartup(system):
+	conf = os.path.abspath(system.benchconf)
+	root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+	env = dict(os.environ)
+	env["PYTHONPATH"] = root + os.pathsep + env.get("PYTHONPATH", "")
+	#everything that the interactive script does, except for the console
+	code = ("from kerbmath.system import System\n"
+		"sys = System(printbodies = False)\n"
+		"sys.readconf(" + repr(conf) + ")\n"
+		"from kerbmath.util import interact\n")
+	def run():
+		subprocess.run([sys.executable, "-c", code], env = env, check = True, stdout = subprocess.DEVNULL)
+	return run
+
+def measure(run, kind, mintime = 0.2, repeat = 5):
+	"""
+	run
+		the timed function
+	kind
+		'micro' functions are called in loops of at least mintime seconds,
+		'macro' functions once per repetition
+	repeat
+		number of repetitions; the fastest one is used, as it is the least disturbed
+	returns
+		time per call (s), calls per repetition
+	"""
+	number = 1
+	if kind == "micro":
+		#calibrate the loop length
+		while True:
+			start = time.perf_counter()
+			for i in range(number):
+				run()
+			if time.perf_counter() - start >= mintime:
+				break
+			number *= 2
+	else:
+		repeat = max(repeat // 2, 1)
+		#warm up caches and lazy imports
+		run()
+
+	best = inf
+	for r in range(repeat):
+		start = time.perf_counter()
+		for i in range(number):
+			run()
+		best = min(best, (time.perf_counter() - start) / number)
+
+	return best, number
+
+def runall(conf = None, pattern = None, kinds = ("micro", "macro"), mintime = 0.2, repeat = 5, verbose = True):
+	"""
+	run the benchmarks
+
+	conf
+		system configuration file; defaults to kerbol.ini
+	pattern
+		if given, only benchmarks whose name contains it are run
+	kinds
+		benchmark kinds to run
+	returns
+		result dict, as stored in baseline files
+	"""
+	if conf == None:
+		conf = defaultconf()
+	system = makesystem(conf)
+	system.benchconf = conf
+
+	results = {}
+	for name, kind, ops, setup in BENCHMARKS:
+		if kind not in kinds or (pattern != None and pattern not in name):
+			continue
+		run = setup(system)
+		t, number = measure(run, kind, mintime, repeat)
+		results[name] = {"kind": kind, "time": t / ops, "ops": ops, "number": number}
+		if verbose:
+			print("%-24s %s" % (name, timestr(t / ops)))
+
+	import numpy
+	meta = {
+		"python": platform.python_version(),
+		"numpy": numpy.__version__,
+		"machine": platform.machine(),
+		"platform": platform.platform(),
+		"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+	}
+	return {"meta": meta, "results": results}
+
+def save(result, filename):
+	with open(filename, "w") as f:
+		json.dump(result, f, indent = "\t", sort_keys = True)
+
+def load(filename):
+	with open(filename) as f:
+		return json.load(f)
+
+def compare(baseline, result, threshold = 0.1):
+	"""
+	print a comparison report
+
+	baseline
+		result dict of an earlier run
+	result
+		result dict of this run
+	threshold
+		relative slowdown above which a benchmark counts as regression
+	returns
+		list of the names of regressed benchmarks
+	"""
+	regressions = []
+	print("%-24s %12s %12s %8s" % ("benchmark", "baseline", "current", "ratio"))
+	for name, res in result["results"].items():
+		base = baseline["results"].get(name)
+		if base == None:
+			print("%-24s %12s %12s" % (name, "-", timestr(res["time"])))
+			continue
+
+		ratio = res["time"] / base["time"]
+		line = "%-24s %12s %12s %7.2fx" % (name, timestr(base["time"]), timestr(res["time"]), ratio)
+		if ratio > 1 + threshold:
+			regressions.append(name)
+			colprint(line + "  REGRESSION", 31)
+		elif ratio < 1 / (1 + threshold):
+			colprint(line + "  improved", 32)
+		else:
+			print(line)
+
+	if baseline.get("meta") != result.get("meta"):
+		oldmeta = dict(baseline.get("meta", {}))
+		newmeta = dict(result.get("meta", {}))
+		oldmeta.pop("date", None)
+		newmeta.pop("date", None)
+		if oldmeta != newmeta:
+			colprint("baseline was recorded in a different environment: " + str(oldmeta), 33)
+
+	return regressions
+
+def main(args = None):
+	import argparse
+	cli = argparse.ArgumentParser(prog = "python -m kerbmath.bench", description = "kerbmath benchmark suite")
+	cli.add_argument("--conf", help = "system configuration file (default: kerbol.ini)")
+	cli.add_argument("--filter", help = "only run benchmarks whose name contains this")
+	cli.add_argument("--micro", action = "store_true", help = "only run micro benchmarks")
+	cli.add_argument("--macro", action = "store_true", help = "only run macro benchmarks")
+	cli.add_argument("--save", metavar = "FILE", help = "save the results as JSON baseline")
+	cli.add_argument("--compare", metavar = "FILE", help = "compare against a JSON baseline")
+	cli.add_argument("--threshold", type = float, default = 0.1, help = "relative slowdown that counts as regression (default: 0.1)")
+	cli.add_argument("--repeat", type = int, default = 5, help = "number of repetitions (default: 5)")
+	args = cli.parse_args(args)
+
+	kinds = ("micro", "macro")
+	if args.micro and not args.macro:
+		kinds = ("micro",)
+	elif args.macro and not args.micro:
+		kinds = ("macro",)
+
+	result = runall(args.conf, args.filter, kinds, repeat = args.repeat, verbose = args.compare == None)
+
+	if args.save != None:
+		save(result, args.save)
+
+	if args.compare != None:
+		regressions = compare(load(args.compare), result, args.threshold)
+		if regressions:
+			return 1
+
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -11,7 +11,11 @@ class Body:
 	#the class can not be instantiated while this variable is None
 	system = None
 
-	def __init__(self, name, mass, radius, maxelev = 0, rotperiod = inf, atm = None):
+	#attributes that cached derived quantities (of the body and its orbits) depend on
+	cachedeps = ("mass", "radius", "parent", "sma", "ecc", "incl", "omega", "node", "meananomaly")
+
+	def __init__(self, name, mass, radius, maxelev = 0, rotperiod = inf, atm = None,
+			parent = None, sma = None, ecc = 0, incl = 0, omega = 0, node = 0, meananomaly = 0):
 		"""
 		name
 			Name (will also be used as variable name)
@@ -25,18 +29,63 @@ class Body:
 			Siderial rotation period (s)
 		atm
 			Atmosphere (Atmosphere object)
+
+		> the orbit of the body around its parent, if it has one
+
+		parent
+			the body that this body orbits (Body object)
+		sma
+			semi-major axis (m)
+		ecc
+			eccentricity
+		incl
+			inclination (deg)
+		omega
+			argument of periapsis (deg)
+		node
+			longitude of the ascending node (deg)
+		meananomaly
+			mean anomaly at t = 0 (deg)
 		"""
 		if self.system == None:
 			raise Exception("Can not instantiate systemless body")
+		if parent != None and sma == None:
+			raise Exception("sma must be given for bodies with a parent")
 
 		if atm == None:
 			atm = Atmosphere(cutoff = 0)
 		atm.body = self
 
+		#derived quantity cache; generation counts changes of cachedeps,
+		#so orbits around this body can tell that their caches are outdated
+		self._cache = {}
+		self.generation = 0
+		#generation of the parent when the cache was filled
+		self._cachegen = None
+
 		self.__dict__.update(locals())
 
 		self.system.addbody(self)
 
+	def __setattr__(self, name, val):
+		self.__dict__[name] = val
+		if name in self.cachedeps:
+			self._cache.clear()
+			self.__dict__["generation"] += 1
+
+	def cache(self):
+		"""
+		returns
+			the derived quantity cache (see util.cached)
+			it is reset lazily if the parent has changed since it was filled,
+			as the ephemeris depends on the parent's mass
+		"""
+		parentgen = None if self.parent == None else self.parent.generation
+		if self._cachegen != parentgen:
+			self._cache.clear()
+			self.__dict__["_cachegen"] = parentgen
+		return self._cache
+
 	def __str__(self):
 		return self.name
 
@@ -46,9 +95,12 @@ class Body:
 		minorbith = self.minorbitr() - self.radius
 		if minorbith > 0.0001 * self.radius:
 			rep += " + " + diststr(minorbith)
+		if self.parent != None:
+			rep += ", around " + self.parent.name + " at " + diststr(self.sma)
 
 		return rep
 
+	@cached
 	def mu(self):
 		"""
 		returns
@@ -56,6 +108,76 @@ class Body:
 		"""
 		return G * self.mass
 
+	def soi(self):
+		"""
+		returns
+			radius of the sphere of influence (m), inf for bodies without parent
+		"""
+		if self.parent == None:
+			return inf
+		return self.sma * (self.mass / self.parent.mass) ** 0.4
+
+	def children(self):
+		"""
+		returns
+			list of the bodies that orbit this body
+		"""
+		return [body for body in self.system.bodies.values() if body.parent is self]
+
+	def orbits(self):
+		"""
+		returns
+			list of the orbits around this body that are registered in the system
+		"""
+		return self.system.orbitsof(self)
+
+	@cached
+	def ephemeris(self):
+		"""
+		returns
+			Ephemeris table of the orbit around the parent
+			its span and resolution are configured in the system
+		"""
+		if self.parent == None:
+			raise Exception(self.name + " has no parent")
+
+		from kerbmath.ephemeris import Ephemeris, trueanomaly
+		rp = self.sma * (1 - self.ecc)
+		ra = self.sma * (1 + self.ecc)
+		theta0 = float(trueanomaly(self.meananomaly, self.ecc))
+		return Ephemeris(self.parent.mu(), rp, ra, self.incl, self.omega, self.node, theta0,
+			self.system.ephemspan, self.system.ephemsteps)
+
+	def state(self, t):
+		"""
+		t
+			time or times (s)
+		returns
+			position and velocity relative to the parent (m, m/s; IRF of the parent)
+			from the cached ephemeris table
+		"""
+		if self.parent == None:
+			import numpy as np
+			zero = np.zeros(np.shape(t) + (3,))
+			return zero, zero.copy()
+		return self.ephemeris().state(t)
+
+	def absstate(self, t):
+		"""
+		t
+			time or times (s)
+		returns
+			position and velocity relative to the root of the body hierarchy
+		"""
+		r, v = self.state(t)
+		body = self.parent
+		while body != None and body.parent != None:
+			rparent, vparent = body.state(t)
+			r = r + rparent
+			v = v + vparent
+			body = body.parent
+		return r, v
+
 	def accel(self, r):
 		"""
 		h
@@ -84,34 +206,41 @@ class Body:
 
 		rvector
 			position vector (IRF)
+			or numpy array of N position vectors, shape (N, 3)
 		returns
-			velocity vector (IRF)
+			velocity vector (IRF), or array of shape (N, 3)
 
 		x and y span the equatorial plane (arbitrary orientation)
 		z is the axis of rotation
 		"""
-		#calculate absolute value of r
+		#angular velocity of rotation
+		omega = 2 * pi / self.rotperiod
+		if not isinstance(rvector, tuple):
+			from kerbmath.vectorarray import rotvvector
+			return rotvvector(omega, rvector)
+
 		rx, ry, rz = rvector
-		r = sqrt(rx * rx + ry * ry + rz * rz)
-		#length of radius projected on equator
-		req = sqrt(rx * rx + ry * ry)
-		#angle of radius against equator
-		alpha = atan2(rz, req)
-		#radius of rotation circle
-		rrot = r * cos(alpha)
-		#velocity of rotation
-		vrot = rrot * 2 * pi / self.rotperiod
-		#obviously, the rotation circle is centered around the z axis
-		vz = 0
-		#the velocity vector is 90 degrees ahead of the radius vector on the equatorial plane
-		#hence, the velocity direction vector is given by
-		vx = ry
-		vy = -rx
-		#and finally, scaled
-		vx *= vrot / req
-		vy *= vrot / req
-
-		return vx, vy, vz
+		#the body rotates around the z axis in the same direction as prograde orbits,
+		#so the velocity is omega x r
+		return -omega * ry, omega * rx, 0
+
+	def gravvector(self, rvector):
+		"""
+		calculate the gravitational acceleration vector at a certain position
+
+		rvector
+			position vector (IRF)
+			or numpy array of N position vectors, shape (N, 3)
+		returns
+			acceleration vector (IRF, m/s^2), or array of shape (N, 3)
+		"""
+		if not isinstance(rvector, tuple):
+			from kerbmath.vectorarray import gravity
+			return gravity(self.mu(), rvector)
+
+		from kerbmath import vector
+		r = vector.abs(rvector)
+		return vector.scalarprod(rvector, -self.mu() / (r * r * r))
 
 	def orb(self, hp = None, ha = None, **kw):
 		"""
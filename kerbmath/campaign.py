@@ -0,0 +1,185 @@
+"""
+multi-pass aerobraking
+
+only the atmospheric part of each orbit is integrated numerically; the vacuum
+arc from the atmosphere exit back to the next entry is a Kepler orbit, so it is
+skipped analytically (its duration follows from Kepler's equation)
+"""
+from kerbmath.util import *
+
+class Pass:
+	"""
+	one atmospheric pass of a campaign
+	"""
+	def __init__(self, number, t, duration, hmin, before, after, outcome):
+		"""
+		number
+			pass number, starting at 1
+		t
+			campaign time at atmospheric entry (s)
+		duration
+			time in the atmosphere (s)
+		hmin
+			minimum height over surface (m)
+		before
+			Orbit before the pass
+		after
+			Orbit after the pass, or None if the vessel did not leave the atmosphere
+		outcome
+			outcome of the pass, see trajectory.aerobrakesteps
+		"""
+		self.__dict__.update(locals())
+		del self.__dict__["self"]
+
+	def drp(self):
+		"""
+		returns
+			change of the periapsis (m), nan if the vessel did not leave the atmosphere
+		"""
+		if self.after == None:
+			return nan
+		return self.after.rp - self.before.rp
+
+	def dra(self):
+		"""
+		returns
+			change of the apoapsis (m), nan if the vessel did not leave the atmosphere
+		"""
+		if self.after == None:
+			return nan
+		return self.after.ra - self.before.ra
+
+	def __repr__(self):
+		rep = "pass %3d at %s: %s in atmosphere, hmin = %s" % (self.number, timestr(self.t), timestr(self.duration), diststr(self.hmin))
+		if self.after == None:
+			return rep + ", " + self.outcome
+		return rep + ", ha %s -> %s, hp %s -> %s" % (
+			diststr(self.before.ra - self.before.body.radius), diststr(self.after.ra - self.after.body.radius),
+			diststr(self.before.rp - self.before.body.radius), diststr(self.after.rp - self.after.body.radius))
+
+class Campaign:
+	"""
+	result of an aerobraking campaign
+	"""
+	def __init__(self, body, passes, outcome, finalorbit, time):
+		"""
+		body
+			central body
+		passes
+			list of Pass objects
+		outcome
+			why the campaign ended:
+			"target"      the apoapsis reached the target
+			"maxpasses"   the maximum number of passes was done
+			"decayed"     the orbit lies completely within the atmosphere
+			"escaped"     the vessel left on an escape trajectory
+			"crashed", "timeout"
+			              outcome of the last pass
+		finalorbit
+			the orbit after the last pass that left the atmosphere (unregistered),
+			or None if no pass left the atmosphere
+		time
+			campaign time (s) at the end of the last pass
+		"""
+		self.body = body
+		self.passes = passes
+		self.outcome = outcome
+		self.finalorbit = finalorbit
+		self.time = time
+
+	def __len__(self):
+		return len(self.passes)
+
+	def __repr__(self):
+		rep = "Campaign: " + self.body.name + ", " + self.outcome + " after " + str(len(self)) + " passes"
+		rep += " and " + timestr(self.time)
+		if self.finalorbit != None:
+			rep += ", final: " + repr(self.finalorbit)
+		return "\n".join([rep] + [repr(p) for p in self.passes])
+
+def coasttime(orb, r):
+	"""
+	orb
+		elliptic orbit
+	r
+		distance from center of mass (m), between the apsides
+	returns
+		time (s) from the outbound to the inbound crossing of r, passing the apoapsis
+	"""
+	e = orb.e()
+	costheta = min(1, max(-1, (orb.rp * (1 + e) / r - 1) / e)) if e > 0 else 1
+	theta = acos(costheta)
+	#eccentric and mean anomaly at the outbound crossing
+	ecc = 2 * atan2(sqrt(1 - e) * sin(theta / 2), sqrt(1 + e) * cos(theta / 2))
+	m = ecc - e * sin(ecc)
+	return orb.period() * (1 - m / pi)
+
+def aerobrakecampaign(orb, d = 0.2, maxpasses = 50, ratarget = None, rtol = 1e-9, atol = 1e-6, tmax = 86400):
+	"""
+	simulate repeated aerobraking passes
+
+	orb
+		the initial orbit; must partially lie within the atmosphere
+	d
+		drag coefficient
+	maxpasses
+		maximum number of passes
+	ratarget
+		if given, the campaign ends once the apoapsis (height over center of mass, m) is at most this
+	rtol, atol
+		integration tolerances
+	tmax
+		maximum simulated time per pass (s)
+	returns
+		Campaign
+	"""
+	from kerbmath.orbit import Orbit
+	from kerbmath.elements import stateelements
+	from kerbmath.trajectory import aerobrakesteps
+
+	body = orb.body
+	entryr = body.radius + body.atm.cutoff
+	if orb.rp > entryr:
+		raise Exception("Orbit outside atmosphere")
+
+	passes = []
+	t = 0
+	outcome = "maxpasses"
+	finalorbit = None
+	while len(passes) < maxpasses:
+		steps = aerobrakesteps(orb, d, rtol, atol, tmax)
+		hmin = inf
+		while True:
+			try:
+				tpass, y = next(steps)
+			except StopIteration as stop:
+				passoutcome = stop.value
+				break
+			hmin = min(hmin, sqrt(y[0] * y[0] + y[1] * y[1] + y[2] * y[2]) - body.radius)
+
+		after = None
+		if passoutcome == "exited":
+			rp, ra, incl, omega = stateelements(body.mu(), y[:3], y[3:])
+			after = Orbit.fromapsides(body, float(rp), float(ra), float(incl), float(omega), register = False)
+
+		passes.append(Pass(len(passes) + 1, t, tpass, hmin, orb, after, passoutcome))
+		t += tpass
+
+		if after == None:
+			outcome = passoutcome
+			break
+		orb = finalorbit = after
+		if orb.ra < 0 or orb.ra > body.soi():
+			outcome = "escaped"
+			break
+		if ratarget != None and orb.ra <= ratarget:
+			outcome = "target"
+			break
+		if orb.ra <= entryr:
+			outcome = "decayed"
+			break
+
+		#the vacuum arc back to the next entry
+		t += coasttime(orb, entryr)
+
+	return Campaign(body, passes, outcome, finalorbit, t)
@@ -0,0 +1,317 @@
+"""
+columnar binary storage of bodies and orbits
+
+a catalog is a directory of .npy files:
+	bodies.npy         one record per body (BODYDTYPE, parents before children)
+	orbit-<col>.npy    one file per orbit column (name and ORBITFIELDS), all sorted by name;
+	                   unnamed (unregistered) orbits have the name ""
+	atm-<body>.npy     sample table of each TableAtmosphere (ATMDTYPE)
+
+each orbit column is memory-mapped when it is first used, so even huge catalogs
+open instantly, and queries only read the columns that they need;
+Orbit objects are only built for the entries that are accessed
+"""
+import itertools
+import os
+import numpy as np
+
+from kerbmath.util import *
+
+BODYDTYPE = [
+	("mass", "<f8"), ("radius", "<f8"), ("maxelev", "<f8"), ("rotperiod", "<f8"),
+	("parent", "<i4"), ("sma", "<f8"), ("ecc", "<f8"), ("incl", "<f8"), ("omega", "<f8"),
+	("node", "<f8"), ("meananomaly", "<f8"),
+	#0: exponential Atmosphere, 1: TableAtmosphere
+	("atmkind", "<i1"), ("cutoff", "<f8"), ("scaleh", "<f8"), ("p0", "<f8"), ("rho0", "<f8"),
+]
+
+ORBITFIELDS = [("body", "<i4"), ("rp", "<f8"), ("ra", "<f8"), ("incl", "<f8"), ("omega", "<f8")]
+
+ATMDTYPE = np.dtype([("h", "<f8"), ("p", "<f8"), ("rho", "<f8")])
+
+def columnfile(dirname, column):
+	"""
+	returns
+		path of the file of an orbit column
+	"""
+	return os.path.join(dirname, "orbit-" + column + ".npy")
+
+def namedtype(names):
+	"""
+	returns
+		fixed-width unicode dtype that fits all names
+	"""
+	return "<U" + str(max([len(name) for name in names] + [1]))
+
+def save(system, dirname, orbits = None, prefix = "orb"):
+	"""
+	write bodies and orbits to a catalog directory
+
+	system
+		the System whose bodies are saved
+	dirname
+		catalog directory; created if needed, existing catalog files are overwritten
+	orbits
+		iterable of Orbit and OrbitArray objects; defaults to all orbits of the system
+		the entries of OrbitArrays are named prefix0, prefix1, ..., skipping the names of the orbits
+	prefix
+		name prefix for OrbitArray entries
+	returns
+		number of saved orbits
+	"""
+	from kerbmath.atmosphere import TableAtmosphere
+	from kerbmath.orbitarray import OrbitArray
+
+	os.makedirs(dirname, exist_ok = True)
+
+	#parents first, so that loading can create the bodies in order
+	bodies = []
+	def addbody(body):
+		if body in bodies:
+			return
+		if body.parent != None:
+			addbody(body.parent)
+		bodies.append(body)
+	for body in system.bodies.values():
+		addbody(body)
+	bodyidx = {body.name: idx for idx, body in enumerate(bodies)}
+
+	table = np.zeros(len(bodies), dtype = [("name", namedtype([body.name for body in bodies]))] + BODYDTYPE)
+	for idx, body in enumerate(bodies):
+		atm = body.atm
+		table[idx] = (body.name, body.mass, body.radius, body.maxelev, body.rotperiod,
+			-1 if body.parent == None else bodyidx[body.parent.name],
+			nan if body.sma == None else body.sma, body.ecc, body.incl, body.omega,
+			body.node, body.meananomaly,
+			1 if isinstance(atm, TableAtmosphere) else 0, atm.cutoff, atm.scaleh, atm.p0, atm.rho0)
+		if isinstance(atm, TableAtmosphere):
+			samples = np.empty(len(atm.heights), dtype = ATMDTYPE)
+			samples["h"] = atm.heights
+			samples["p"] = np.exp(atm.logp)
+			samples["rho"] = np.exp(atm.logrho)
+			np.save(os.path.join(dirname, "atm-" + body.name + ".npy"), samples)
+	np.save(os.path.join(dirname, "bodies.npy"), table)
+
+	#collect the orbit columns; OrbitArrays first, then the single orbits
+	if orbits == None:
+		orbits = system.orbits.values()
+	orbits = list(orbits)
+	#names of the OrbitArray entries skip those of the single orbits
+	used = {orb.name for orb in orbits if not isinstance(orb, OrbitArray)}
+	counter = itertools.count()
+	names = []
+	columns = {field: [] for field, dtype in ORBITFIELDS}
+	scalars = []
+	for orb in orbits:
+		if isinstance(orb, OrbitArray):
+			for i in range(len(orb)):
+				name = prefix + str(next(counter))
+				while name in used:
+					name = prefix + str(next(counter))
+				names.append(name)
+			columns["body"].append(np.full(len(orb), bodyidx[orb.body.name]))
+			for field in ("rp", "ra", "incl", "omega"):
+				columns[field].append(getattr(orb, field))
+		else:
+			scalars.append(orb)
+	if scalars:
+		names.extend("" if orb.name == None else orb.name for orb in scalars)
+		columns["body"].append(np.array([bodyidx[orb.body.name] for orb in scalars]))
+		for field in ("rp", "ra", "incl", "omega"):
+			columns[field].append(np.array([getattr(orb, field) for orb in scalars], dtype = float))
+
+	names = np.array(names, dtype = namedtype(names))
+	#sorted by name, so that names can be looked up by binary search
+	order = np.argsort(names, kind = "stable")
+	names = names[order]
+	duplicate = names[1:] == names[:-1]
+	if np.any(duplicate & (names[1:] != "")):
+		raise Exception("Orbit names must be unique")
+
+	np.save(columnfile(dirname, "name"), names)
+	for field, dtype in ORBITFIELDS:
+		if columns[field]:
+			column = np.concatenate(columns[field]).astype(dtype)
+		else:
+			column = np.empty(0, dtype = dtype)
+		np.save(columnfile(dirname, field), column[order])
+
+	return len(names)
+
+def load(system, dirname):
+	"""
+	read a catalog directory
+
+	the bodies are (re-)created in the system, as by System.readconf;
+	the orbit columns are memory-mapped on first use and the orbits are not registered
+
+	system
+		the System that receives the bodies
+	dirname
+		catalog directory
+	returns
+		Catalog of the orbits
+	"""
+	from kerbmath.atmosphere import Atmosphere, TableAtmosphere
+
+	table = np.load(os.path.join(dirname, "bodies.npy"))
+	bodies = []
+	for rec in table:
+		name = str(rec["name"])
+		if rec["atmkind"] == 1:
+			samples = np.load(os.path.join(dirname, "atm-" + name + ".npy"))
+			atm = TableAtmosphere(float(rec["cutoff"]), samples["h"], samples["p"], samples["rho"])
+		else:
+			atm = Atmosphere(float(rec["cutoff"]), float(rec["scaleh"]), float(rec["p0"]), float(rec["rho0"]))
+
+		kw = {}
+		if rec["parent"] >= 0:
+			kw["parent"] = bodies[rec["parent"]]
+			kw["sma"] = float(rec["sma"])
+		for field in ("ecc", "incl", "omega", "node", "meananomaly"):
+			kw[field] = float(rec[field])
+
+		bodies.append(system.Body(name, float(rec["mass"]), float(rec["radius"]),
+			maxelev = float(rec["maxelev"]), rotperiod = float(rec["rotperiod"]), atm = atm, **kw))
+
+	system.buildephemeris()
+
+	return Catalog(bodies, Columns(dirname))
+
+class Columns(dict):
+	"""
+	the orbit columns of a catalog directory, memory-mapped on first access
+	"""
+	def __init__(self, dirname):
+		self.dirname = dirname
+
+	def __missing__(self, column):
+		if column != "name" and column not in dict(ORBITFIELDS):
+			raise KeyError(column)
+		self[column] = np.load(columnfile(self.dirname, column), mmap_mode = "r")
+		return self[column]
+
+class Catalog:
+	"""
+	memory-mapped orbit columns, as returned by load()
+
+	entries are accessed by name or position; Orbit objects are built on first access
+	"""
+	def __init__(self, bodies, columns):
+		"""
+		bodies
+			list of the bodies, in the order of the body indices of the columns
+		columns
+			Columns, or dict of the name and ORBITFIELDS columns, sorted by name
+		"""
+		self.bodies = bodies
+		self.columns = columns
+		#position: Orbit
+		self.built = {}
+
+	def __len__(self):
+		return len(self.columns["body"])
+
+	def __repr__(self):
+		return "Catalog: " + str(len(self)) + " orbits around " + ", ".join(body.name for body in self.bodies)
+
+	def index(self, name):
+		"""
+		name
+			orbit name
+		returns
+			position of the orbit in the catalog, by binary search of the name column
+		"""
+		names = self.columns["name"]
+		idx = int(np.searchsorted(names, name))
+		if name == "" or idx >= len(names) or names[idx] != name:
+			raise KeyError(name)
+		return idx
+
+	def __contains__(self, name):
+		try:
+			self.index(name)
+			return True
+		except KeyError:
+			return False
+
+	def __getitem__(self, key):
+		"""
+		key
+			orbit name or position
+		returns
+			the (unregistered) Orbit
+		"""
+		if isinstance(key, str):
+			key = self.index(key)
+		if key < 0:
+			key += len(self)
+
+		orb = self.built.get(key)
+		if orb == None:
+			from kerbmath.orbit import Orbit
+			rec = {column: self.columns[column][key] for column in ("name", "body", "rp", "ra", "incl", "omega")}
+			orb = Orbit.fromapsides(self.bodies[rec["body"]], float(rec["rp"]), float(rec["ra"]),
+				float(rec["incl"]), float(rec["omega"]), name = str(rec["name"]) or None, register = False)
+			self.built[key] = orb
+		return orb
+
+	def select(self, body = None, mask = None):
+		"""
+		body
+			if given (body or name), only orbits around this body are selected
+		mask
+			boolean array over the whole catalog, or a function of the columns that returns one,
+			such as lambda c: c["ra"] > 1e7 (which only reads the ra column)
+		returns
+			array of the positions of the selected orbits
+		"""
+		selected = np.ones(len(self), dtype = bool)
+		if body != None:
+			if not isinstance(body, str):
+				body = body.name
+			idx = [body.name for body in self.bodies].index(body)
+			selected &= self.columns["body"] == idx
+		if mask is not None:
+			if callable(mask):
+				mask = mask(self.columns)
+			selected &= mask
+		return np.flatnonzero(selected)
+
+	def array(self, body, mask = None):
+		"""
+		body
+			the central body (body or name)
+		mask
+			see select
+		returns
+			OrbitArray of the selected orbits around the body, read directly from the columns
+		"""
+		from kerbmath.orbitarray import OrbitArray
+		idx = self.select(body, mask)
+		if isinstance(body, str):
+			body = self.bodies[[b.name for b in self.bodies].index(body)]
+		return OrbitArray(body, self.columns["rp"][idx], self.columns["ra"][idx],
+			self.columns["incl"][idx], self.columns["omega"][idx])
+
+	def register(self, idx = None):
+		"""
+		build Orbit objects and register them in the system
+
+		idx
+			positions (e.g. from select); defaults to all orbits
+		returns
+			list of the orbits
+			orbits that are already registered are kept as they are, so their names do not change
+		"""
+		if idx is None:
+			idx = range(len(self))
+		orbits = [self[int(i)] for i in idx]
+		if orbits:
+			system = orbits[0].body.system
+			new = {}
+			for orb in orbits:
+				if orb.name == None or system.orbits.get(orb.name) is not orb:
+					new[id(orb)] = orb
+			system.addorbs(new.values())
+		return orbits
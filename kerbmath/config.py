@@ -0,0 +1,134 @@
+"""
+declarative system configuration
+
+one section per body; the keys are the arguments of Body.__init__,
+atmosphere parameters are prefixed with 'atm.':
+
+	[kerbin]
+	mass        = 5.2915793e22
+	radius      = 600000
+	parent      = sun
+	sma         = 13599840256
+	atm.cutoff  = 69077.553
+	atm.scaleh  = 5000
+	atm.p0      = 10100
+	atm.rho0    = 0.00978475884
+
+instead of atm.scaleh/p0/rho0, 'atm.table' may name a sample file for
+TableAtmosphere.fromfile (relative to the config file).
+
+the parsed form is cached next to the config file, keyed by its
+modification time and size, so unchanged configs are not parsed again.
+"""
+import os
+
+#bump when the layout of the compiled representation changes
+VERSION = 1
+
+BODYKEYS = ("mass", "radius", "maxelev", "rotperiod", "parent", "sma", "ecc", "incl", "omega", "node", "meananomaly")
+ATMKEYS = ("cutoff", "scaleh", "p0", "rho0", "table")
+
+def parse(conffile):
+	"""
+	conffile
+		path of the declarative config file
+	returns
+		dict of body name: dict of Body arguments, in file order;
+		the atmosphere arguments are in the sub-dict 'atm', the parent is given by name
+	"""
+	import configparser
+	parser = configparser.ConfigParser(interpolation = None, inline_comment_prefixes = ("#", ";"))
+	#keys are case-sensitive
+	parser.optionxform = str
+	with open(conffile) as f:
+		parser.read_file(f)
+
+	confdir = os.path.dirname(os.path.abspath(conffile))
+	specs = {}
+	for name in parser.sections():
+		spec = {}
+		atm = {}
+		for key, val in parser.items(name):
+			if key.startswith("atm."):
+				key = key[4:]
+				if key not in ATMKEYS:
+					raise Exception(conffile + ": unknown atmosphere parameter for " + name + ": " + key)
+				if key == "table":
+					atm[key] = os.path.join(confdir, val)
+				else:
+					atm[key] = float(val)
+			elif key in BODYKEYS:
+				if key == "parent":
+					spec[key] = val
+				else:
+					spec[key] = float(val)
+			else:
+				raise Exception(conffile + ": unknown parameter for " + name + ": " + key)
+
+		for key in ("mass", "radius"):
+			if key not in spec:
+				raise Exception(conffile + ": " + name + " has no " + key)
+		if atm:
+			spec["atm"] = atm
+		specs[name] = spec
+
+	for name, spec in specs.items():
+		if "parent" in spec and spec["parent"] not in specs:
+			raise Exception(conffile + ": parent of " + name + " is unknown: " + spec["parent"])
+
+	return specs
+
+def cachefile(conffile):
+	"""
+	returns
+		path of the cache of a config file: .<name>.cache in the same directory
+	"""
+	dirname, basename = os.path.split(conffile)
+	return os.path.join(dirname, "." + basename + ".cache")
+
+def compiled(conffile):
+	"""
+	the parsed config, from the cache if it is up to date
+
+	conffile
+		path of the declarative config file
+	returns
+		see parse
+	"""
+	import pickle
+	stat = os.stat(conffile)
+	key = (VERSION, stat.st_mtime_ns, stat.st_size)
+	cache = cachefile(conffile)
+
+	try:
+		with open(cache, "rb") as f:
+			cachedkey, specs = pickle.load(f)
+		if cachedkey == key:
+			return specs
+	except Exception:
+		#missing, unreadable or outdated cache
+		pass
+
+	specs = parse(conffile)
+	try:
+		with open(cache, "wb") as f:
+			pickle.dump((key, specs), f, protocol = pickle.HIGHEST_PROTOCOL)
+	except OSError:
+		#read-only directory; the cache is optional
+		pass
+
+	return specs
+
+def makeatmosphere(spec):
+	"""
+	spec
+		dict of atmosphere parameters, as in the 'atm' entry of parse results
+	returns
+		Atmosphere or TableAtmosphere
+	"""
+	from kerbmath.atmosphere import Atmosphere, TableAtmosphere
+	spec = dict(spec)
+	table = spec.pop("table", None)
+	if table != None:
+		return TableAtmosphere.fromfile(table, spec.get("cutoff"))
+	return Atmosphere(**spec)
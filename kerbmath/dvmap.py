@@ -0,0 +1,230 @@
+"""
+delta-v map of a system
+
+a weighted, directed graph whose nodes are named '<body>.<state>':
+	surface    landed at the equator
+	low        lowest stable circular orbit (Body.minorbit)
+	capture    elliptic orbit from the low orbit radius up to the sphere of influence
+	transfer   Hohmann transfer orbit from the low orbit of the parent to the body
+
+edges are the dv (m/s) of the maneuvers between these states;
+ascents are ideal impulsive burns, without gravity or drag losses
+"""
+import heapq
+
+from kerbmath.util import *
+from kerbmath.orbit import Orbit
+
+def circv(body, r):
+	"""
+	returns
+		velocity of a circular orbit with radius r (m/s)
+	"""
+	return sqrt(body.mu() / r)
+
+def bodyedges(body):
+	"""
+	body
+		the body
+	returns
+		list of (from, to, dv) for all maneuvers that involve this body
+		and, for the transfer, its parent
+	"""
+	name = body.name
+	lowr = body.minorbitr()
+	vlow = circv(body, lowr)
+	edges = []
+
+	#surface <-> low orbit
+	#ascent: Hohmann from the surface to the low orbit, minus the rotation of the surface
+	vrot = 2 * pi * body.radius / body.rotperiod
+	ascent = Orbit.fromapsides(body, body.radius, lowr, register = False)
+	ascentdv = (ascent.vp() - vrot) + (vlow - ascent.va())
+	edges.append((name + ".surface", name + ".low", ascentdv))
+	if body.atm.cutoff > 0:
+		#landing needs only a deorbit burn into the atmosphere, the rest is aerobraking
+		descent = Orbit.fromapsides(body, body.radius + body.atm.cutoff / 2, lowr, register = False)
+		edges.append((name + ".low", name + ".surface", vlow - descent.va()))
+	else:
+		edges.append((name + ".low", name + ".surface", ascentdv))
+
+	if body.parent == None:
+		return edges
+
+	#low orbit <-> capture orbit
+	capture = Orbit.fromapsides(body, lowr, body.soi(), register = False)
+	circdv = capture.vp() - vlow
+	edges.append((name + ".low", name + ".capture", circdv))
+	edges.append((name + ".capture", name + ".low", circdv))
+
+	#capture orbit <-> transfer orbit
+	#the transfer orbit arrives at the body's orbit with vinf relative to the body
+	parent = body.parent
+	parentlowr = parent.minorbitr()
+	transfer = Orbit.fromapsides(parent, parentlowr, body.sma, register = False)
+	vinf = abs(circv(parent, body.sma) - transfer.va())
+	hyperbolavp = sqrt(vinf * vinf + 2 * body.mu() / lowr)
+	capturedv = hyperbolavp - capture.vp()
+	edges.append((name + ".transfer", name + ".capture", capturedv))
+	edges.append((name + ".capture", name + ".transfer", capturedv))
+
+	#low orbit of the parent <-> transfer orbit
+	transferdv = transfer.vp() - circv(parent, parentlowr)
+	edges.append((parent.name + ".low", name + ".transfer", transferdv))
+	edges.append((name + ".transfer", parent.name + ".low", transferdv))
+
+	return edges
+
+def edgekey(body):
+	"""
+	returns
+		tuple of all values that the edges of the body depend on
+	"""
+	key = (body.mass, body.radius, body.maxelev, body.rotperiod, body.atm.cutoff)
+	if body.parent == None:
+		return key
+	return key + (body.sma, body.parent.name, edgekey(body.parent)[:5])
+
+class DvMap:
+	"""
+	delta-v graph of all bodies of a system
+
+	edges are kept per body and recomputed only for bodies that were changed;
+	the all-pairs shortest path tables are recomputed lazily on the next query
+	after any change
+	"""
+	def __init__(self, system):
+		"""
+		system
+			the System whose bodies are mapped
+		"""
+		self.system = system
+		#body name: (key, edge list)
+		self.bodyedges = {}
+		#source node: (dist dict, predecessor dict)
+		self.paths = None
+
+	def update(self):
+		"""
+		recompute the edges of all bodies that were changed since the last update
+
+		bodies are compared by the values that their edges depend on, so bodies
+		that were re-created unchanged (e.g. by System.readconf) keep their edges
+
+		returns
+			list of the names of the bodies whose edges were recomputed
+		"""
+		changed = []
+		bodies = self.system.bodies
+
+		for name in list(self.bodyedges):
+			if name not in bodies:
+				del self.bodyedges[name]
+				changed.append(name)
+
+		for name, body in bodies.items():
+			key = edgekey(body)
+			old = self.bodyedges.get(name)
+			if old != None and old[0] == key:
+				continue
+
+			self.bodyedges[name] = (key, bodyedges(body))
+			changed.append(name)
+
+		if changed:
+			self.paths = None
+
+		return changed
+
+	def edges(self):
+		"""
+		returns
+			dict of node: list of (neighbour, dv)
+		"""
+		self.update()
+		graph = {}
+		for key, edges in self.bodyedges.values():
+			for src, dst, dv in edges:
+				graph.setdefault(src, []).append((dst, dv))
+				graph.setdefault(dst, [])
+		return graph
+
+	def nodes(self):
+		"""
+		returns
+			sorted list of all node names
+		"""
+		return sorted(self.edges())
+
+	def dijkstra(self, graph, source):
+		"""
+		graph
+			adjacency dict as returned by edges()
+		source
+			source node
+		returns
+			dist dict, predecessor dict
+		"""
+		dist = {source: 0}
+		prev = {}
+		queue = [(0, source)]
+		while queue:
+			d, node = heapq.heappop(queue)
+			if d > dist[node]:
+				continue
+			for neighbour, dv in graph[node]:
+				nd = d + dv
+				if nd < dist.get(neighbour, inf):
+					dist[neighbour] = nd
+					prev[neighbour] = node
+					heapq.heappush(queue, (nd, neighbour))
+		return dist, prev
+
+	def allpairs(self):
+		"""
+		returns
+			the cached all-pairs shortest path tables, computing them if needed
+		"""
+		self.update()
+		if self.paths == None:
+			graph = self.edges()
+			self.paths = {source: self.dijkstra(graph, source) for source in graph}
+		return self.paths
+
+	def route(self, src, dst):
+		"""
+		src
+			start node, such as 'kerbin.surface'
+		dst
+			destination node, such as 'mun.surface'
+		returns
+			total dv (m/s), list of nodes along the cheapest route
+		"""
+		paths = self.allpairs()
+		if src not in paths:
+			raise Exception("Unknown node: " + src)
+		dist, prev = paths[src]
+		if dst not in dist:
+			if dst not in paths:
+				raise Exception("Unknown node: " + dst)
+			raise Exception("No route from " + src + " to " + dst)
+
+		path = [dst]
+		while path[-1] != src:
+			path.append(prev[path[-1]])
+		path.reverse()
+
+		return dist[dst], path
+
+	def routestr(self, src, dst):
+		"""
+		returns
+			human-readable description of the cheapest route
+		"""
+		dv, path = self.route(src, dst)
+		graph = self.edges()
+		legs = []
+		for a, b in zip(path, path[1:]):
+			legdv = min(d for n, d in graph[a] if n == b)
+			legs.append(a + " -> " + b + ": " + velstr(legdv))
+		return "\n".join(legs + ["total: " + velstr(dv)])
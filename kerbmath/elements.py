@@ -0,0 +1,135 @@
+"""
+conversion of state vectors to orbital elements
+
+uses the same IRF convention as Orbit.rvector and Orbit.vvector:
+	z points north
+	the ascending node lies on the x axis
+"""
+import numpy as np
+
+from kerbmath.util import *
+
+def wrap360(deg):
+	"""
+	returns
+		angles (deg) in [0, 360); unlike % 360 alone, tiny negative angles do not become 360
+	"""
+	deg = deg % 360
+	return np.where(deg >= 360, deg - 360, deg)
+
+def stateelements(mu, vr, vv, full = False):
+	"""
+	mu
+		gravitational parameter of the central body (m^3/s^2)
+	vr
+		position vectors (IRF, m), shape (..., 3)
+	vv
+		velocity vectors (IRF, m/s), shape (..., 3)
+	full
+		also return eccentricity, node and true anomaly
+	returns
+		rp, ra, incl, omega as arrays of shape (...)
+		if full, followed by e, node, theta
+		ra follows the Orbit convention (negative for escape trajectories)
+
+	the angles (deg) are well-defined in all cases:
+		node is the longitude of the ascending node (from the x axis);
+		for equatorial orbits, there is no node and it is 0
+		omega is measured from the ascending node, in the direction of motion;
+		for equatorial orbits from the x axis, for circular orbits it is 0
+		theta is measured from periapsis, in the direction of motion;
+		for circular orbits from the node (equatorial: from the x axis)
+	"""
+	vr = np.asarray(vr, dtype = float)
+	vv = np.asarray(vv, dtype = float)
+
+	r = np.linalg.norm(vr, axis = -1)
+	vh = np.cross(vr, vv)
+	h = np.linalg.norm(vh, axis = -1)
+
+	#eccentricity vector, pointing towards periapsis
+	ve = np.cross(vv, vh) / mu - vr / r[..., None]
+	e = np.linalg.norm(ve, axis = -1)
+
+	espec = 0.5 * np.einsum("...i,...i", vv, vv) - mu / r
+	rp = h * h / (mu * (1 + e))
+	with np.errstate(divide = "ignore"):
+		a = -mu / (2 * espec)
+	ra = np.where(espec < 0, 2 * a - rp, -inf)
+	ra = np.where(espec > 0, 2 * a - rp, ra)
+
+	#the ascending node is where the orbit crosses the equator northwards
+	vn = np.stack((-vh[..., 1], vh[..., 0], np.zeros_like(h)), axis = -1)
+	n = np.linalg.norm(vn, axis = -1)
+	#atan2 is accurate close to 0 and 180 degrees, unlike arccos
+	incl = np.degrees(np.arctan2(n, vh[..., 2]))
+
+	#equatorial orbits have no node; measure from the x axis instead
+	equatorial = n <= 1e-12 * h
+	with np.errstate(invalid = "ignore", divide = "ignore"):
+		vn = np.where(equatorial[..., None], (1, 0, 0), vn / n[..., None])
+		vh = vh / h[..., None]
+
+	def angle(vfrom, vto):
+		#angle from vfrom to vto, in the direction of motion (deg, 0 to 360)
+		cos = np.einsum("...i,...i", vfrom, vto)
+		sin = np.einsum("...i,...i", vh, np.cross(vfrom, vto))
+		return wrap360(np.degrees(np.arctan2(sin, cos)))
+
+	#circular orbits have no periapsis; it is placed at the node
+	circular = e <= 1e-12
+	omega = np.where(circular, 0, angle(vn, ve))
+
+	if not full:
+		return rp, ra, incl, omega
+
+	node = np.where(equatorial, 0, wrap360(np.degrees(np.arctan2(vn[..., 1], vn[..., 0]))))
+	vp = np.where(circular[..., None], vn, ve)
+	theta = angle(vp, vr)
+
+	return rp, ra, incl, omega, e, node, theta
+
+def elementstate(mu, rp, ra, incl, omega, theta):
+	"""
+	mu
+		gravitational parameter of the central body (m^3/s^2)
+	rp
+		heights of periapsis above center of mass (m)
+	ra
+		heights of apoapsis above center of mass (m, Orbit convention)
+	incl
+		inclinations (deg)
+	omega
+		arguments of periapsis (deg)
+	theta
+		true anomalies (deg, 0: periapsis)
+	returns
+		position and velocity vectors (IRF), each of shape (..., 3)
+
+	all arguments are broadcast against each other
+	"""
+	rp, ra, incl, omega, theta = np.broadcast_arrays(rp, ra, incl, omega, theta)
+	q = rp / ra
+	e = (1 - q) / (1 + q)
+	p = rp * (1 + e)
+
+	theta = np.radians(theta)
+	omega = np.radians(omega)
+	incl = np.radians(incl)
+	u = theta + omega
+
+	r = p / (1 + e * np.cos(theta))
+	x = r * np.cos(u)
+	y = r * np.sin(u)
+
+	vscale = np.sqrt(mu / p)
+	vx = -vscale * (np.sin(u) + e * np.sin(omega))
+	vy = vscale * (np.cos(u) + e * np.cos(omega))
+
+	#the inclination distributes the y components among y and z
+	cosi = np.cos(incl)
+	sini = np.sin(incl)
+	vr = np.stack((x, y * cosi, y * sini), axis = -1)
+	vv = np.stack((vx, vy * cosi, vy * sini), axis = -1)
+
+	return vr, vv
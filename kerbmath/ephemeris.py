@@ -0,0 +1,116 @@
+"""
+precomputed ephemeris tables
+
+a table stores positions, velocities and accelerations at equidistant epochs;
+lookups are O(1) cubic Hermite interpolations between two table entries
+"""
+import numpy as np
+
+from kerbmath.util import *
+from kerbmath.propagate import propagate
+
+def trueanomaly(m, e):
+	"""
+	m
+		mean anomalies (deg)
+	e
+		eccentricities (< 1)
+	returns
+		true anomalies (deg)
+	"""
+	m = np.radians(np.asarray(m, dtype = float))
+	e = np.asarray(e, dtype = float)
+
+	ecc = m + e * np.sin(m)
+	for i in range(50):
+		f = ecc - e * np.sin(ecc) - m
+		delta = f / (1 - e * np.cos(ecc))
+		ecc = ecc - delta
+		if np.max(np.abs(delta)) < 1e-14:
+			break
+
+	half = ecc / 2
+	return np.degrees(2 * np.arctan2(np.sqrt(1 + e) * np.sin(half), np.sqrt(1 - e) * np.cos(half)))
+
+class Ephemeris:
+	"""
+	ephemeris table of one elliptic orbit
+	"""
+	def __init__(self, mu, rp, ra, incl, omega, node, theta0, span = None, steps = 4096):
+		"""
+		mu
+			gravitational parameter of the central body (m^3/s^2)
+		rp, ra, incl, omega
+			orbital elements as in Orbit
+		node
+			longitude of the ascending node (deg)
+		theta0
+			true anomaly at t = 0 (deg)
+		span
+			(t0, t1) time span of the table (s)
+			if None, the table covers one period, and is used periodically for all times
+		steps
+			number of table intervals
+		"""
+		if not ra > 0:
+			raise Exception("Ephemeris tables need elliptic orbits")
+
+		self.mu = mu
+		self.elements = (rp, ra, incl, omega, theta0, node)
+		self.period = 2 * pi * sqrt(((rp + ra) / 2) ** 3 / mu)
+
+		self.periodic = span == None
+		if self.periodic:
+			span = (0, self.period)
+		self.t0, self.t1 = span
+		self.dt = (self.t1 - self.t0) / steps
+
+		times = np.linspace(self.t0, self.t1, steps + 1)
+		r, v = propagate(mu, rp, ra, incl, omega, times, theta0, node)
+		self.r = r[0]
+		self.v = v[0]
+		rn = np.linalg.norm(self.r, axis = 1)
+		self.a = self.r * (-mu / rn ** 3)[:, None]
+
+	def state(self, t):
+		"""
+		t
+			time or times (s)
+		returns
+			position and velocity (relative to the central body, m and m/s), each of shape t.shape + (3,)
+			times outside the table span are propagated directly
+		"""
+		t = np.asarray(t, dtype = float)
+		if self.periodic:
+			t = np.remainder(t - self.t0, self.period) + self.t0
+		else:
+			outside = (t < self.t0) | (t > self.t1)
+			if np.any(outside):
+				rp, ra, incl, omega, theta0, node = self.elements
+				tflat = np.ravel(t)
+				r, v = propagate(self.mu, rp, ra, incl, omega, tflat, theta0, node)
+				return r[0].reshape(t.shape + (3,)), v[0].reshape(t.shape + (3,))
+
+		x = (t - self.t0) / self.dt
+		idx = np.clip(x.astype(np.intp), 0, len(self.r) - 2)
+		s = (x - idx)[..., None]
+		h = self.dt
+
+		s2 = s * s
+		s3 = s2 * s
+		#cubic Hermite basis functions
+		h00 = 2 * s3 - 3 * s2 + 1
+		h10 = s3 - 2 * s2 + s
+		h01 = -2 * s3 + 3 * s2
+		h11 = s3 - s2
+
+		r0, r1 = self.r[idx], self.r[idx + 1]
+		v0, v1 = self.v[idx], self.v[idx + 1]
+		a0, a1 = self.a[idx], self.a[idx + 1]
+
+		#positions are interpolated using the velocities as derivatives,
+		#velocities using the accelerations
+		r = h00 * r0 + h10 * h * v0 + h01 * r1 + h11 * h * v1
+		v = h00 * v0 + h10 * h * a0 + h01 * v1 + h11 * h * a1
+
+		return r, v
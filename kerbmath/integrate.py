@@ -0,0 +1,413 @@
+"""
+adaptive explicit Runge-Kutta integration
+
+the Dormand-Prince 5(4) pair with error control and FSAL,
+working on numpy state arrays of any shape
+
+the continuous extension gives the state anywhere within a step (dense output),
+which is used to locate events: zero crossings of functions of the state
+"""
+import numpy as np
+
+from kerbmath.util import *
+
+#Dormand-Prince tableau
+C = (0, 1/5, 3/10, 4/5, 8/9, 1, 1)
+A = (
+	(),
+	(1/5,),
+	(3/40, 9/40),
+	(44/45, -56/15, 32/9),
+	(19372/6561, -25360/2187, 64448/6561, -212/729),
+	(9017/3168, -355/33, 46732/5247, 49/176, -5103/18656),
+	(35/384, 0, 500/1113, 125/192, -2187/6784, 11/84),
+)
+#5th order weights are the last row of A (FSAL)
+B = A[6]
+#difference between 5th and embedded 4th order weights
+E = (71/57600, 0, -71/16695, 71/1920, -17253/339200, 22/525, -1/40)
+
+#the tableau as arrays, so the stages can be combined as one matrix product
+AMAT = np.array([row + (0,) * (7 - len(row)) for row in A])
+EVEC = np.array(E)
+
+#4th order continuous extension (Hairer, Norsett, Wanner: Solving ODEs I, dopri5)
+D = (-12715105075/11282082432, 0, 87487479700/32700410799, -10690763975/1880347072,
+	701980252875/199316789632, -1453857185/822651844, 69997945/29380423)
+DVEC = np.array(D)
+
+def hermite(y0, f0, y1, f1, h):
+	"""
+	cubic Hermite interpolation within a step, per state
+
+	y0, f0, y1, f1
+		states and their derivatives at the start and end of the step, shape (N, ...)
+	h
+		step size (s)
+	returns
+		function interp(s) of the fractions s of the step for each state, shape (N,),
+		returning the interpolated states (3rd order, new array)
+	"""
+	dy = y1 - y0
+	c1 = h * f0
+	c2 = 3 * dy - h * (2 * f0 + f1)
+	c3 = h * (f0 + f1) - 2 * dy
+	trailing = (1,) * (np.ndim(y0) - 1)
+
+	def interp(s):
+		s = np.reshape(s, (-1,) + trailing)
+		return y0 + s * (c1 + s * (c2 + s * c3))
+
+	return interp
+
+def crossings(fun, lo, hi, tol = 1e-10, maxiter = 50):
+	"""
+	find zero crossings of many functions at once (vectorized Illinois method)
+
+	fun
+		fun(x) returns the function values at x, shape (N,)
+	lo, hi
+		brackets, shape (N,); the values at both ends must have opposite signs
+	tol
+		the iteration stops once no crossing moves by more than this
+	maxiter
+		maximum number of iterations
+	returns
+		the crossings, within their brackets
+	"""
+	lo, hi = (x.copy() for x in np.broadcast_arrays(np.asarray(lo, dtype = float), np.asarray(hi, dtype = float)))
+	glo, ghi = fun(lo), fun(hi)
+	#which end was kept last time, see DormandPrince.locate
+	side = np.zeros(len(lo), dtype = np.int8)
+	x = hi
+	for i in range(maxiter):
+		with np.errstate(divide = "ignore", invalid = "ignore"):
+			xnew = hi - ghi * (hi - lo) / (ghi - glo)
+		xnew = np.where((lo < xnew) & (xnew < hi), xnew, 0.5 * (lo + hi))
+		converged = np.max(np.abs(xnew - x)) <= tol
+		x = xnew
+		if converged:
+			break
+		gx = fun(x)
+		right = (gx > 0) == (ghi > 0)
+		#x replaces hi where it has the sign of hi, else lo
+		glo = np.where(right & (side == -1), 0.5 * glo, glo)
+		ghi = np.where(~right & (side == 1), 0.5 * ghi, ghi)
+		hi = np.where(right, x, hi)
+		ghi = np.where(right, gx, ghi)
+		lo = np.where(right, lo, x)
+		glo = np.where(right, glo, gx)
+		side = np.where(right, -1, 1).astype(np.int8)
+	return x
+
+class Event:
+	"""
+	an event occurs where fun(t, y) crosses zero
+	"""
+	def __init__(self, fun, direction = 0, terminal = False, name = None):
+		"""
+		fun
+			event function fun(t, y) of the time and state, returning a number
+		direction
+			1: only crossings from negative to positive count, -1: only the opposite ones,
+			0: both
+		terminal
+			whether the integration stops at the event
+		name
+			name for reports; defaults to the name of fun
+		"""
+		if name == None:
+			name = fun.__name__
+		self.fun = fun
+		self.direction = direction
+		self.terminal = terminal
+		self.name = name
+
+	def __repr__(self):
+		return "Event: " + self.name + (" (terminal)" if self.terminal else "")
+
+	def crossed(self, g0, g1):
+		"""
+		returns
+			whether the event occurs between the values g0 and g1 of the event function
+		"""
+		if g0 < 0 and g1 >= 0:
+			return self.direction >= 0
+		if g0 > 0 and g1 <= 0:
+			return self.direction <= 0
+		return False
+
+class DormandPrince:
+	"""
+	integrates dy/dt = fun(t, y) step by step
+
+	the error of each step is measured in the maximum norm over all
+	components, so for batched states (N, ...) all cases share one step size
+
+	the stages and states live in preallocated buffers, so steps do not allocate
+	(apart from what fun does). y, f and k stay valid until the next accepted step
+	"""
+	def __init__(self, fun, t, y, rtol = 1e-9, atol = 1e-6, h = None, hmax = inf, inplace = False):
+		"""
+		fun
+			derivative function fun(t, y), returning an array shaped like y
+			or, if inplace, fun(t, y, out), writing the derivative to out
+		t
+			initial time (s)
+		y
+			initial state (array)
+		rtol
+			relative error tolerance per step
+		atol
+			absolute error tolerance per step
+		h
+			initial step size (s); guessed if None
+		hmax
+			maximum step size (s)
+		inplace
+			whether fun writes to an out array instead of returning the derivative
+		"""
+		self.fun = fun
+		self.inplace = inplace
+		self.t = t
+		self.y = np.array(y, dtype = float)
+		self.rtol = rtol
+		self.atol = atol
+		self.hmax = hmax
+		if inplace:
+			self.f = np.empty_like(self.y)
+			fun(t, self.y, self.f)
+		else:
+			self.f = fun(t, self.y)
+		#shape that the buffers are allocated for; states may be replaced by ones of another shape
+		self.bufshape = None
+		#start of the last accepted step, and its dense output coefficients (computed on demand)
+		self.told = t
+		self.yold = self.y
+		self.rcont = None
+		#watched events and the values of their functions at the current state
+		self.events = []
+		self.eventvals = []
+		#the terminal event that stopped the integration, if any
+		self.terminated = None
+		#stages of the last accepted step
+		self.k = None
+		#size of the last accepted step
+		self.hlast = 0
+		#number of rejected steps
+		self.rejected = 0
+
+		if h == None:
+			scale = atol + rtol * np.abs(self.y)
+			d0 = np.max(np.abs(self.y) / scale)
+			d1 = np.max(np.abs(self.f) / scale)
+			if d0 < 1e-5 or d1 < 1e-5:
+				h = 1e-6
+			else:
+				h = 0.01 * d0 / d1
+		self.h = min(h, hmax)
+
+	def step(self, tmax = inf):
+		"""
+		perform one accepted step, retrying with smaller steps as needed
+
+		tmax
+			the step will not go beyond this time
+		returns
+			the new time
+		"""
+		t, y, f = self.t, self.y, self.f
+		self.allocate(y.shape)
+		#the buffers that do not hold the current state and stages
+		#(indexing with ... gives views also for scalar states)
+		k = self.stagebuf[self.parity]
+		ynew = self.ybuf[self.parity, ...]
+		yi, err, scale, coef = self.yi, self.err, self.scale, self.coef
+		kflat = k.reshape(7, -1)
+
+		while True:
+			h = min(self.h, self.hmax, tmax - t)
+
+			k[0] = f
+			for i in range(1, 7):
+				#the stage state y + h * sum(A[i][j] * k[j])
+				stage = ynew if i == 6 else yi
+				np.multiply(AMAT[i, :i], h, out = coef[:i])
+				np.dot(coef[:i], kflat[:i], out = stage.reshape(-1))
+				stage += y
+				if self.inplace:
+					self.fun(t + C[i] * h, stage, k[i, ...])
+				else:
+					k[i] = self.fun(t + C[i] * h, stage)
+
+			np.multiply(EVEC, h, out = coef)
+			np.dot(coef, kflat, out = err.reshape(-1))
+			np.abs(y, out = scale)
+			np.maximum(scale, np.abs(ynew, out = yi), out = scale)
+			scale *= self.rtol
+			scale += self.atol
+			np.abs(err, out = err)
+			err /= scale
+			errnorm = err.max()
+
+			if errnorm <= 1:
+				if errnorm == 0:
+					factor = 5
+				else:
+					factor = min(5, 0.9 * errnorm ** -0.2)
+				self.h = h * factor if h == self.h else max(self.h, h * factor)
+				break
+
+			if not np.isfinite(errnorm):
+				factor = 0.2
+			else:
+				factor = max(0.2, 0.9 * errnorm ** -0.2)
+			self.h = h * factor
+			self.rejected += 1
+
+			if t + self.h == t:
+				raise Exception("Step size underflow at t = " + str(t))
+
+		self.told = t
+		self.yold = y
+		self.rcont = None
+		self.t = t + h
+		self.y = ynew
+		self.f = k[6, ...]
+		self.k = k
+		self.hlast = h
+		self.parity ^= 1
+
+		return self.t
+
+	def dense(self, t):
+		"""
+		t
+			time within the last accepted step
+		returns
+			the interpolated state at t (4th order, new array)
+		"""
+		if self.rcont == None:
+			h = self.hlast
+			k = self.k
+			y0, y1 = self.yold, self.y
+			dy = y1 - y0
+			bspl = h * k[0] - dy
+			self.rcont = (y0, dy, bspl, dy - h * k[6] - bspl, h * np.tensordot(DVEC, k, axes = 1))
+
+		y0, dy, bspl, c4, c5 = self.rcont
+		s = (t - self.told) / self.hlast
+		s1 = 1 - s
+		return y0 + s * (dy + s1 * (bspl + s * (c4 + s1 * c5)))
+
+	def setevents(self, events):
+		"""
+		set the events that advance() watches
+
+		events
+			iterable of Event objects
+		"""
+		self.events = list(events)
+		self.eventvals = [event.fun(self.t, self.y) for event in self.events]
+		self.terminated = None
+
+	def advance(self, tmax = inf):
+		"""
+		perform one step and locate the events within it
+
+		tmax
+			the step will not go beyond this time
+		returns
+			list of (event, t, y) of the events in the step, ordered by time
+			if one of them is terminal, the list ends with it, and the solver is moved back
+			to the event: t and y are those of the event, and terminated is the event
+		"""
+		if self.terminated != None:
+			raise Exception("Integration was terminated by " + self.terminated.name)
+
+		self.step(tmax)
+
+		found = []
+		vals = []
+		for event, g0 in zip(self.events, self.eventvals):
+			g1 = event.fun(self.t, self.y)
+			vals.append(g1)
+			if event.crossed(g0, g1):
+				found.append((self.locate(event, g0, g1), event))
+		self.eventvals = vals
+
+		occurrences = []
+		for t, event in sorted(found, key = lambda occurrence: occurrence[0]):
+			y = self.dense(t)
+			occurrences.append((event, t, y))
+			if event.terminal:
+				self.stop(event, t, y)
+				break
+
+		return occurrences
+
+	def locate(self, event, g0, g1):
+		"""
+		find the time of an event in the last step on the dense output (Illinois method)
+
+		g0, g1
+			values of the event function at the start and end of the step
+		returns
+			the event time; the event function already has the sign of g1 there
+		"""
+		if g1 == 0:
+			return float(self.t)
+		a, ga = self.told, g0
+		b, gb = self.t, g1
+		tol = 4e-16 * max(abs(a), abs(b)) + 1e-12 * self.hlast
+		#which end was kept last time: halving its value avoids the one-sided convergence of regula falsi
+		side = 0
+		for i in range(100):
+			if b - a <= tol or gb == ga:
+				break
+			c = b - gb * (b - a) / (gb - ga)
+			if not a < c < b:
+				c = 0.5 * (a + b)
+			gc = event.fun(c, self.dense(c))
+			if gc == 0:
+				return float(c)
+			if (gc > 0) == (gb > 0):
+				b, gb = c, gc
+				if side == -1:
+					ga *= 0.5
+				side = -1
+			else:
+				a, ga = c, gc
+				if side == 1:
+					gb *= 0.5
+				side = 1
+		return float(b)
+
+	def stop(self, event, t, y):
+		"""
+		move the solver back to a terminal event within the last step
+		"""
+		self.t = t
+		self.y = y
+		if self.inplace:
+			self.f = np.empty_like(y)
+			self.fun(t, y, self.f)
+		else:
+			self.f = self.fun(t, y)
+		self.terminated = event
+
+	def allocate(self, shape):
+		"""
+		(re-)allocate the step buffers for states of the given shape
+		"""
+		if shape == self.bufshape:
+			return
+		#two sets of states and stages: the current one and the one that the next step fills
+		self.stagebuf = np.empty((2, 7) + shape)
+		self.ybuf = np.empty((2,) + shape)
+		self.yi = np.empty(shape)
+		self.err = np.empty(shape)
+		self.scale = np.empty(shape)
+		self.coef = np.empty(7)
+		self.parity = 0
+		self.bufshape = shape
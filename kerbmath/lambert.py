@@ -0,0 +1,209 @@
+"""
+vectorized Lambert solver and porkchop plots
+
+solves for the transfer orbit between two positions in a given time of flight,
+using universal variables (single revolution, prograde transfers)
+"""
+import numpy as np
+
+from kerbmath.util import *
+from kerbmath.propagate import stumpff
+
+def lambert(mu, r1, r2, tof, maxiter = 100, tol = 1e-10):
+	"""
+	mu
+		gravitational parameter of the central body (m^3/s^2)
+	r1
+		departure positions (m), shape (..., 3)
+	r2
+		arrival positions (m), shape (..., 3)
+	tof
+		times of flight (s), broadcast against r1[..., 0] and r2[..., 0]
+	maxiter
+		maximum number of iterations
+	tol
+		relative tolerance for the time of flight
+	returns
+		departure and arrival velocities (m/s), each of shape (..., 3)
+		NaN where no solution was found
+	"""
+	r1 = np.asarray(r1, dtype = float)
+	r2 = np.asarray(r2, dtype = float)
+	tof = np.asarray(tof, dtype = float)
+	shape = np.broadcast_shapes(r1.shape[:-1], r2.shape[:-1], tof.shape)
+	r1 = np.broadcast_to(r1, shape + (3,)).reshape(-1, 3)
+	r2 = np.broadcast_to(r2, shape + (3,)).reshape(-1, 3)
+	tof = np.broadcast_to(tof, shape).ravel()
+
+	r1n = np.sqrt(np.einsum("ij,ij->i", r1, r1))
+	r2n = np.sqrt(np.einsum("ij,ij->i", r2, r2))
+	cosdtheta = np.clip(np.einsum("ij,ij->i", r1, r2) / (r1n * r2n), -1, 1)
+	#prograde transfers: if the z component of r1 x r2 is negative, the transfer angle is > 180 deg
+	crossz = r1[:, 0] * r2[:, 1] - r1[:, 1] * r2[:, 0]
+	dtheta = np.arccos(cosdtheta)
+	dtheta = np.where(crossz >= 0, dtheta, 2 * pi - dtheta)
+	with np.errstate(divide = "ignore", invalid = "ignore"):
+		a = np.sin(dtheta) * np.sqrt(r1n * r2n / (1 - cosdtheta))
+	target = sqrt(mu) * tof
+
+	def y(z):
+		c, s = stumpff(z)
+		with np.errstate(invalid = "ignore", divide = "ignore"):
+			return r1n + r2n + a * (z * s - 1) / np.sqrt(c), c, s
+
+	def f(z):
+		"""
+		time of flight residual; monotonically increasing in z
+		where y < 0, z is too small, so a negative value is returned
+		"""
+		yz, c, s = y(z)
+		with np.errstate(invalid = "ignore"):
+			result = (yz / c) ** 1.5 * s + a * np.sqrt(yz) - target
+		return np.where(yz >= 0, result, -target), yz
+
+	#bracket: strongly hyperbolic to just below one full revolution
+	lo = np.full(len(tof), -100.0)
+	hi = np.full(len(tof), 4 * pi * pi - 1e-6)
+	flo, _ = f(lo)
+	fhi, _ = f(hi)
+	valid = (flo <= 0) & (fhi >= 0) & np.isfinite(a)
+
+	#Illinois variant of regula falsi, vectorized
+	z = (lo + hi) / 2
+	side = np.zeros(len(tof), dtype = np.int8)
+	for i in range(maxiter):
+		with np.errstate(invalid = "ignore", divide = "ignore"):
+			z = (lo * fhi - hi * flo) / (fhi - flo)
+		z = np.where(np.isfinite(z) & (z > lo) & (z < hi), z, (lo + hi) / 2)
+		fz, yz = f(z)
+
+		up = fz < 0
+		lo = np.where(up, z, lo)
+		hi = np.where(up, hi, z)
+		#halve the function value of the side that has been kept twice in a row
+		flo = np.where(up, fz, np.where(side == -1, flo / 2, flo))
+		fhi = np.where(up, np.where(side == 1, fhi / 2, fhi), fz)
+		side = np.where(up, 1, -1).astype(np.int8)
+
+		if np.all((np.abs(fz) <= tol * target) | ~valid):
+			break
+
+	#Lagrange coefficients
+	yz, c, s = y(z)
+	lagf = 1 - yz / r1n
+	lagg = a * np.sqrt(yz / mu)
+	laggdot = 1 - yz / r2n
+	v1 = (r2 - lagf[:, None] * r1) / lagg[:, None]
+	v2 = (laggdot[:, None] * r2 - r1) / lagg[:, None]
+	v1[~valid] = nan
+	v2[~valid] = nan
+
+	return v1.reshape(shape + (3,)), v2.reshape(shape + (3,))
+
+class Porkchop:
+	"""
+	result of porkchop(); all matrices have the shape (departures, times of flight)
+	"""
+	def __init__(self, origin, target, departures, tofs, vinfdep, vinfarr):
+		"""
+		origin, target
+			departure and arrival bodies
+		departures
+			departure times (s)
+		tofs
+			times of flight (s)
+		vinfdep, vinfarr
+			hyperbolic excess velocities at departure and arrival (m/s)
+		"""
+		self.origin = origin
+		self.target = target
+		self.departures = departures
+		self.tofs = tofs
+		self.vinfdep = vinfdep
+		self.vinfarr = vinfarr
+
+		#characteristic energy of the departure hyperbola
+		self.c3 = vinfdep * vinfdep
+
+		#burns from and into the lowest circular orbits
+		self.dvdep = hyperbolicdv(origin, vinfdep)
+		self.dvarr = hyperbolicdv(target, vinfarr)
+		self.dv = self.dvdep + self.dvarr
+
+	def __repr__(self):
+		dep, tof, dv = self.best()
+		return ("Porkchop: " + self.origin.name + " -> " + self.target.name +
+			", " + str(len(self.departures)) + "x" + str(len(self.tofs)) +
+			", best: depart at %.0fs, tof %.0fs, dv = " % (dep, tof) + velstr(dv))
+
+	def best(self, key = "dv"):
+		"""
+		key
+			the matrix to minimize ("dv", "dvdep", "dvarr", "c3", ...)
+		returns
+			departure time, time of flight, and value of the minimum
+		"""
+		mat = getattr(self, key)
+		i, j = np.unravel_index(np.nanargmin(mat), mat.shape)
+		return float(self.departures[i]), float(self.tofs[j]), float(mat[i, j])
+
+def hyperbolicdv(body, vinf):
+	"""
+	body
+		the body
+	vinf
+		hyperbolic excess velocities (m/s)
+	returns
+		dv between the lowest circular orbit of the body and hyperbolas with vinf (m/s)
+	"""
+	r = body.minorbitr()
+	mu = body.mu()
+	return np.sqrt(vinf * vinf + 2 * mu / r) - sqrt(mu / r)
+
+def porkchop(origin, target, departures, tofs, workers = None, rowsperjob = 50):
+	"""
+	compute a porkchop plot for transfers between two bodies with the same parent
+
+	origin
+		departure body
+	target
+		arrival body
+	departures
+		departure times (s), shape (D,)
+	tofs
+		times of flight (s), shape (T,)
+	workers
+		number of worker processes; None means one per CPU, 0 runs in this process
+	rowsperjob
+		number of departure times per worker task
+	returns
+		Porkchop
+	"""
+	if origin.parent == None or origin.parent is not target.parent:
+		raise Exception("Origin and target must orbit the same body")
+
+	departures = np.atleast_1d(np.asarray(departures, dtype = float))
+	tofs = np.atleast_1d(np.asarray(tofs, dtype = float))
+	mu = origin.parent.mu()
+
+	r1, vbody1 = origin.state(departures)
+	r2, vbody2 = target.state(departures[:, None] + tofs[None, :])
+	r1 = np.broadcast_to(r1[:, None, :], r2.shape)
+	tof = np.broadcast_to(tofs[None, :], r2.shape[:2])
+
+	blocks = [slice(start, start + rowsperjob) for start in range(0, len(departures), rowsperjob)]
+	args = [(mu, r1[block], r2[block], tof[block]) for block in blocks]
+	if workers == 0 or len(blocks) == 1:
+		results = [lambert(*arg) for arg in args]
+	else:
+		from concurrent.futures import ProcessPoolExecutor
+		with ProcessPoolExecutor(max_workers = workers) as pool:
+			results = list(pool.map(lambert, *zip(*args)))
+
+	v1 = np.concatenate([res[0] for res in results])
+	v2 = np.concatenate([res[1] for res in results])
+
+	vinfdep = np.linalg.norm(v1 - vbody1[:, None, :], axis = -1)
+	vinfarr = np.linalg.norm(v2 - vbody2, axis = -1)
+
+	return Porkchop(origin, target, departures, tofs, vinfdep, vinfarr)
@@ -5,6 +5,12 @@ import kerbmath.vector as vec
 #TODO some formulae fail for circular orbits (e == 0); for example stuff related to theta
 
 class Orbit:
+	__slots__ = ("body", "name", "incl", "omega", "rp", "ra", "_cache", "_cachegen")
+
+	#attributes that cached derived quantities depend on
+	#the derived quantities also depend on the body, see Body.cachedeps
+	cachedeps = ("body", "incl", "omega", "rp", "ra")
+
 	def __init__(self, body, **kw):
 		"""
 		body
@@ -75,7 +81,7 @@ class Orbit:
 		self.body = body
 
 		#store kw in a container
-		args = Container(kw, delonget = True)
+		args = Container(kw, delonget = True, dbg = False)
 
 		#set name, incl, omega
 		try:
@@ -290,9 +296,132 @@ class Orbit:
 		self.rp, self.ra = orbitdims(rp, ra, a, e, vp, va)
 		body.system.addorb(self)
 
+	#fast-path constructors
+	#these take exactly one parametrization and skip the argument parsing of __init__
+
+	@classmethod
+	def fromapsides(cls, body, rp, ra, incl = 0, omega = 0, name = None, register = True):
+		"""
+		body
+			central body of the orbit
+		rp
+			height of periapsis above center of mass (m)
+		ra
+			height of apoapsis above center of mass (m)
+		incl
+			inclination (deg)
+		omega
+			argument of periapsis (deg)
+		name
+			defaults to a free name such as 'orb0'
+		register
+			add the orbit to the system of the body
+		returns
+			the orbit
+		"""
+		if not rp > 0:
+			raise Exception("rp must be > 0, but is " + diststr(rp))
+		if ra == +inf:
+			ra = -inf
+		#if the user confused ra and rp, correct that
+		if ra > 0 and rp > ra:
+			ra, rp = rp, ra
+
+		#the new object has no cache to invalidate yet, so bypass __setattr__
+		self = cls.__new__(cls)
+		init = object.__setattr__
+		init(self, "body", body)
+		init(self, "name", name)
+		init(self, "incl", incl)
+		init(self, "omega", omega)
+		init(self, "rp", rp)
+		init(self, "ra", ra)
+		init(self, "_cache", None)
+
+		if register:
+			body.system.addorb(self)
+
+		return self
+
+	@classmethod
+	def fromheights(cls, body, hp, ha, **kw):
+		"""
+		body
+			central body of the orbit
+		hp
+			height of periapsis above surface (km)
+		ha
+			height of apoapsis above surface (km)
+		**kw
+			see fromapsides
+		returns
+			the orbit
+		"""
+		return cls.fromapsides(body, hp * 1000 + body.radius, ha * 1000 + body.radius, **kw)
+
+	@classmethod
+	def fromae(cls, body, a, e, **kw):
+		"""
+		body
+			central body of the orbit
+		a
+			semi-major axis (m), negative for escape trajectories
+		e
+			eccentricity (!= 1)
+		**kw
+			see fromapsides
+		returns
+			the orbit
+		"""
+		if e < 0:
+			raise Exception("e must be >= 0, but is " + str(e))
+		if e == 1:
+			raise Exception("rp must be known for parabolic orbits")
+
+		rp = (1 - e) * a
+		return cls.fromapsides(body, rp, 2 * a - rp, **kw)
+
+	@classmethod
+	def fromstate(cls, body, rvector, vvector, **kw):
+		"""
+		body
+			central body of the orbit
+		rvector
+			position vector (IRF, m)
+		vvector
+			velocity vector (IRF, m/s)
+		**kw
+			see fromapsides
+		returns
+			the orbit
+		"""
+		from kerbmath.elements import stateelements
+		rp, ra, incl, omega = stateelements(body.mu(), rvector, vvector)
+		return cls.fromapsides(body, float(rp), float(ra), float(incl), float(omega), **kw)
+
+	def __setattr__(self, name, val):
+		object.__setattr__(self, name, val)
+		if name in self.cachedeps:
+			object.__setattr__(self, "_cache", None)
+
+	def cache(self):
+		"""
+		returns
+			the derived quantity cache (see util.cached)
+			it is reset lazily if the body has changed since it was filled
+		"""
+		cache = getattr(self, "_cache", None)
+		if cache == None or self._cachegen != self.body.generation:
+			cache = {}
+			object.__setattr__(self, "_cache", cache)
+			object.__setattr__(self, "_cachegen", self.body.generation)
+		return cache
+
 	def __repr__(self):
-		#orbit name
-		rep = self.name + ": "
+		#orbit name (unregistered orbits have none)
+		rep = ""
+		if self.name != None:
+			rep += self.name + ": "
 
 		#body name
 		rep += self.body.name
@@ -315,6 +444,7 @@ class Orbit:
 		return rep
 
 
+	@cached
 	def e(self):
 		"""
 		returns
@@ -322,6 +452,7 @@ class Orbit:
 		"""
 		return (1 - self.rp/self.ra) / (1 + self.rp/self.ra)
 
+	@cached
 	def a(self):
 		"""
 		returns
@@ -329,6 +460,7 @@ class Orbit:
 		"""
 		return (self.ra + self.rp)/2
 
+	@cached
 	def specenergy(self):
 		"""
 		returns
@@ -336,6 +468,7 @@ class Orbit:
 		"""
 		return -0.5 * self.body.mu() / self.a()
 
+	@cached
 	def period(self):
 		"""
 		returns
@@ -352,6 +485,7 @@ class Orbit:
 		"""
 		return sqrt(self.body.mu() * (2/r - 1/self.a()))
 
+	@cached
 	def vp(self):
 		"""
 		returns
@@ -359,6 +493,7 @@ class Orbit:
 		"""
 		return self.v(self.rp)
 
+	@cached
 	def va(self):
 		"""
 		returns
@@ -421,7 +556,7 @@ class Orbit:
 		returns
 			apoapsis dv to de-orbit
 		"""
-		return self.chrp(self.body.atm.cutoff)
+		return self.chrp(self.body.radius + self.body.atm.cutoff)
 
 	def escape(self):
 		"""
@@ -488,19 +623,21 @@ class Orbit:
 		r = self.rp * (1 + e) / (1 + e * cos(radians(theta)))
 		return r
 
-	def rvector(self, r):
+	def rvector(self, r, inbound = False):
 		"""
 		r
 			height above center of mass (m)
-		theta
-			angle in orbit (degrees; 0 means periapsis)
+		inbound
+			if True, use the point before periapsis instead of the one after it
 		returns
-			velocity vector in IRF
+			position vector in IRF
 			z points north
-			y points towards ascending node
-			x spans the equatorial plane with y
+			x points towards ascending node
+			y spans the equatorial plane with x
 		"""
 		theta = self.thetafromr(r)
+		if inbound:
+			theta = -theta
 		#first, calculate without inclination
 		rx = cos(radians(theta + self.omega)) * r
 		ry = sin(radians(theta + self.omega)) * r
@@ -509,84 +646,70 @@ class Orbit:
 		#vector is already scaled to correct length; done.
 		return rx, ry, rz
 
-	def vvector(self, r):
+	def vvector(self, r, inbound = False):
 		"""
 		r
 			height above center of mass (m)
+		inbound
+			if True, use the point before periapsis instead of the one after it
 		returns
 			velocity vector in IRF
 			z points north
-			y points towards ascending node
-			x spans the equatorial plane with y
+			x points towards ascending node
+			y spans the equatorial plane with x
 		"""
 		theta = self.thetafromr(r)
+		if inbound:
+			theta = -theta
+		e = self.e()
 		#first, ignore the inclination; thus z = 0
-		vx = cos(radians(theta + self.omega)) + self.e() * sin(radians(self.omega))
-		vy = sin(radians(theta + self.omega)) + self.e() * cos(radians(self.omega))
+		#in the orbital plane, the velocity direction is (-sin(theta), e + cos(theta)) relative to periapsis
+		vx = -sin(radians(theta + self.omega)) - e * sin(radians(self.omega))
+		vy = cos(radians(theta + self.omega)) + e * cos(radians(self.omega))
 		#the inclination decides how vy is distributed among vy and vz
-		vy, vz = -cos(radians(self.incl)) * vy, sin(radians(self.incl)) * vy
+		vy, vz = cos(radians(self.incl)) * vy, sin(radians(self.incl)) * vy
 
 		return vec.scalarprod(vec.unity((vx, vy, vz)), self.v(r))
 
-	def aerobrake(self, d = 0.2, timestep = 0.001):
+	def aerobrake(self, d = 0.2, rtol = 1e-9, atol = 1e-6, tmax = 86400, sink = None, events = ()):
 		"""
 		numerically simulates aerobrake/aerocapture
 		orbit must partially lie within the atmosphere for this to work
 
 		d
 			drag coefficient
-		timestep
-			time per physics frame (s)
-		"""
-		entryr = self.body.atm.cutoff + self.body.radius
-		collisionr = self.body.maxelev + self.body.radius
-
-		if self.rp > entryr:
-			raise Exception("Orbit outside atmosphere")
-		if self.ra > 0 and self.ra < entryr:
-			raise Exception("Orbit completely within atmosphere")
-
-		#we start our numerical simulation when the vessel enters the atmosphere (r = entryr)
-		#all calculations are done in IRF: origin is the center of mass,
-		# z points north
-		# y points towards ascending node (of the old orbit)
-		# x spans the equatorial plane with y
-
-		vr = self.rvector(entryr)
-		vv = self.vvector(entryr)
-
-		print("Entry position: " + vec.tostr(vr, diststr))
-		print("Entry velocity: " + vec.tostr(vv, velstr))
-
-		#run simulation
-		while True:
-			r = vec.abs(vr)
-			if r < collisionr:
-				print("Within ground collision range")
-			if r < self.body.radius:
-				break
-			if r > entryr * 1.01:
-				print("Atmosphere left")
-				#break
-
-			vvatm = self.body.rotvvector(vr)
-			vvdelta = vec.diff(vv, vvatm)
-			aatm = self.body.atm.accel(r - self.body.radius, vec.abs(vvdelta), d)
-			vaatm = vec.scalarprod(vec.unity(vvdelta), -aatm)
-			agrav = self.body.accel(r)
-			vagrav = vec.scalarprod(vec.unity(vr), -agrav)
-			vatot = vec.sum(vaatm, vagrav)
-			vdv = vec.scalarprod(vatot, timestep)
-			vdr = vec.scalarprod(vv, timestep)
-			vv = vec.sum(vdv, vv)
-			vr = vec.sum(vdr, vr)
-
-			print("h: " + diststr(r - self.body.radius) + ", agrav: " + str(agrav) + ", aatm: " + str(aatm) + ", v: " + str(vec.abs(vvdelta)) + ", espec: " + str(vec.abs(vv)**2 - self.body.mu()/r))
-
-		print("Exit position: " + vec.tostr(vr, diststr))
-		print("Exit velocity: " + vec.tostr(vv, velstr))
-
-		#TODO calculate orbital elements fro vv, vr
-		#TODO orbit does not even sink to its periapsis
-		#even worse, it _rises above its apoapsis_
-		#must be an error with the rvvector() and vvector() equations...
+		rtol
+			relative error tolerance per integration step
+		atol
+			absolute error tolerance per integration step
+		tmax
+			maximum simulated time (s)
+		sink
+			kerbmath.sink.Sink that receives the samples (default: keep all in memory)
+		events
+			additional kerbmath.integrate.Event objects; terminal ones stop the simulation
+		returns
+			Trajectory from atmospheric entry until the vessel leaves the atmosphere or crashes
+			its events list has the times and states of periapsis, exit, impact and the user events
+		"""
+		from kerbmath.trajectory import aerobrake
+		return aerobrake(self, d, rtol, atol, tmax, sink, events)
+
+	def aerobrakecampaign(self, d = 0.2, maxpasses = 50, ratarget = None, rtol = 1e-9, atol = 1e-6, tmax = 86400):
+		"""
+		simulates repeated aerobraking passes, e.g. to lower the apoapsis step by step
+		only the atmospheric parts are integrated; the vacuum arcs are skipped analytically
+
+		d
+			drag coefficient
+		maxpasses
+			maximum number of passes
+		ratarget
+			if given, stop once the apoapsis (height over center of mass, m) is at most this
+		rtol, atol, tmax
+			integration tolerances and maximum simulated time per pass, as for aerobrake
+		returns
+			kerbmath.campaign.Campaign with the apsis changes of each pass
+		"""
+		from kerbmath.campaign import aerobrakecampaign
+		return aerobrakecampaign(self, d, maxpasses, ratarget, rtol, atol, tmax)
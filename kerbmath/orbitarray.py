@@ -0,0 +1,561 @@
+import numpy as np
+
+from kerbmath.util import *
+
+#orbit classes, as returned by OrbitArray.classify
+CLASSES = ("impact", "unstable", "stable", "escape")
+IMPACT, UNSTABLE, STABLE, ESCAPE = range(4)
+
+class OrbitArray:
+	"""
+	stores N orbits around one body as numpy columns
+	all methods are vectorized equivalents of the Orbit methods of the same name
+	"""
+	def __init__(self, body, rp, ra, incl = 0, omega = 0):
+		"""
+		body
+			central body of all orbits
+		rp
+			heights of periapsis above center of mass (m)
+		ra
+			heights of apoapsis above center of mass (m)
+			negative for escape trajectories, as with Orbit
+		incl
+			inclinations (deg)
+		omega
+			arguments of periapsis (deg)
+
+		all arguments are broadcast against each other
+		"""
+		rp, ra, incl, omega = np.broadcast_arrays(
+			np.asarray(rp, dtype = float),
+			np.asarray(ra, dtype = float),
+			np.asarray(incl, dtype = float),
+			np.asarray(omega, dtype = float))
+
+		rp = np.array(rp, ndmin = 1)
+		ra = np.array(ra, ndmin = 1)
+
+		if not np.all(rp > 0):
+			raise Exception("rp must be > 0")
+
+		#same conventions as Orbit: ra = +inf means parabolic,
+		#and if the user confused ra and rp, correct that
+		ra[ra == +inf] = -inf
+		swap = (ra > 0) & (rp > ra)
+		rp[swap], ra[swap] = ra[swap], rp[swap]
+
+		self.body = body
+		self.rp = rp
+		self.ra = ra
+		self.incl = np.array(incl, ndmin = 1)
+		self.omega = np.array(omega, ndmin = 1)
+
+	@classmethod
+	def fromorbits(cls, orbits):
+		"""
+		orbits
+			iterable of Orbit objects, all around the same body
+		returns
+			OrbitArray
+		"""
+		orbits = list(orbits)
+		if len(orbits) == 0:
+			raise Exception("Can not create OrbitArray from zero orbits")
+
+		body = orbits[0].body
+		for orb in orbits:
+			if orb.body is not body:
+				raise Exception("All orbits must have the same body, but " + orb.name + " is around " + orb.body.name)
+
+		return cls(body,
+			rp = [orb.rp for orb in orbits],
+			ra = [orb.ra for orb in orbits],
+			incl = [orb.incl for orb in orbits],
+			omega = [orb.omega for orb in orbits])
+
+	@classmethod
+	def fromstate(cls, body, rvector, vvector):
+		"""
+		body
+			central body
+		rvector
+			position vectors (IRF, m), shape (N, 3)
+		vvector
+			velocity vectors (IRF, m/s), shape (N, 3)
+		returns
+			OrbitArray of the orbits through these states
+			see elements.stateelements for the node, eccentricity and true anomalies
+		"""
+		from kerbmath.elements import stateelements
+		rp, ra, incl, omega = stateelements(body.mu(), rvector, vvector)
+		return cls(body, rp, ra, incl, omega)
+
+	def toorbits(self, register = True):
+		"""
+		create an Orbit object for each entry
+
+		register
+			add the orbits to the system of the body
+		returns
+			list of Orbit objects
+		"""
+		from kerbmath.orbit import Orbit
+
+		orbits = [
+			Orbit.fromapsides(self.body, rp, ra, incl, omega, register = False)
+			for rp, ra, incl, omega in zip(self.rp.tolist(), self.ra.tolist(), self.incl.tolist(), self.omega.tolist())
+		]
+		if register:
+			self.body.system.addorbs(orbits)
+
+		return orbits
+
+	def __len__(self):
+		return len(self.rp)
+
+	def __getitem__(self, idx):
+		"""
+		idx
+			any numpy index (int, slice, mask, index array)
+		returns
+			OrbitArray of the selected orbits
+		"""
+		return OrbitArray(self.body, self.rp[idx], self.ra[idx], self.incl[idx], self.omega[idx])
+
+	def __repr__(self):
+		return "OrbitArray: " + self.body.name + ", " + str(len(self)) + " orbits"
+
+	def e(self):
+		"""
+		returns
+			eccentricities
+		"""
+		q = self.rp / self.ra
+		return (1 - q) / (1 + q)
+
+	def a(self):
+		"""
+		returns
+			semi-major axes (m)
+		"""
+		return (self.ra + self.rp) / 2
+
+	def specenergy(self):
+		"""
+		returns
+			specific energies (J/kg)
+		"""
+		return -0.5 * self.body.mu() / self.a()
+
+	def period(self):
+		"""
+		returns
+			orbital periods (s)
+			NaN for escape trajectories
+		"""
+		with np.errstate(invalid = "ignore"):
+			return 2 * pi * np.sqrt(self.a() ** 3 / self.body.mu())
+
+	def v(self, r):
+		"""
+		r
+			heights over center of mass (m), broadcast against the orbits
+		returns
+			v (m/s)
+			NaN where the orbit does not reach r
+		"""
+		return visviva(self.body.mu(), np.asarray(r, dtype = float), self.a())
+
+	def vp(self):
+		"""
+		returns
+			periapsis velocities (m/s)
+		"""
+		return self.v(self.rp)
+
+	def va(self):
+		"""
+		returns
+			apoapsis velocities or velocities at infinity (m/s)
+		"""
+		return self.v(np.where(self.ra < 0, inf, self.ra))
+
+	def propagate(self, t, theta0 = 0):
+		"""
+		t
+			epochs (s), shape (M,)
+		theta0
+			true anomalies at t = 0 (deg; 0: periapsis)
+		returns
+			positions and velocities (IRF), each of shape (N, M, 3)
+		"""
+		from kerbmath.propagate import propagate
+		return propagate(self.body.mu(), self.rp, self.ra, self.incl, self.omega, t, theta0)
+
+	#batched dv calculations
+	#all of these are closed-form; unlike the Orbit methods, they create no temporary orbits
+	#targets are broadcast against the orbits; impossible maneuvers yield NaN instead of raising
+
+	def chrp(self, rpnew):
+		"""
+		rpnew
+			target periapsis heights over center of mass (m)
+		returns
+			apoapsis burn dv (m/s)
+		"""
+		rpnew = np.asarray(rpnew, dtype = float)
+		ok = (self.ra > 0) & (rpnew <= self.ra) & (rpnew > 0)
+		ra = np.where(ok, self.ra, nan)
+		return visviva(self.body.mu(), ra, (ra + rpnew) / 2) - visviva(self.body.mu(), ra, self.a())
+
+	def chra(self, ranew):
+		"""
+		ranew
+			target apoapsis heights over center of mass (m)
+			+inf or negative values for escape trajectories
+		returns
+			periapsis burn dv (m/s)
+		"""
+		ranew = np.where(np.asarray(ranew, dtype = float) == +inf, -inf, ranew)
+		ok = (ranew < 0) | (ranew >= self.rp)
+		rp = np.where(ok, self.rp, nan)
+		return visviva(self.body.mu(), rp, (ranew + rp) / 2) - visviva(self.body.mu(), rp, self.a())
+
+	def chhp(self, hpnew):
+		"""
+		hpnew
+			target periapsis heights over surface (km)
+		returns
+			apoapsis burn dv (m/s)
+		"""
+		return self.chrp(1000 * np.asarray(hpnew, dtype = float) + self.body.radius)
+
+	def chha(self, hanew):
+		"""
+		hanew
+			target apoapsis heights over surface (km)
+		returns
+			periapsis burn dv (m/s)
+		"""
+		return self.chra(1000 * np.asarray(hanew, dtype = float) + self.body.radius)
+
+	def deorbit(self):
+		"""
+		returns
+			apoapsis dv to lower the periapsis to the top of the atmosphere (m/s)
+		"""
+		return self.chrp(self.body.radius + self.body.atm.cutoff)
+
+	def escape(self):
+		"""
+		returns
+			periapsis dv to escape (m/s)
+		"""
+		return self.chra(inf)
+
+	def circ(self):
+		"""
+		returns
+			apoapsis dv to make orbits circular (m/s)
+		"""
+		return self.chrp(self.ra)
+
+	def chir(self, r, inclnew):
+		"""
+		r
+			heights over center of mass (m) at which the inclination changes are performed
+		inclnew
+			new inclinations (deg)
+		returns
+			dv (m/s)
+		"""
+		r = np.asarray(r, dtype = float)
+		ok = (r >= self.rp) & ((self.ra < 0) | (r <= self.ra))
+		r = np.where(ok, r, nan)
+		return 2 * self.v(r) * np.sin(np.radians((self.incl - np.asarray(inclnew, dtype = float)) / 2))
+
+	def chih(self, h, inclnew):
+		"""
+		h
+			heights over surface (km) where the inclination changes are performed
+		inclnew
+			new inclinations (deg)
+		returns
+			dv (m/s)
+		"""
+		return self.chir(1000 * np.asarray(h, dtype = float) + self.body.radius, inclnew)
+
+	def classify(self):
+		"""
+		returns
+			class of each orbit, as index into CLASSES:
+			IMPACT     periapsis below the surface
+			UNSTABLE   periapsis in the atmosphere or below the highest elevation
+			ESCAPE     escape trajectory, or apoapsis outside the sphere of influence
+			STABLE     all others
+		"""
+		result = np.full(len(self), STABLE, dtype = np.int8)
+		result[(self.ra < 0) | (self.ra > self.body.soi())] = ESCAPE
+		result[self.rp < self.body.minorbitr()] = UNSTABLE
+		result[self.rp < self.body.radius] = IMPACT
+		return result
+
+	def classcounts(self):
+		"""
+		returns
+			dict of class name: number of orbits, see classify
+		"""
+		counts = np.bincount(self.classify(), minlength = len(CLASSES))
+		return dict(zip(CLASSES, counts.tolist()))
+
+	#plane change optimization
+	#plane changes rotate the velocity about the radius vector, so they cost 2 * vh * sin(di / 2)
+	#with the horizontal velocity vh; combined burns at apsides cost |v2 - v1| of the two velocity vectors
+
+	def planechange(self, inclnew):
+		"""
+		find the cheapest point for a pure inclination change
+		the burn must happen at one of the nodes, so it is done at the one farther out
+
+		inclnew
+			new inclinations (deg)
+		returns
+			dv (m/s), heights over center of mass (m) and true anomalies (deg) of the burns
+			NaN where neither node is reached (escape trajectories)
+		"""
+		e = self.e()
+		p = self.rp * (1 + e)
+		#the ascending node is at theta = -omega, the descending one opposite
+		theta = np.stack((-self.omega, 180 - self.omega))
+		with np.errstate(invalid = "ignore", divide = "ignore"):
+			denom = 1 + e * np.cos(np.radians(theta))
+			r = np.where(denom > 0, p / denom, nan)
+		farther = np.argmax(np.where(np.isnan(r), -inf, r), axis = 0)
+		idx = np.arange(len(self))
+		r = r[farther, idx]
+		theta = np.remainder(theta[farther, idx], 360)
+
+		vh = np.sqrt(self.body.mu() * p) / r
+		di = np.radians(np.asarray(inclnew, dtype = float) - self.incl)
+		return 2 * vh * np.abs(np.sin(di / 2)), r, theta
+
+	def combinedtransfer(self, rpnew, ranew, inclnew):
+		"""
+		two-burn transfer to new apsides and inclination, with the plane change
+		split optimally between the two burns
+		the burns happen at apsides, which are assumed to lie on the line of nodes (omega = 0)
+
+		both orders are tried: first a periapsis burn to ranew, then a burn there to rpnew,
+		or first an apoapsis burn to rpnew, then a burn there to ranew
+
+		rpnew, ranew
+			target apsis heights over center of mass (m), elliptic orbits only
+		inclnew
+			new inclinations (deg)
+		returns
+			dv (m/s)
+			order (0: periapsis burn first, 1: apoapsis burn first)
+			fraction of the plane change done by the first burn
+			NaN where no transfer is possible
+		"""
+		mu = self.body.mu()
+		rpnew, ranew = np.broadcast_arrays(np.asarray(rpnew, dtype = float), np.asarray(ranew, dtype = float))
+		di = np.abs(np.radians(np.asarray(inclnew, dtype = float) - self.incl))
+		af = (rpnew + ranew) / 2
+		ok = (self.ra > 0) & (rpnew > 0) & (ranew > 0)
+
+		results = []
+		for r1, r2 in ((self.rp, ranew), (np.where(self.ra > 0, self.ra, nan), rpnew)):
+			at = (r1 + r2) / 2
+			v0 = visviva(mu, r1, self.a())
+			vt1 = visviva(mu, r1, at)
+			vt2 = visviva(mu, r2, at)
+			vf = visviva(mu, r2, af)
+			f = burnsplit(v0, vt1, vt2, vf, di)
+			cost = combinedburn(v0, vt1, f * di) + combinedburn(vt2, vf, (1 - f) * di)
+			results.append((np.where(ok, cost, nan), f))
+
+		(dv0, f0), (dv1, f1) = results
+		order = np.where(dv1 < dv0, 1, 0)
+		return np.where(order == 1, dv1, dv0), order, np.where(order == 1, f1, f0)
+
+	def bielliptic(self, rpnew, ranew, inclnew, rbmax = None, steps = 16):
+		"""
+		three-burn bi-elliptic transfer to new apsides and inclination:
+		a periapsis burn out to rb, a burn at rb down to rpnew, and a burn at rpnew to ranew
+		the plane change is split optimally between the last two burns
+		the burns happen at apsides, which are assumed to lie on the line of nodes (omega = 0)
+
+		rpnew, ranew
+			target apsis heights over center of mass (m), elliptic orbits only
+		inclnew
+			new inclinations (deg)
+		rbmax
+			largest intermediate apoapsis to consider (m)
+			defaults to the sphere of influence, or 100 times the largest apsis
+		steps
+			number of logarithmically spaced intermediate apoapses for the coarse search,
+			which is then refined by golden-section search
+		returns
+			dv (m/s), intermediate apoapses rb (m), fraction of the plane change done at rb
+			NaN where no transfer is possible
+		"""
+		mu = self.body.mu()
+		rpnew, ranew = np.broadcast_arrays(np.asarray(rpnew, dtype = float), np.asarray(ranew, dtype = float))
+		di = np.abs(np.radians(np.asarray(inclnew, dtype = float) - self.incl))
+		ok = (self.ra > 0) & (rpnew > 0) & (ranew > 0)
+
+		rbmin = np.maximum(np.maximum(self.ra, ranew), rpnew)
+		if rbmax == None:
+			rbmax = self.body.soi()
+			if rbmax == inf:
+				rbmax = 100 * rbmin
+		rbmax = np.maximum(rbmax, rbmin)
+		rp = self.rp[..., None]
+		a0 = self.a()[..., None]
+		rpnew = rpnew[..., None]
+		af = (rpnew + ranew[..., None]) / 2
+		di = np.broadcast_to(di, np.shape(ok))[..., None]
+
+		def cost(rb):
+			a1 = (rp + rb) / 2
+			a2 = (rb + rpnew) / 2
+			burn1 = np.abs(visviva(mu, rp, a1) - visviva(mu, rp, a0))
+			v21 = visviva(mu, rb, a1)
+			v22 = visviva(mu, rb, a2)
+			v31 = visviva(mu, rpnew, a2)
+			v32 = visviva(mu, rpnew, af)
+			f = burnsplit(v21, v22, v31, v32, di)
+			return burn1 + combinedburn(v21, v22, f * di) + combinedburn(v31, v32, (1 - f) * di), f
+
+		#coarse search on logarithmically spaced candidates, shape (N, steps)
+		logrb = np.log(rbmin)[..., None] + np.linspace(0, 1, steps) * np.log(rbmax / rbmin)[..., None]
+		dv, f = cost(np.exp(logrb))
+		best = np.argmin(np.where(np.isnan(dv), inf, dv), axis = -1)
+		idx = np.arange(len(best))
+
+		#refine between the neighbours of the best candidate
+		lo = logrb[idx, np.maximum(best - 1, 0)][..., None]
+		hi = logrb[idx, np.minimum(best + 1, steps - 1)][..., None]
+		logrb = goldenmin(lambda x: cost(np.exp(x))[0], lo, hi, iterations = 20)
+		dv, f = cost(np.exp(logrb))
+
+		return np.where(ok, dv[..., 0], nan), np.exp(logrb[..., 0]), f[..., 0]
+
+	def besttransfer(self, rpnew, ranew, inclnew, rbmax = None):
+		"""
+		the cheaper of combinedtransfer and bielliptic
+
+		returns
+			dv (m/s), and whether the bi-elliptic transfer is cheaper
+		"""
+		dv2, order, f = self.combinedtransfer(rpnew, ranew, inclnew)
+		dv3, rb, f = self.bielliptic(rpnew, ranew, inclnew, rbmax)
+		bi = dv3 < dv2
+		return np.where(bi, dv3, dv2), bi
+
+def combinedburn(v1, v2, angle):
+	"""
+	v1, v2
+		speeds before and after the burn (m/s)
+	angle
+		angle between the velocity vectors (rad)
+	returns
+		dv of the burn (m/s)
+	"""
+	return np.sqrt(np.maximum(v1 * v1 + v2 * v2 - 2 * v1 * v2 * np.cos(angle), 0))
+
+def burnsplit(v1, v2, w1, w2, di, iterations = 8):
+	"""
+	optimal split of a plane change between two combined burns,
+	the first from speed v1 to v2, the second from w1 to w2
+
+	the total dv is convex in the split, so its derivative is searched for its root
+	with Newton steps, falling back to bisection when a step leaves the bracket
+
+	v1, v2, w1, w2
+		speeds before and after the burns (m/s), broadcast against each other
+	di
+		total plane change (rad)
+	iterations
+		number of Newton/bisection steps
+	returns
+		fraction of the plane change done by the first burn
+	"""
+	v1, v2, w1, w2, di = np.broadcast_arrays(v1, v2, w1, w2, di)
+	pv = v1 * v2
+	pw = w1 * w2
+	#avoid 0/0 for burns that do nothing
+	eps = 1e-9 * (v1 + v2 + w1 + w2)
+
+	def derivatives(f):
+		t1 = f * di
+		t2 = (1 - f) * di
+		c1 = combinedburn(v1, v2, t1) + eps
+		c2 = combinedburn(w1, w2, t2) + eps
+		s1 = pv * np.sin(t1)
+		s2 = pw * np.sin(t2)
+		d1 = di * (s1 / c1 - s2 / c2)
+		d2 = di * di * (pv * np.cos(t1) / c1 - s1 * s1 / (c1 * c1 * c1) + pw * np.cos(t2) / c2 - s2 * s2 / (c2 * c2 * c2))
+		return d1, d2
+
+	lo = np.zeros(np.shape(di))
+	hi = np.ones(np.shape(di))
+	f = np.full(np.shape(di), 0.5)
+	for i in range(iterations):
+		d1, d2 = derivatives(f)
+		hi = np.where(d1 > 0, f, hi)
+		lo = np.where(d1 > 0, lo, f)
+		with np.errstate(invalid = "ignore", divide = "ignore"):
+			newton = f - d1 / d2
+		f = np.where((d2 > 0) & (newton >= lo) & (newton <= hi), newton, (lo + hi) / 2)
+
+	#the optimum may be at the ends of the interval
+	for end in (0, 1):
+		cost = combinedburn(v1, v2, end * di) + combinedburn(w1, w2, (1 - end) * di)
+		f = np.where(cost < combinedburn(v1, v2, f * di) + combinedburn(w1, w2, (1 - f) * di), end, f)
+	return f
+
+def goldenmin(fun, lo, hi, iterations = 30):
+	"""
+	vectorized golden-section search for the minima of unimodal functions
+
+	fun
+		function of an array of arguments, evaluated element-wise
+	lo, hi
+		arrays of the search interval bounds
+	iterations
+		number of interval reductions; each one shrinks the interval by 0.618
+	returns
+		array of the arguments of the minima
+	"""
+	ratio = (sqrt(5) - 1) / 2
+	x1 = hi - ratio * (hi - lo)
+	x2 = lo + ratio * (hi - lo)
+	f1 = fun(x1)
+	f2 = fun(x2)
+	for i in range(iterations):
+		#NaN compares False, so such entries just shrink towards lo
+		left = ~(f1 > f2)
+		hi = np.where(left, x2, hi)
+		lo = np.where(left, lo, x1)
+		xnew = np.where(left, hi - ratio * (hi - lo), lo + ratio * (hi - lo))
+		fnew = fun(xnew)
+		x2, f2, x1, f1 = (np.where(left, x1, xnew), np.where(left, f1, fnew),
+			np.where(left, xnew, x2), np.where(left, fnew, f2))
+	return (lo + hi) / 2
+
+def visviva(mu, r, a):
+	"""
+	mu
+		gravitational parameter of the central body (m^3/s^2)
+	r
+		heights over center of mass (m)
+	a
+		semi-major axes (m)
+	returns
+		orbital velocities at r (m/s), NaN where the orbit does not reach r
+	"""
+	with np.errstate(invalid = "ignore", divide = "ignore"):
+		return np.sqrt(mu * (2 / r - 1 / a))
@@ -0,0 +1,276 @@
+"""
+vectorized two-body propagation with universal variables
+
+works for elliptic, parabolic and hyperbolic orbits alike;
+positions and velocities use the IRF convention of Orbit.rvector
+"""
+import numpy as np
+
+from kerbmath.util import *
+from kerbmath.elements import elementstate
+
+def stumpff(z):
+	"""
+	z
+		array
+	returns
+		the Stumpff functions C(z), S(z)
+	"""
+	if np.all(z > 1e-6):
+		#the usual case of ellipses; skip the masking
+		sq = np.sqrt(z)
+		return (1 - np.cos(sq)) / z, (sq - np.sin(sq)) / (sq * z)
+
+	c = np.empty_like(z)
+	s = np.empty_like(z)
+
+	pos = z > 1e-6
+	neg = z < -1e-6
+	small = ~(pos | neg)
+
+	sq = np.sqrt(z[pos])
+	c[pos] = (1 - np.cos(sq)) / z[pos]
+	s[pos] = (sq - np.sin(sq)) / (sq * sq * sq)
+
+	sq = np.sqrt(-z[neg])
+	c[neg] = (np.cosh(sq) - 1) / -z[neg]
+	s[neg] = (np.sinh(sq) - sq) / (sq * sq * sq)
+
+	#series expansion around 0
+	zs = z[small]
+	c[small] = 1/2 - zs * (1/24 - zs / 720)
+	s[small] = 1/6 - zs * (1/120 - zs / 5040)
+
+	return c, s
+
+def propagatestate(mu, r0, v0, dt, tol = 1e-12, maxiter = 50):
+	"""
+	propagate state vectors along their Kepler orbits
+
+	mu
+		gravitational parameter of the central body (m^3/s^2)
+	r0
+		initial position vectors (m), shape (..., 3)
+	v0
+		initial velocity vectors (m/s), shape (..., 3)
+	dt
+		time offsets (s), broadcast against r0[..., 0]
+	tol
+		relative tolerance for the universal anomaly
+	maxiter
+		maximum number of solver iterations
+	returns
+		positions and velocities, each of shape (broadcast shape, 3)
+	"""
+	r0 = np.asarray(r0, dtype = float)
+	v0 = np.asarray(v0, dtype = float)
+	dt = np.asarray(dt, dtype = float)
+
+	shape = np.broadcast_shapes(r0.shape[:-1], dt.shape)
+	r0 = np.broadcast_to(r0, shape + (3,)).reshape(-1, 3)
+	v0 = np.broadcast_to(v0, shape + (3,)).reshape(-1, 3)
+	dt = np.broadcast_to(dt, shape).ravel().copy()
+
+	sqmu = sqrt(mu)
+	r0n = np.sqrt(np.einsum("ij,ij->i", r0, r0))
+	rv0 = np.einsum("ij,ij->i", r0, v0) / sqmu
+	#reciprocal semi-major axis; > 0 for ellipses
+	alpha = 2 / r0n - np.einsum("ij,ij->i", v0, v0) / mu
+
+	#for ellipses, whole revolutions can be skipped
+	ell = alpha > 1e-12 / r0n
+	period = 2 * pi / sqrt(mu) * alpha[ell] ** -1.5
+	dt[ell] = np.fmod(dt[ell], period)
+
+	#initial guess; Laguerre iteration converges from nearly anywhere
+	chi = sqmu * dt / r0n
+	if ell.any():
+		#for ellipses, start from an approximate solution of Kepler's equation
+		a = alpha[ell]
+		sqa = np.sqrt(a)
+		ecose0 = 1 - r0n[ell] * a
+		esine0 = rv0[ell] * sqa
+		e0 = np.arctan2(esine0, ecose0)
+		e = np.hypot(esine0, ecose0)
+		m = e0 - esine0 + sqmu * a * sqa * dt[ell]
+		chi[ell] = (m + e * np.sin(m) * (1 + e * np.cos(m)) - e0) / sqa
+	hyp = alpha < -1e-12 / r0n
+	if hyp.any():
+		a = 1 / alpha[hyp]
+		sign = np.sign(dt[hyp])
+		with np.errstate(invalid = "ignore", divide = "ignore"):
+			guess = sign * np.sqrt(-a) * np.log(-2 * mu * alpha[hyp] * dt[hyp] /
+				(rv0[hyp] * sqmu + sign * np.sqrt(-mu * a) * (1 - r0n[hyp] * alpha[hyp])))
+		chi[hyp] = np.where(np.isfinite(guess), guess, chi[hyp])
+
+	#Laguerre-Conway iteration, only on the unconverged entries
+	#it converges cubically, so a step of relative size tol ** (1/3)
+	#leaves an error of about tol
+	n = 5
+	steptol = tol ** (1/3)
+	beta = 1 - alpha * r0n
+	sqmudt = sqmu * dt
+	todo = None
+	for i in range(maxiter):
+		if todo is None:
+			x, a, r, q, b, m = chi, alpha, r0n, rv0, beta, sqmudt
+		else:
+			x, a, r, q, b, m = chi[todo], alpha[todo], r0n[todo], rv0[todo], beta[todo], sqmudt[todo]
+		x2 = x * x
+		z = a * x2
+		c, s = stumpff(z)
+
+		f = q * x2 * c + b * x2 * x * s + r * x - m
+		df = q * x * (1 - z * s) + b * x2 * c + r
+		ddf = q * (1 - z * c) + b * x * (1 - z * s)
+
+		root = np.sqrt(np.abs((n - 1) ** 2 * df * df - n * (n - 1) * f * ddf))
+		delta = n * f / (df + np.copysign(root, df))
+
+		converged = np.abs(delta) <= steptol * np.maximum(np.abs(x), 1)
+		if todo is None:
+			chi = x - delta
+			todo = np.flatnonzero(~converged)
+		else:
+			chi[todo] = x - delta
+			todo = todo[~converged]
+		if len(todo) == 0:
+			break
+
+	#Lagrange coefficients
+	z = alpha * chi * chi
+	c, s = stumpff(z)
+	chi2 = chi * chi
+	f = 1 - chi2 / r0n * c
+	g = dt - chi2 * chi / sqmu * s
+	r = f[:, None] * r0 + g[:, None] * v0
+	rn = np.sqrt(np.einsum("ij,ij->i", r, r))
+	df = sqmu / (rn * r0n) * (alpha * chi2 * chi * s - chi)
+	dg = 1 - chi2 / rn * c
+	v = df[:, None] * r0 + dg[:, None] * v0
+
+	return r.reshape(shape + (3,)), v.reshape(shape + (3,))
+
+def rotatenode(vec, node):
+	"""
+	rotate vectors around the z axis, moving the ascending node from the x axis
+
+	vec
+		vectors, shape (..., 3)
+	node
+		longitudes of the ascending node (deg), broadcast against vec[..., 0]
+	returns
+		rotated vectors
+	"""
+	node = np.radians(node)
+	cosn = np.cos(node)
+	sinn = np.sin(node)
+	x = vec[..., 0]
+	y = vec[..., 1]
+	return np.stack((cosn * x - sinn * y, sinn * x + cosn * y, vec[..., 2]), axis = -1)
+
+def perifocal(incl, omega, node):
+	"""
+	incl, omega, node
+		inclinations, arguments of periapsis, longitudes of the ascending node (deg), shape (N,)
+	returns
+		unit vectors towards periapsis and 90 degrees ahead of it (IRF), each of shape (N, 3)
+	"""
+	incl, omega, node = np.radians(incl), np.radians(omega), np.radians(node)
+	cosi, sini = np.cos(incl), np.sin(incl)
+	cosw, sinw = np.cos(omega), np.sin(omega)
+	cosn, sinn = np.cos(node), np.sin(node)
+
+	p = np.stack((cosw * cosn - sinw * cosi * sinn, cosw * sinn + sinw * cosi * cosn, sinw * sini), axis = -1)
+	q = np.stack((-sinw * cosn - cosw * cosi * sinn, -sinw * sinn + cosw * cosi * cosn, cosw * sini), axis = -1)
+	return p, q
+
+def propagateelliptic(mu, rp, ra, incl, omega, t, theta0, node, tol = 1e-12):
+	"""
+	like propagate, but only for elliptic orbits that are not close to parabolic
+
+	solves Kepler's equation for the eccentric anomaly with Halley's method,
+	which needs neither masking nor per-entry gathering
+	"""
+	a = (rp + ra) / 2
+	e = (ra - rp) / (ra + rp)
+	b = a * np.sqrt(1 - e * e)
+	n = np.sqrt(mu / (a * a * a))
+
+	half = np.radians(theta0) / 2
+	ecc0 = 2 * np.arctan2(np.sqrt(1 - e) * np.sin(half), np.sqrt(1 + e) * np.cos(half))
+	m0 = ecc0 - e * np.sin(ecc0)
+
+	#mean anomalies, reduced to [-pi, pi)
+	m = np.remainder(m0[:, None] + n[:, None] * t[None, :] + pi, 2 * pi) - pi
+	e = e[:, None]
+
+	ecc = m + e * np.sin(m) * (1 + e * np.cos(m))
+	#Halley's method converges cubically, so a step of size tol ** (1/3) leaves an error of about tol
+	steptol = tol ** (1/3)
+	for i in range(50):
+		sine = np.sin(ecc)
+		cose = np.cos(ecc)
+		f = ecc - e * sine - m
+		df = 1 - e * cose
+		delta = f / (df - 0.5 * f * e * sine / df)
+		ecc -= delta
+		if np.max(np.abs(delta)) <= steptol:
+			break
+
+	sine = np.sin(ecc)
+	cose = np.cos(ecc)
+	a = a[:, None]
+	b = b[:, None]
+	vscale = n[:, None] / (1 - e * cose)
+
+	p, q = perifocal(incl, omega, node)
+	p = p[:, None, :]
+	q = q[:, None, :]
+	r = (a * (cose - e))[..., None] * p + (b * sine)[..., None] * q
+	v = (-a * sine * vscale)[..., None] * p + (b * cose * vscale)[..., None] * q
+
+	return r, v
+
+def propagate(mu, rp, ra, incl, omega, t, theta0 = 0, node = 0):
+	"""
+	positions and velocities of N orbits at M epochs
+
+	mu
+		gravitational parameter of the central body (m^3/s^2)
+	rp, ra, incl, omega
+		orbital elements as in Orbit, shape (N,)
+	t
+		epochs (s), shape (M,)
+	theta0
+		true anomalies at t = 0 (deg), shape (N,)
+	node
+		longitudes of the ascending node (deg), shape (N,)
+		0 places it on the x axis, as in Orbit.rvector
+	returns
+		positions and velocities (IRF), each of shape (N, M, 3)
+	"""
+	rp, ra, incl, omega, theta0, node = (np.atleast_1d(np.asarray(x, dtype = float)) for x in
+		np.broadcast_arrays(rp, ra, incl, omega, theta0, node))
+	t = np.atleast_1d(np.asarray(t, dtype = float))
+
+	#well-behaved ellipses take the fast path, everything else uses universal variables
+	ell = (ra > 0) & ((ra - rp) < 0.99 * (ra + rp))
+	if ell.all():
+		return propagateelliptic(mu, rp, ra, incl, omega, t, theta0, node)
+
+	r = np.empty((len(rp), len(t), 3))
+	v = np.empty((len(rp), len(t), 3))
+	if ell.any():
+		r[ell], v[ell] = propagateelliptic(mu, rp[ell], ra[ell], incl[ell], omega[ell], t, theta0[ell], node[ell])
+
+	other = ~ell
+	r0, v0 = elementstate(mu, rp[other], ra[other], incl[other], omega[other], theta0[other])
+	ro, vo = propagatestate(mu, r0[:, None, :], v0[:, None, :], t[None, :])
+	if np.any(node[other] != 0):
+		ro = rotatenode(ro, node[other][:, None])
+		vo = rotatenode(vo, node[other][:, None])
+	r[other] = ro
+	v[other] = vo
+
+	return r, v
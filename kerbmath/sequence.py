@@ -0,0 +1,395 @@
+"""
+multi-leg mission sequence search
+
+enumerates sequences of flyby bodies between an origin and a target, which
+all orbit the same central body, together with departure epochs and leg
+times of flight. every leg is solved with the Lambert solver; flybys are
+priced as powered flybys (see flybydv).
+
+branches are pruned with Hohmann lower bounds for whole sequences, and by
+the running cost of partial legs for epoch combinations, against the n-th
+best total found so far. sequences are evaluated in worker processes.
+"""
+import itertools
+import os
+import time
+import numpy as np
+
+from kerbmath.util import *
+from kerbmath.orbit import Orbit
+from kerbmath.lambert import lambert
+
+class Node:
+	"""
+	picklable summary of a body, for the worker processes
+	"""
+	def __init__(self, body):
+		self.name = body.name
+		self.mu = body.mu()
+		self.lowr = body.minorbitr()
+		self.soi = body.soi()
+		if body.parent != None:
+			self.ephemeris = body.ephemeris()
+		else:
+			self.ephemeris = None
+
+	def state(self, t):
+		return self.ephemeris.state(t)
+
+	def hyperbolicdv(self, vinf):
+		"""
+		returns
+			dv between the lowest circular orbit and hyperbolas with vinf (m/s)
+		"""
+		return np.sqrt(vinf * vinf + 2 * self.mu / self.lowr) - sqrt(self.mu / self.lowr)
+
+def norm(v):
+	return np.sqrt(np.einsum("...i,...i->...", v, v))
+
+def flybydv(node, vin, vout):
+	"""
+	approximate dv of a powered flyby
+
+	the hyperbola may pass as low as the lowest stable orbit; the speed change
+	is done at periapsis, and turning that exceeds the free turn of the
+	hyperbola is paid for with an extra burn
+
+	node
+		the flyby Node
+	vin, vout
+		incoming and outgoing hyperbolic excess velocities (m/s), shape (..., 3)
+	returns
+		dv (m/s)
+	"""
+	vinn = norm(vin)
+	voutn = norm(vout)
+	with np.errstate(invalid = "ignore", divide = "ignore"):
+		costurn = np.clip(np.einsum("...i,...i->...", vin, vout) / (vinn * voutn), -1, 1)
+		turn = np.arccos(costurn)
+		#maximum turn of the hyperbola with the smaller excess velocity
+		vmin = np.minimum(vinn, voutn)
+		maxturn = 2 * np.arcsin(1 / (1 + node.lowr * vmin * vmin / node.mu))
+
+	vesc2 = 2 * node.mu / node.lowr
+	dv = np.abs(np.sqrt(voutn * voutn + vesc2) - np.sqrt(vinn * vinn + vesc2))
+	extra = np.maximum(turn - maxturn, 0)
+	return dv + 2 * voutn * np.sin(extra / 2)
+
+def escapedv(node, central, r, vbody, vin, centralsoi):
+	"""
+	dv to leave the central body's sphere of influence after the last flyby
+
+	the incoming excess velocity is turned as far as possible towards the velocity of
+	the flyby body; if that is not enough, the remaining speed is added at periapsis
+
+	node
+		the flyby Node
+	central
+		the central Node
+	r, vbody
+		position and velocity of the flyby body (m, m/s), shape (..., 3)
+	vin
+		incoming excess velocity (m/s), shape (..., 3)
+	centralsoi
+		sphere of influence of the central body (m)
+	returns
+		dv (m/s)
+	"""
+	vinn = norm(vin)
+	vbodyn = norm(vbody)
+	vneed = np.sqrt(2 * central.mu / norm(r) - 2 * central.mu / centralsoi)
+
+	with np.errstate(invalid = "ignore", divide = "ignore"):
+		#angle between vin and vbody, and how close the hyperbola can turn it
+		angle = np.arccos(np.clip(np.einsum("...i,...i->...", vin, vbody) / (vinn * vbodyn), -1, 1))
+		maxturn = 2 * np.arcsin(1 / (1 + node.lowr * vinn * vinn / node.mu))
+	angle = np.maximum(angle - maxturn, 0)
+
+	#outgoing speed s along the best direction so that |vbody + s * dir| = vneed
+	proj = vbodyn * np.cos(angle)
+	s = -proj + np.sqrt(np.maximum(proj * proj - vbodyn * vbodyn + vneed * vneed, 0))
+
+	vesc2 = 2 * node.mu / node.lowr
+	return np.where(s > vinn, np.sqrt(s * s + vesc2) - np.sqrt(vinn * vinn + vesc2), 0)
+
+def evaluate(central, nodes, escape, departures, tofs, threshold, best):
+	"""
+	evaluate all epoch combinations of one sequence
+
+	central
+		central Node
+	nodes
+		Nodes of the sequence; the first one is the origin, which may be the central Node itself
+	escape
+		if True, the sequence ends with leaving the central body after the last node;
+		otherwise, it ends with a capture into the lowest orbit of the last node
+	departures
+		departure epochs (s), shape (D,)
+	tofs
+		leg times of flight (s), shape (T,)
+	threshold
+		partial sums of dv at or above this are pruned
+	best
+		number of combinations to return
+	returns
+		list of (dv, departure, leg tofs, leg dvs), combination count, pruned combination count
+	"""
+	mu = central.mu
+	t = departures.copy()
+	cost = np.zeros(len(t))
+	depidx = np.arange(len(t))
+	tofidx = np.zeros((len(t), 0), dtype = np.intp)
+	legdv = np.zeros((len(t), 0))
+	vprev = None
+	combos = 0
+	pruned = 0
+
+	legs = len(nodes) - 1
+
+	for leg in range(legs):
+		a, b = nodes[leg], nodes[leg + 1]
+		k = len(t)
+		tarr = (t[:, None] + tofs[None, :]).ravel()
+		r2, vb2 = b.state(tarr)
+
+		if a is central:
+			#departure from the low orbit, at a point just short of opposite the arrival
+			ang = np.arctan2(r2[:, 1], r2[:, 0]) + pi - np.radians(1)
+			r1 = a.lowr * np.stack((np.cos(ang), np.sin(ang), np.zeros(len(ang))), axis = -1)
+			va1 = sqrt(mu / a.lowr) * np.stack((-np.sin(ang), np.cos(ang), np.zeros(len(ang))), axis = -1)
+		else:
+			r1, va1 = a.state(t)
+			r1 = np.repeat(r1, len(tofs), axis = 0)
+			va1 = np.repeat(va1, len(tofs), axis = 0)
+
+		v1, v2 = lambert(mu, r1, r2, np.tile(tofs, k))
+		combos += len(tarr)
+
+		if a is central:
+			dv = norm(v1 - va1)
+		elif leg == 0:
+			dv = a.hyperbolicdv(norm(v1 - va1))
+		else:
+			vin = np.repeat(vprev, len(tofs), axis = 0) - va1
+			dv = flybydv(a, vin, v1 - va1)
+
+		cost = np.repeat(cost, len(tofs)) + dv
+		depidx = np.repeat(depidx, len(tofs))
+		tofidx = np.column_stack((np.repeat(tofidx, len(tofs), axis = 0), np.tile(np.arange(len(tofs)), k)))
+		legdv = np.column_stack((np.repeat(legdv, len(tofs), axis = 0), dv))
+		t = tarr
+		vprev = v2
+
+		#arrival
+		if leg == legs - 1:
+			if escape:
+				final = escapedv(b, central, r2, vb2, v2 - vb2, central.soi)
+			else:
+				final = b.hyperbolicdv(norm(v2 - vb2))
+			cost = cost + final
+			legdv = np.column_stack((legdv, final))
+
+		keep = cost < threshold
+		pruned += len(keep) - np.count_nonzero(keep)
+		t, cost, depidx, tofidx, legdv, vprev = t[keep], cost[keep], depidx[keep], tofidx[keep], legdv[keep], vprev[keep]
+
+	if legs == 0:
+		#direct escape from the low orbit of the central body
+		dv = sqrt(2 * mu / central.lowr - 2 * mu / central.soi) - sqrt(mu / central.lowr)
+		cost = np.full(len(t), dv)
+		legdv = cost[:, None]
+		if not dv < threshold:
+			return [], combos, len(t)
+
+	order = np.argsort(cost)[:best]
+	results = [(float(cost[i]), float(departures[depidx[i]]), tuple(float(tofs[j]) for j in tofidx[i]), tuple(legdv[i].tolist()))
+		for i in order]
+	return results, combos, pruned
+
+def evaluatetask(args):
+	return evaluate(*args)
+
+class Candidate:
+	"""
+	one evaluated mission
+	"""
+	def __init__(self, names, dv, departure, tofs, legdvs):
+		"""
+		names
+			names of the bodies along the sequence ('escape' at the end, if escaping)
+		dv
+			total dv (m/s)
+		departure
+			departure epoch (s)
+		tofs
+			times of flight of the legs (s)
+		legdvs
+			dv of the departure, each flyby and the arrival (m/s)
+		"""
+		self.names = names
+		self.dv = dv
+		self.departure = departure
+		self.tofs = tofs
+		self.legdvs = legdvs
+
+	def __repr__(self):
+		return (" -> ".join(self.names) + ": " + velstr(self.dv) +
+			", depart at %.0fs, tofs " % self.departure + ", ".join("%.0fs" % tof for tof in self.tofs))
+
+class SearchResult:
+	"""
+	result of search()
+	"""
+	def __init__(self, candidates, stats):
+		"""
+		candidates
+			the best Candidates, cheapest first
+		stats
+			dict of search statistics
+		"""
+		self.candidates = candidates
+		self.stats = stats
+
+	def __repr__(self):
+		lines = [repr(cand) for cand in self.candidates]
+		lines.append(", ".join(key + ": " + str(val) for key, val in self.stats.items()))
+		return "\n".join(lines)
+
+def hohmannbound(central, origin, first):
+	"""
+	lower bound for the departure dv of all sequences that start with the leg origin -> first:
+	a tangential burn from a circular orbit is the cheapest way to reach another radius
+
+	central
+		the central body
+	origin
+		the origin body; if it is the central body, departure is from its lowest orbit
+	first
+		the first body after the origin, or None for a direct escape
+	returns
+		dv (m/s)
+	"""
+	if origin is central:
+		r0 = origin.minorbitr()
+	else:
+		r0 = origin.sma
+	if first == None:
+		r1 = central.soi()
+	else:
+		r1 = first.sma
+
+	v0 = sqrt(central.mu() / r0)
+	if r1 == inf:
+		transfer = Orbit.fromapsides(central, r0, inf, register = False)
+	else:
+		transfer = Orbit.fromapsides(central, min(r0, r1), max(r0, r1), register = False)
+	vdep = transfer.vp() if r1 > r0 else transfer.va()
+	vinf = abs(vdep - v0)
+
+	if origin is central:
+		return vinf
+	return float(Node(origin).hyperbolicdv(vinf))
+
+def search(origin, target, departures, tofs, flybys = None, maxflybys = 2, best = 10, workers = None):
+	"""
+	search flyby sequences for the lowest total dv
+
+	origin
+		origin body; departure is from its lowest orbit
+		this may be the central body itself, or a body that orbits it
+	target
+		target body (capture into its lowest orbit), or 'escape' to leave the
+		sphere of influence of the central body; the central body is the parent
+		of the target, or the origin when escaping
+	departures
+		departure epochs (s)
+	tofs
+		times of flight to try for each leg (s)
+	flybys
+		candidate flyby bodies; defaults to all bodies that orbit the central body
+	maxflybys
+		maximum number of flybys per sequence
+	best
+		number of candidates to report
+	workers
+		number of worker processes; None means one per CPU, 0 runs in this process
+	returns
+		SearchResult
+	"""
+	escape = target == "escape"
+	if escape:
+		central = origin
+	else:
+		central = target.parent
+	if central == None or (origin is not central and origin.parent is not central):
+		raise Exception("Origin and target must belong to the same central body")
+	if flybys == None:
+		flybys = central.children()
+
+	departures = np.atleast_1d(np.asarray(departures, dtype = float))
+	tofs = np.atleast_1d(np.asarray(tofs, dtype = float))
+	starttime = time.time()
+
+	#enumerate sequences, with their lower bounds
+	nodes = {body.name: Node(body) for body in set(flybys) | {origin, central} | ({target} if not escape else set())}
+	sequences = []
+	for count in range(maxflybys + 1):
+		for seq in itertools.product(flybys, repeat = count):
+			bodies = (origin,) + seq
+			if not escape:
+				bodies += (target,)
+			if any(a is b for a, b in zip(bodies, bodies[1:])):
+				continue
+			first = bodies[1] if len(bodies) > 1 else None
+			sequences.append((hohmannbound(central, origin, first), count, bodies))
+	sequences.sort(key = lambda entry: entry[:2])
+
+	stats = {"sequences": len(sequences), "pruned": 0, "evaluated": 0, "combinations": 0, "prunedcombinations": 0}
+	found = []
+
+	def threshold():
+		if len(found) < best:
+			return inf
+		return found[best - 1].dv
+
+	def collect(bodies, result):
+		results, combos, pruned = result
+		stats["evaluated"] += 1
+		stats["combinations"] += combos
+		stats["prunedcombinations"] += pruned
+		names = tuple(body.name for body in bodies) + (("escape",) if escape else ())
+		for dv, dep, legtofs, legdvs in results:
+			found.append(Candidate(names, dv, dep, legtofs, legdvs))
+		found.sort(key = lambda cand: cand.dv)
+		del found[best:]
+
+	def task(bodies):
+		return (nodes[central.name], [nodes[body.name] for body in bodies], escape, departures, tofs, threshold(), best)
+
+	if workers == 0:
+		for bound, count, bodies in sequences:
+			if bound >= threshold():
+				stats["pruned"] += 1
+				continue
+			collect(bodies, evaluatetask(task(bodies)))
+	else:
+		from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+		with ProcessPoolExecutor(max_workers = workers) as pool:
+			#keep a few tasks in flight, so the thresholds of later tasks stay tight
+			maxpending = 2 * (workers or os.cpu_count())
+			pending = {}
+			queue = iter(sequences)
+			for bound, count, bodies in queue:
+				if bound >= threshold():
+					stats["pruned"] += 1
+					continue
+				pending[pool.submit(evaluatetask, task(bodies))] = bodies
+				while len(pending) >= maxpending:
+					done, _ = wait(pending, return_when = FIRST_COMPLETED)
+					for future in done:
+						collect(pending.pop(future), future.result())
+			for future in list(pending):
+				collect(pending.pop(future), future.result())
+
+	stats["time"] = round(time.time() - starttime, 3)
+	return SearchResult(found, stats)
@@ -0,0 +1,574 @@
+"""
+local JSON-RPC computation server
+
+holds one loaded System and answers JSON-RPC 2.0 requests, POSTed over HTTP:
+
+	curl -d '{"jsonrpc": "2.0", "id": 1, "method": "orbit.circ",
+		"params": {"body": "kerbin", "rp": 680000, "ra": 2000000}}' localhost:8642
+
+requests for the same OrbitArray method and body that arrive within a short
+window are coalesced into one vectorized call; aerobrake and aerocapture
+jobs run in a process pool. GET /metrics returns latency and throughput
+statistics as JSON.
+
+usage:
+	python -m kerbmath serve [--conf kerbol.ini] [--port 8642] [--workers N]
+"""
+import asyncio
+import collections
+import json
+import time
+import numpy as np
+
+from kerbmath.util import *
+
+#batched OrbitArray methods: method name: names of the per-orbit arguments
+BATCHED = {
+	"e": (), "a": (), "period": (), "specenergy": (), "vp": (), "va": (),
+	"deorbit": (), "escape": (), "circ": (),
+	"v": ("r",),
+	"chrp": ("rpnew",), "chra": ("ranew",), "chhp": ("hpnew",), "chha": ("hanew",),
+	"chir": ("r", "inclnew"), "chih": ("h", "inclnew"),
+}
+
+#JSON-RPC 2.0 error codes
+PARSEERROR = -32700
+INVALIDREQUEST = -32600
+METHODNOTFOUND = -32601
+INVALIDPARAMS = -32602
+INTERNALERROR = -32603
+
+class RPCError(Exception):
+	"""
+	error that is reported to the client as JSON-RPC error object
+	"""
+	def __init__(self, code, message):
+		super().__init__(message)
+		self.code = code
+		self.message = message
+
+def tojson(val):
+	"""
+	returns
+		val with numpy arrays and scalars converted to lists and floats, and NaN to None
+	"""
+	if isinstance(val, np.ndarray):
+		val = val.tolist()
+	if isinstance(val, np.generic):
+		val = val.item()
+	if isinstance(val, float):
+		return val if isfinite(val) else None
+	if isinstance(val, (list, tuple)):
+		return [tojson(x) for x in val]
+	if isinstance(val, dict):
+		return {key: tojson(x) for key, x in val.items()}
+	return val
+
+#the System of a worker process, loaded once by initworker
+WORKERSYSTEM = None
+
+def initworker(conffile):
+	"""
+	load the configuration in a worker process
+	"""
+	global WORKERSYSTEM
+	from kerbmath.system import System
+	WORKERSYSTEM = System(globalorbits = False, printorbits = False, printbodies = False)
+	WORKERSYSTEM.readconf(conffile)
+
+def aerobraketask(body, rp, ra, incl, omega, d, tmax):
+	"""
+	simulate one atmospheric pass in a worker
+
+	returns
+		dict with outcome, duration (s), hmin (m), steps and the exit orbit apsides (m)
+	"""
+	from kerbmath.orbit import Orbit
+	from kerbmath.sink import RingBuffer
+	body = WORKERSYSTEM.bodies[body]
+	orb = Orbit.fromapsides(body, rp, ra, incl, omega, register = False)
+	sink = RingBuffer(2)
+	traj = orb.aerobrake(d = d, tmax = tmax, sink = sink)
+	result = {
+		"outcome": traj.outcome,
+		#the pass starts at t = 0 on entry, and the last sample is always kept
+		"duration": float(traj.times[-1]),
+		"hmin": traj.hmin,
+		"steps": sink.count,
+		"exitrp": None,
+		"exitra": None,
+	}
+	if traj.exitorbit != None:
+		result["exitrp"] = traj.exitorbit.rp
+		result["exitra"] = traj.exitorbit.ra
+	WORKERSYSTEM.clearorbits(None)
+	return result
+
+def aerocapturetask(body, hp, ventry, d, incl, tmax):
+	"""
+	simulate a set of atmospheric entries in a worker
+
+	returns
+		dict of column name: list, see aerocapture.RESULTDTYPE; outcome as names
+	"""
+	from kerbmath.aerocapture import aerocapture, OUTCOMES
+	result = aerocapture(WORKERSYSTEM.bodies[body], hp, ventry, d, incl, workers = 0, tmax = tmax)
+	columns = {name: result[name].tolist() for name in result.dtype.names}
+	columns["outcome"] = [OUTCOMES[i] for i in columns["outcome"]]
+	return columns
+
+class Metrics:
+	"""
+	request counters and latencies per method
+	"""
+	def __init__(self, keep = 1024):
+		"""
+		keep
+			number of recent latencies per method that the percentiles are computed from
+		"""
+		self.keep = keep
+		self.start = time.monotonic()
+		#method: [requests, errors, total latency (s)]
+		self.counters = {}
+		#method: deque of recent latencies (s)
+		self.latencies = {}
+		#(number of batched calls, number of requests in them)
+		self.batches = [0, 0]
+		self.httprequests = 0
+
+	def record(self, method, latency, error = False):
+		counter = self.counters.setdefault(method, [0, 0, 0.0])
+		counter[0] += 1
+		counter[1] += error
+		counter[2] += latency
+		self.latencies.setdefault(method, collections.deque(maxlen = self.keep)).append(latency)
+
+	def snapshot(self):
+		"""
+		returns
+			JSON-compatible dict of all metrics; latencies in seconds
+		"""
+		uptime = time.monotonic() - self.start
+		methods = {}
+		total = 0
+		for method, (calls, errors, latency) in self.counters.items():
+			total += calls
+			recent = np.array(self.latencies[method])
+			p50, p95, p99 = np.percentile(recent, (50, 95, 99))
+			methods[method] = {
+				"requests": calls,
+				"errors": errors,
+				"mean": latency / calls,
+				"p50": float(p50),
+				"p95": float(p95),
+				"p99": float(p99),
+				"max": float(recent.max()),
+			}
+		batches, batched = self.batches
+		return {
+			"uptime": uptime,
+			"requests": total,
+			"httprequests": self.httprequests,
+			"throughput": total / uptime if uptime > 0 else 0,
+			"batches": batches,
+			"meanbatch": batched / batches if batches else 0,
+			"methods": methods,
+		}
+
+class Batcher:
+	"""
+	coalesces the requests for one OrbitArray method and body into one vectorized call
+	"""
+	def __init__(self, system, metrics, window = 0.002, maxbatch = 4096):
+		"""
+		window
+			time (s) that the first request of a batch waits for others
+		maxbatch
+			number of orbits at which a batch is run without waiting for the window to end
+		"""
+		self.system = system
+		self.metrics = metrics
+		self.window = window
+		self.maxbatch = maxbatch
+		#(method, body name): list of (columns, future)
+		self.queued = {}
+		self.size = 0
+		self.timer = None
+
+	def submit(self, method, body, columns):
+		"""
+		method
+			OrbitArray method name (a key of BATCHED)
+		body
+			body name
+		columns
+			dict of rp, ra, incl, omega and the method arguments: arrays of equal length
+		returns
+			future of the result array
+		"""
+		loop = asyncio.get_running_loop()
+		future = loop.create_future()
+		self.queued.setdefault((method, body), []).append((columns, future))
+		self.size += len(columns["rp"])
+
+		if self.size >= self.maxbatch:
+			self.flush()
+		elif self.timer == None:
+			self.timer = loop.call_later(self.window, self.flush)
+		return future
+
+	def flush(self):
+		if self.timer != None:
+			self.timer.cancel()
+			self.timer = None
+		queued = self.queued
+		self.queued = {}
+		self.size = 0
+
+		for (method, body), entries in queued.items():
+			self.metrics.batches[0] += 1
+			self.metrics.batches[1] += len(entries)
+			try:
+				results = self.run(method, body, [columns for columns, future in entries])
+			except Exception:
+				#one bad request must not fail the others: run them one by one
+				results = []
+				for columns, future in entries:
+					try:
+						results.extend(self.run(method, body, [columns]))
+					except Exception as exc:
+						results.append(exc)
+
+			for (columns, future), result in zip(entries, results):
+				if future.done():
+					continue
+				if isinstance(result, Exception):
+					future.set_exception(RPCError(INVALIDPARAMS, str(result)))
+				else:
+					future.set_result(result)
+
+	def run(self, method, body, batch):
+		"""
+		returns
+			list of the result arrays of the requests in batch
+		"""
+		from kerbmath.orbitarray import OrbitArray
+		columns = {name: np.concatenate([c[name] for c in batch]) for name in batch[0]}
+		orbits = OrbitArray(self.system.bodies[body], columns["rp"], columns["ra"], columns["incl"], columns["omega"])
+		result = getattr(orbits, method)(*(columns[name] for name in BATCHED[method]))
+		result = np.broadcast_to(result, (len(orbits),))
+		offsets = np.cumsum([len(c["rp"]) for c in batch])[:-1]
+		return np.split(result, offsets)
+
+class Server:
+	"""
+	the JSON-RPC server
+
+		server = Server(system, conffile)
+		port = await server.start("127.0.0.1", 0)
+		...
+		await server.stop()
+	"""
+	def __init__(self, system, conffile, workers = None, window = 0.002, maxbatch = 4096):
+		"""
+		system
+			the loaded System
+		conffile
+			its configuration file, which the worker processes load
+		workers
+			number of worker processes for aerobrake and aerocapture jobs;
+			None means one per CPU, 0 runs them in a thread of this process
+		window, maxbatch
+			see Batcher
+		"""
+		self.system = system
+		self.conffile = conffile
+		self.workers = workers
+		self.metrics = Metrics()
+		self.batcher = Batcher(system, self.metrics, window, maxbatch)
+		self.pool = None
+		self.server = None
+		#method name: coroutine function of the params dict
+		self.methods = {
+			"bodies": self.bodies,
+			"route": self.route,
+			"aerobrake": self.aerobrake,
+			"aerocapture": self.aerocapture,
+			"metrics": self.getmetrics,
+		}
+		for name in BATCHED:
+			self.methods["orbit." + name] = self.batchmethod(name)
+
+	async def start(self, host = "127.0.0.1", port = 8642):
+		"""
+		start listening
+
+		port
+			TCP port; 0 chooses a free one
+		returns
+			the port
+		"""
+		if self.workers == 0:
+			from concurrent.futures import ThreadPoolExecutor
+			self.pool = ThreadPoolExecutor(1, initializer = initworker, initargs = (self.conffile,))
+		else:
+			from concurrent.futures import ProcessPoolExecutor
+			self.pool = ProcessPoolExecutor(self.workers, initializer = initworker, initargs = (self.conffile,))
+		self.server = await asyncio.start_server(self.handle, host, port)
+		return self.server.sockets[0].getsockname()[1]
+
+	async def stop(self):
+		self.server.close()
+		await self.server.wait_closed()
+		self.pool.shutdown()
+
+	async def handle(self, reader, writer):
+		"""
+		serve one HTTP connection
+		"""
+		try:
+			while True:
+				requestline = await reader.readline()
+				if not requestline:
+					break
+				try:
+					verb, path, version = requestline.decode("latin-1").split()
+				except ValueError:
+					await self.respond(writer, 400, {"error": "malformed request line"})
+					break
+
+				headers = {}
+				while True:
+					line = await reader.readline()
+					if line in (b"\r\n", b"\n", b""):
+						break
+					key, sep, val = line.decode("latin-1").partition(":")
+					headers[key.strip().lower()] = val.strip()
+				body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+				self.metrics.httprequests += 1
+				if verb == "GET" and path == "/metrics":
+					await self.respond(writer, 200, self.metrics.snapshot())
+				elif verb == "POST":
+					response = await self.dispatch(body)
+					if response == None:
+						await self.respond(writer, 204, None)
+					else:
+						await self.respond(writer, 200, response)
+				else:
+					await self.respond(writer, 404, {"error": "POST JSON-RPC requests, or GET /metrics"})
+
+				keepalive = version == "HTTP/1.1"
+				connection = headers.get("connection", "").lower()
+				if connection == "close" or (connection != "keep-alive" and not keepalive):
+					break
+		except (ConnectionError, asyncio.IncompleteReadError):
+			pass
+		finally:
+			writer.close()
+
+	async def respond(self, writer, status, payload):
+		reasons = {200: "OK", 204: "No Content", 400: "Bad Request", 404: "Not Found"}
+		data = b"" if payload == None else json.dumps(payload).encode()
+		head = "HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n" % (status, reasons[status], len(data))
+		writer.write(head.encode("latin-1") + data)
+		await writer.drain()
+
+	async def dispatch(self, body):
+		"""
+		body
+			HTTP request body: a JSON-RPC request or batch
+		returns
+			JSON-RPC response, list of responses, or None if there is nothing to respond
+		"""
+		try:
+			request = json.loads(body)
+		except ValueError as exc:
+			return self.error(None, PARSEERROR, "Parse error: " + str(exc))
+
+		if isinstance(request, list):
+			if not request:
+				return self.error(None, INVALIDREQUEST, "Empty batch")
+			responses = await asyncio.gather(*(self.call(r) for r in request))
+			responses = [r for r in responses if r != None]
+			return responses or None
+
+		return await self.call(request)
+
+	def error(self, id, code, message):
+		return {"jsonrpc": "2.0", "id": id, "error": {"code": code, "message": message}}
+
+	async def call(self, request):
+		"""
+		answer one JSON-RPC request
+
+		returns
+			the response, or None for notifications
+		"""
+		if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or not isinstance(request.get("method"), str):
+			return self.error(None, INVALIDREQUEST, "Invalid Request")
+
+		id = request.get("id")
+		method = request["method"]
+		params = request.get("params", {})
+		start = time.perf_counter()
+		try:
+			if method not in self.methods:
+				raise RPCError(METHODNOTFOUND, "Method not found: " + method)
+			if not isinstance(params, dict):
+				raise RPCError(INVALIDPARAMS, "params must be an object")
+			response = {"jsonrpc": "2.0", "id": id, "result": tojson(await self.methods[method](params))}
+		except RPCError as exc:
+			response = self.error(id, exc.code, exc.message)
+		except Exception as exc:
+			response = self.error(id, INTERNALERROR, type(exc).__name__ + ": " + str(exc))
+
+		if method in self.methods:
+			self.metrics.record(method, time.perf_counter() - start, "error" in response)
+		if "id" not in request:
+			return None
+		return response
+
+	def getbody(self, params):
+		name = params.get("body")
+		if not isinstance(name, str) or name not in self.system.bodies:
+			raise RPCError(INVALIDPARAMS, "Unknown body: " + repr(name))
+		return name
+
+	def columns(self, params, names):
+		"""
+		returns
+			dict of name: 1-d float array, with all params broadcast against each other
+			scalar params give a scalar result
+		"""
+		missing = [name for name in names if name not in params]
+		if missing:
+			raise RPCError(INVALIDPARAMS, "Missing params: " + ", ".join(missing))
+		try:
+			arrays = [np.asarray(params[name], dtype = float) for name in names]
+			scalar = all(a.ndim == 0 for a in arrays)
+			arrays = np.broadcast_arrays(*arrays)
+		except (TypeError, ValueError) as exc:
+			raise RPCError(INVALIDPARAMS, str(exc))
+		return {name: np.atleast_1d(a).ravel() for name, a in zip(names, arrays)}, scalar
+
+	def batchmethod(self, method):
+		"""
+		returns
+			coroutine function that answers 'orbit.<method>' requests via the batcher
+		"""
+		async def run(params):
+			body = self.getbody(params)
+			params = dict(params)
+			params.setdefault("incl", 0)
+			params.setdefault("omega", 0)
+			columns, scalar = self.columns(params, ("rp", "ra", "incl", "omega") + BATCHED[method])
+			result = await self.batcher.submit(method, body, columns)
+			return result[0] if scalar else result
+		run.__name__ = method
+		return run
+
+	async def bodies(self, params):
+		"""
+		returns
+			the body names
+		"""
+		return list(self.system.bodies)
+
+	async def route(self, params):
+		"""
+		params: src, dst (delta-v map nodes)
+		returns
+			{"dv": total dv (m/s), "path": list of nodes}
+		"""
+		try:
+			dv, path = self.system.dvmap().route(params["src"], params["dst"])
+		except KeyError as exc:
+			raise RPCError(INVALIDPARAMS, "Missing param: " + str(exc))
+		except Exception as exc:
+			raise RPCError(INVALIDPARAMS, str(exc))
+		return {"dv": dv, "path": path}
+
+	async def aerobrake(self, params):
+		"""
+		params: body, rp, ra (m), incl, omega (deg), d, tmax (s)
+		returns
+			see aerobraketask
+		"""
+		body = self.getbody(params)
+		try:
+			args = [float(params[name]) for name in ("rp", "ra")]
+			args += [float(params.get(name, default)) for name, default in (("incl", 0), ("omega", 0), ("d", 0.2), ("tmax", 86400))]
+		except KeyError as exc:
+			raise RPCError(INVALIDPARAMS, "Missing param: " + str(exc))
+		except (TypeError, ValueError) as exc:
+			raise RPCError(INVALIDPARAMS, str(exc))
+
+		loop = asyncio.get_running_loop()
+		try:
+			return await loop.run_in_executor(self.pool, aerobraketask, body, *args)
+		except Exception as exc:
+			raise RPCError(INVALIDPARAMS, str(exc))
+
+	async def aerocapture(self, params):
+		"""
+		params: body, hp (km), ventry (m/s), d, incl (deg), tmax (s); hp to incl may be lists
+		returns
+			see aerocapturetask
+		"""
+		body = self.getbody(params)
+		params = dict(params)
+		params.setdefault("d", 0.2)
+		params.setdefault("incl", 0)
+		columns, scalar = self.columns(params, ("hp", "ventry", "d", "incl"))
+		tmax = float(params.get("tmax", 86400))
+
+		loop = asyncio.get_running_loop()
+		try:
+			return await loop.run_in_executor(self.pool, aerocapturetask, body,
+				columns["hp"], columns["ventry"], columns["d"], columns["incl"], tmax)
+		except Exception as exc:
+			raise RPCError(INVALIDPARAMS, str(exc))
+
+	async def getmetrics(self, params):
+		return self.metrics.snapshot()
+
+def call(url, method, params = None, id = 1):
+	"""
+	minimal client, e.g. for scripts and tests
+
+	url
+		server url, such as 'http://127.0.0.1:8642/'
+	returns
+		the result of the call
+	"""
+	import urllib.request
+	request = {"jsonrpc": "2.0", "id": id, "method": method, "params": params or {}}
+	req = urllib.request.Request(url, json.dumps(request).encode(), {"Content-Type": "application/json"})
+	with urllib.request.urlopen(req) as f:
+		response = json.load(f)
+	if "error" in response:
+		raise Exception(method + ": " + response["error"]["message"])
+	return response["result"]
+
+def serve(conffile, host = "127.0.0.1", port = 8642, workers = None, window = 0.002, maxbatch = 4096):
+	"""
+	load the configuration and serve until interrupted
+	"""
+	from kerbmath.system import System
+	system = System(globalorbits = False, printorbits = False, printbodies = False)
+	system.readconf(conffile)
+
+	async def main():
+		server = Server(system, conffile, workers, window, maxbatch)
+		bound = await server.start(host, port)
+		print("kerbmath serving " + conffile + " on http://" + host + ":" + str(bound) + "/")
+		try:
+			await server.server.serve_forever()
+		finally:
+			await server.stop()
+
+	try:
+		asyncio.run(main())
+	except KeyboardInterrupt:
+		pass
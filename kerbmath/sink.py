@@ -0,0 +1,204 @@
+"""
+sinks for simulation samples
+
+a sink receives the (t, state) samples of a simulation as they are produced;
+decimation drops all but every n-th sample before any work is done on it
+"""
+import numpy as np
+
+from kerbmath.util import *
+
+#record layout of one sample
+SAMPLEDTYPE = np.dtype([("t", "<f8"), ("state", "<f8", (6,))])
+
+class Sink:
+	"""
+	base class of all sinks
+	"""
+	def __init__(self, decimate = 1):
+		"""
+		decimate
+			only every decimate-th sample is stored
+		"""
+		if decimate < 1:
+			raise Exception("decimate must be >= 1, but is " + str(decimate))
+		self.decimate = decimate
+		self.count = 0
+
+	def push(self, t, y, force = False):
+		"""
+		offer a sample to the sink
+
+		t
+			time (s)
+		y
+			state (array)
+		force
+			store the sample regardless of decimation
+		"""
+		if force or self.count % self.decimate == 0:
+			self.write(t, y)
+		self.count += 1
+
+	def write(self, t, y):
+		"""
+		store a sample; implemented by the subclasses
+		"""
+		raise Exception("Not implemented: " + type(self).__name__ + ".write")
+
+	def close(self):
+		"""
+		called when the simulation is finished
+		"""
+		pass
+
+class ListSink(Sink):
+	"""
+	keeps all samples in memory
+	"""
+	def __init__(self, decimate = 1):
+		super().__init__(decimate)
+		self._times = []
+		self._states = []
+
+	def write(self, t, y):
+		self._times.append(t)
+		self._states.append(np.array(y))
+
+	def times(self):
+		"""
+		returns
+			sample times (s), shape (M,)
+		"""
+		return np.array(self._times)
+
+	def states(self):
+		"""
+		returns
+			sample states, shape (M, 6)
+		"""
+		return np.array(self._states).reshape(len(self._times), -1)
+
+class RingBuffer(Sink):
+	"""
+	keeps only the last samples in memory, in preallocated arrays
+	"""
+	def __init__(self, size, decimate = 1):
+		"""
+		size
+			number of samples that are kept
+		decimate
+			only every decimate-th sample is stored
+		"""
+		super().__init__(decimate)
+		self.buf = np.zeros(size, dtype = SAMPLEDTYPE)
+		#number of samples written so far
+		self.written = 0
+
+	def write(self, t, y):
+		rec = self.buf[self.written % len(self.buf)]
+		rec["t"] = t
+		rec["state"] = y
+		self.written += 1
+
+	def samples(self):
+		"""
+		returns
+			the stored samples in chronological order (SAMPLEDTYPE array)
+		"""
+		size = len(self.buf)
+		if self.written <= size:
+			return self.buf[:self.written].copy()
+		start = self.written % size
+		return np.concatenate((self.buf[start:], self.buf[:start]))
+
+	def times(self):
+		return self.samples()["t"]
+
+	def states(self):
+		return self.samples()["state"]
+
+class FileSink(Sink):
+	"""
+	appends samples as fixed-size binary records to a file
+
+	if the filename ends with '.npy', the file is a valid numpy array file;
+	otherwise, it contains only the raw SAMPLEDTYPE records.
+	either way, it can be opened memory-mapped with load().
+	"""
+	#the .npy header is written with a fixed length, so it can be updated in-place
+	HEADERLEN = 128
+
+	def __init__(self, filename, decimate = 1, buffersize = 4096):
+		"""
+		filename
+			output file; overwritten if it exists
+		decimate
+			only every decimate-th sample is stored
+		buffersize
+			number of samples that are collected before they are written
+		"""
+		super().__init__(decimate)
+		self.filename = filename
+		self.npy = filename.endswith(".npy")
+		self.file = open(filename, "wb")
+		self.buf = np.zeros(buffersize, dtype = SAMPLEDTYPE)
+		self.buffered = 0
+		self.written = 0
+
+		if self.npy:
+			self.writeheader()
+
+	def writeheader(self):
+		"""
+		(re-)write the .npy header for the current number of records
+		"""
+		header = repr({
+			"descr": np.lib.format.dtype_to_descr(SAMPLEDTYPE),
+			"fortran_order": False,
+			"shape": (self.written,),
+		})
+		#magic string, version 1.0, little-endian uint16 header length
+		prefix = b"\x93NUMPY\x01\x00" + (self.HEADERLEN - 10).to_bytes(2, "little")
+		header = header.ljust(self.HEADERLEN - len(prefix) - 1) + "\n"
+		self.file.seek(0)
+		self.file.write(prefix + header.encode("latin1"))
+		self.file.seek(0, 2)
+
+	def write(self, t, y):
+		rec = self.buf[self.buffered]
+		rec["t"] = t
+		rec["state"] = y
+		self.buffered += 1
+		if self.buffered == len(self.buf):
+			self.flush()
+
+	def flush(self):
+		"""
+		write the buffered samples to the file
+		"""
+		self.file.write(self.buf[:self.buffered].tobytes())
+		self.written += self.buffered
+		self.buffered = 0
+
+	def close(self):
+		if self.file.closed:
+			return
+		self.flush()
+		if self.npy:
+			self.writeheader()
+		self.file.close()
+
+def load(filename):
+	"""
+	open a file that was written by FileSink, memory-mapped
+
+	filename
+		the file
+	returns
+		read-only SAMPLEDTYPE array
+	"""
+	if filename.endswith(".npy"):
+		return np.load(filename, mmap_mode = "r")
+	else:
+		return np.memmap(filename, dtype = SAMPLEDTYPE, mode = "r")
@@ -0,0 +1,222 @@
+"""
+call counters and timers for the hot paths
+
+while disabled, nothing is instrumented, so there is no cost at all;
+enabling replaces the entry points in HOTPATHS with counting and timing
+wrappers, and disabling restores the originals.
+
+the times are inclusive: e.g. the time of Orbit.__init__ contains that of System.addorb
+"""
+import functools
+import importlib
+import time
+
+from kerbmath.util import *
+
+#instrumented entry points: (module, class or None for module functions, function)
+HOTPATHS = [
+	("kerbmath.orbit", "Orbit", "__init__"),
+	("kerbmath.orbit", "Orbit", "fromapsides"),
+	("kerbmath.orbit", "Orbit", "aerobrake"),
+	("kerbmath.system", "System", "addorb"),
+	("kerbmath.system", "System", "readconf"),
+	("kerbmath.atmosphere", "Atmosphere", "accel"),
+	("kerbmath.atmosphere", "Atmosphere", "rho"),
+	("kerbmath.atmosphere", "TableAtmosphere", "rho"),
+	("kerbmath.integrate", "DormandPrince", "step"),
+	("kerbmath.trajectory", None, "aerobrake"),
+	("kerbmath.aerocapture", None, "simulatechunk"),
+	("kerbmath.ascent", None, "simulatechunk"),
+]
+
+class Stats:
+	"""
+	counters of all instrumented entry points
+	"""
+	def __init__(self):
+		#entry point name: [calls, total time (s)]
+		self.counters = {}
+		#entry point name: (owner, attribute name, original attribute)
+		self.originals = {}
+		#estimated cost of the wrapper per call (s)
+		self.overhead = 0
+		self.enabled = False
+
+	def watch(self, owner, attr, name = None):
+		"""
+		instrument one more entry point
+
+		owner
+			class or module that has the function as attribute
+		attr
+			attribute name of the function
+		name
+			name in the report; defaults to owner.attr
+		"""
+		if name == None:
+			name = owner.__name__.split(".")[-1] + "." + attr
+		if name in self.originals:
+			return
+
+		original = owner.__dict__[attr]
+		if isinstance(original, classmethod):
+			wrapped = classmethod(self.wrap(name, original.__func__))
+		elif isinstance(original, staticmethod):
+			wrapped = staticmethod(self.wrap(name, original.__func__))
+		else:
+			wrapped = self.wrap(name, original)
+
+		self.originals[name] = (owner, attr, original)
+		setattr(owner, attr, wrapped)
+
+	def wrap(self, name, fun):
+		"""
+		returns
+			a wrapper of fun that counts its calls and their time into self.counters[name]
+		"""
+		counter = self.counters.setdefault(name, [0, 0.0])
+		clock = time.perf_counter
+
+		def wrapper(*args, **kw):
+			start = clock()
+			try:
+				return fun(*args, **kw)
+			finally:
+				counter[0] += 1
+				counter[1] += clock() - start
+
+		#the wrapper takes the place of fun in its module, so with the module and
+		#qualified name of fun it is pickled by reference (e.g. for worker processes)
+		return functools.wraps(fun)(wrapper)
+
+	def enable(self):
+		"""
+		instrument all entry points in HOTPATHS
+		"""
+		if self.enabled:
+			return
+		for modname, clsname, attr in HOTPATHS:
+			module = importlib.import_module(modname)
+			if clsname == None:
+				self.watch(module, attr, modname.split(".")[-1] + "." + attr)
+			else:
+				self.watch(getattr(module, clsname), attr, clsname + "." + attr)
+		self.overhead = self.measureoverhead()
+		self.enabled = True
+
+	def disable(self):
+		"""
+		restore the original entry points; the counters are kept
+		"""
+		for owner, attr, original in self.originals.values():
+			setattr(owner, attr, original)
+		self.originals.clear()
+		self.enabled = False
+
+	def reset(self):
+		"""
+		zero all counters
+		"""
+		for counter in self.counters.values():
+			counter[0] = 0
+			counter[1] = 0.0
+
+	def measureoverhead(self, n = 20000):
+		"""
+		returns
+			the time (s) that the wrapper adds to each call
+		"""
+		def noop():
+			pass
+		wrapped = Stats().wrap("noop", noop)
+		best = inf
+		for i in range(3):
+			start = time.perf_counter()
+			for j in range(n):
+				noop()
+			plain = time.perf_counter() - start
+			start = time.perf_counter()
+			for j in range(n):
+				wrapped()
+			best = min(best, (time.perf_counter() - start - plain) / n)
+		return max(best, 0)
+
+	def snapshot(self):
+		"""
+		returns
+			dict of entry point name: (calls, total time)
+		"""
+		return {name: tuple(counter) for name, counter in self.counters.items()}
+
+	def report(self, counters = None):
+		"""
+		counters
+			dict of name: (calls, total time); defaults to the current counters
+		returns
+			report table as string
+		"""
+		if counters == None:
+			counters = self.snapshot()
+		lines = ["%-28s %10s %12s %12s %12s" % ("entry point", "calls", "total", "per call", "overhead")]
+		for name, (calls, total) in sorted(counters.items(), key = lambda item: -item[1][1]):
+			if calls == 0:
+				continue
+			lines.append("%-28s %10d %12s %12s %12s" % (name, calls, timestr(total),
+				timestr(total / calls), timestr(calls * self.overhead)))
+		if len(lines) == 1:
+			lines.append("no calls recorded" + ("" if self.enabled else " (instrumentation is disabled)"))
+		return "\n".join(lines)
+
+	def __repr__(self):
+		return self.report()
+
+class Profile:
+	"""
+	counters of one block of code; see profile()
+	"""
+	def __init__(self, stats):
+		self.stats = stats
+		self.start = stats.snapshot()
+		self.counters = None
+
+	def stop(self):
+		end = self.stats.snapshot()
+		self.counters = {}
+		for name, (calls, total) in end.items():
+			calls0, total0 = self.start.get(name, (0, 0))
+			self.counters[name] = (calls - calls0, total - total0)
+
+	def __repr__(self):
+		if self.counters == None:
+			return "Profile: running"
+		return self.stats.report(self.counters)
+
+class profile:
+	"""
+	context manager that records the counters of a block of code
+
+		with profile() as prof:
+			...
+		print(prof)
+
+	instrumentation is enabled for the block, if it is not enabled already
+	"""
+	def __init__(self, stats = None):
+		if stats == None:
+			stats = STATS
+		self.stats = stats
+
+	def __enter__(self):
+		self.wasenabled = self.stats.enabled
+		self.stats.enable()
+		self.prof = Profile(self.stats)
+		return self.prof
+
+	def __exit__(self, *exc):
+		self.prof.stop()
+		if not self.wasenabled:
+			self.stats.disable()
+		return False
+
+#the global instance, used by System.stats()
+STATS = Stats()
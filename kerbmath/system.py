@@ -1,11 +1,69 @@
 from kerbmath.util import *
 
+class Namespace(dict):
+	"""
+	the attribute dict of a System
+
+	names of bodies that are configured but not yet created are resolved on lookup,
+	so the lazily loaded bodies are available in an interactive session
+	"""
+	def __missing__(self, name):
+		system = dict.get(self, "self")
+		if system == None or not system.globalbodies or name not in system.pending:
+			raise KeyError(name)
+		return system.materialize(name)
+
+class Bodies(dict):
+	"""
+	the bodies dict of a System
+
+	bodies that are configured but not yet created are materialized on first access;
+	iterating the dict materializes all of them
+	"""
+	def __init__(self, system):
+		super().__init__()
+		self.system = system
+
+	def __missing__(self, name):
+		if name not in self.system.pending:
+			raise KeyError(name)
+		return self.system.materialize(name)
+
+	def __contains__(self, name):
+		return dict.__contains__(self, name) or name in self.system.pending
+
+	def get(self, name, default = None):
+		try:
+			return self[name]
+		except KeyError:
+			return default
+
+	def __iter__(self):
+		self.system.materializeall()
+		return dict.__iter__(self)
+
+	def __len__(self):
+		self.system.materializeall()
+		return dict.__len__(self)
+
+	def keys(self):
+		self.system.materializeall()
+		return dict.keys(self)
+
+	def values(self):
+		self.system.materializeall()
+		return dict.values(self)
+
+	def items(self):
+		self.system.materializeall()
+		return dict.items(self)
+
 class System:
 	"""
 	Stores all orbits and bodies e.g. of an interactive session
 	Very well-suited to be used as global namespace for interactive session
 	"""
-	def __init__(self, globalorbits = True, printorbits = True, globalbodies = True, printbodies = True):
+	def __init__(self, globalorbits = True, printorbits = True, globalbodies = True, printbodies = True, ephemspan = None, ephemsteps = 4096):
 		"""
 		globalorbits
 			orbits are not only added to the orbits dict, but to the system itself
@@ -15,9 +73,23 @@ class System:
 			bodies are not only added to the bodies dict, but to the system itself
 		printbodies
 			bodies are printed when added
+		ephemspan
+			(t0, t1) time span (s) of the ephemeris tables of the bodies
+			if None, each table covers one orbital period and is used periodically
+		ephemsteps
+			number of intervals per ephemeris table
 		"""
+		self.__dict__ = Namespace()
 		orbits = {}
-		bodies = {}
+		bodies = Bodies(self)
+		#body name: specification of a configured body that has not been created yet
+		pending = {}
+		#body name: {orbit name: orbit}
+		bodyorbits = {}
+		#prefix: index at which the search for the next free name starts
+		nameindex = {}
+		#delta-v map, built on first use
+		deltav = None
 
 		#create a subclass of Body, which changes only the 'system' member variable
 		from kerbmath.body import Body as SuperBody
@@ -30,6 +102,13 @@ class System:
 
 		self.__dict__.update(locals())
 
+	def __getattr__(self, name):
+		#only called if the attribute does not exist: it may be a body that is not created yet
+		pending = self.__dict__.get("pending")
+		if pending != None and name in pending and self.globalbodies:
+			return self.materialize(name)
+		raise AttributeError(name)
+
 	def freeorbname(self, prefix):
 		"""
 		finds a free name for an orbit
@@ -37,13 +116,16 @@ class System:
 		prefix
 			prefix for the name
 		"""
-		idx = 0
+		#probing starts at the index after the last name that was handed out for this prefix,
+		#so allocating N names costs O(N) instead of O(N^2)
+		idx = self.nameindex.get(prefix, 0)
 		while True:
 			name = str(prefix) + str(idx)
-			if name not in self.orbits and name not in self.__dict__:
+			if name not in self.orbits and name not in self.__dict__ and name not in self.pending:
 				break
 			idx += 1
 
+		self.nameindex[prefix] = idx + 1
 		return name
 
 	def addbody(self, body):
@@ -53,6 +135,9 @@ class System:
 		body
 			the body
 		"""
+		#a body that is created explicitly replaces a configured one of the same name,
+		#which would otherwise replace it in turn when it is materialized
+		self.pending.pop(body.name, None)
 		self.bodies[body.name] = body
 		if self.globalbodies:
 			self.__dict__[body.name] = body
@@ -77,32 +162,228 @@ class System:
 			orb.name = self.freeorbname(prefix)
 
 		self.orbits[orb.name] = orb
+		self.bodyorbits.setdefault(orb.body.name, {})[orb.name] = orb
 		if self.globalorbits:
 			self.__dict__[orb.name] = orb
 
 		if self.printorbits:
 			colprint(repr(orb), 32)
 
+	def addorbs(self, orbs, prefix = "orb"):
+		"""
+		add many orbits to the system at once
+		automatically chooses free names, as addorb
+
+		orbs
+			iterable of orbits
+		prefix
+			a prefix for the auto-generated names
+		"""
+		added = {}
+		for orb in orbs:
+			name = orb.name
+			if name == None or name in self.orbits or name in added:
+				base = prefix if name == None else name
+				name = self.freeorbname(base)
+				while name in added:
+					name = self.freeorbname(base)
+				orb.name = name
+			added[name] = orb
+
+		self.orbits.update(added)
+		for name, orb in added.items():
+			self.bodyorbits.setdefault(orb.body.name, {})[name] = orb
+		if self.globalorbits:
+			self.__dict__.update(added)
+
+		if self.printorbits:
+			for orb in added.values():
+				colprint(repr(orb), 32)
+
+	def orbitsof(self, body):
+		"""
+		body
+			a body, or its name
+		returns
+			list of the orbits around the body (indexed, no scan over all orbits)
+		"""
+		if not isinstance(body, str):
+			body = body.name
+		return list(self.bodyorbits.get(body, {}).values())
+
 	def readconf(self, conffile = "system.conf"):
 		"""
 		(re-)read the system configuration file
 
 		conffile
 			the configuration file path
+			.ini files are declarative (see kerbmath.config): their bodies are
+			created on first access, and the parsed file is cached
+			all other files are executed as python code in the system namespace
+		"""
+		if conffile.endswith(".ini"):
+			from kerbmath.config import compiled
+			specs = compiled(conffile)
+			#configured bodies replace existing ones of the same name
+			for name in specs:
+				if dict.pop(self.bodies, name, None) != None and self.globalbodies:
+					self.__dict__.pop(name, None)
+			self.pending.update(specs)
+		else:
+			exec(open(conffile).read(), self.__dict__)
+			self.buildephemeris()
+
+		if self.deltav != None:
+			self.deltav.update()
+
+	def materialize(self, name):
+		"""
+		create a configured body (and its parents), if it has not been created yet
+
+		name
+			body name
+		returns
+			the body
 		"""
-		exec(open(conffile).read(), self.__dict__)
+		spec = self.pending.pop(name, None)
+		if spec == None:
+			return dict.__getitem__(self.bodies, name)
 
-	def clearorbits(self, filterfun = lambda orb: True):
+		kw = dict(spec)
+		if "parent" in kw:
+			kw["parent"] = self.bodies[kw["parent"]]
+		if "atm" in kw:
+			from kerbmath.config import makeatmosphere
+			kw["atm"] = makeatmosphere(kw["atm"])
+		return self.Body(name, **kw)
+
+	def materializeall(self):
+		"""
+		create all configured bodies that have not been created yet
+		"""
+		while self.pending:
+			self.materialize(next(iter(self.pending)))
+
+	def save(self, dirname, orbits = None):
+		"""
+		save the bodies and orbits as columnar binary catalog (see kerbmath.catalog)
+
+		dirname
+			catalog directory
+		orbits
+			iterable of Orbit and OrbitArray objects; defaults to all orbits
+		returns
+			number of saved orbits
+		"""
+		from kerbmath.catalog import save
+		return save(self, dirname, orbits)
+
+	def load(self, dirname):
+		"""
+		load the bodies of a catalog and memory-map its orbits
+
+		dirname
+			catalog directory
+		returns
+			Catalog; its orbits are built and registered only on request
+		"""
+		from kerbmath.catalog import load
+		return load(self, dirname)
+
+	def buildephemeris(self):
+		"""
+		(re-)build the ephemeris tables of all bodies that have a parent
+		"""
+		for body in self.bodies.values():
+			if body.parent != None:
+				body._cache.pop("ephemeris", None)
+				body.ephemeris()
+
+	def dvmap(self):
+		"""
+		returns
+			the DvMap of all bodies, brought up to date with the bodies
+		"""
+		if self.deltav == None:
+			from kerbmath.dvmap import DvMap
+			self.deltav = DvMap(self)
+		self.deltav.update()
+		return self.deltav
+
+	def route(self, src, dst):
+		"""
+		print the cheapest route between two nodes of the delta-v map
+
+		src
+			start node, such as 'kerbin.surface'
+		dst
+			destination node, such as 'mun.surface'
+		"""
+		print(self.dvmap().routestr(src, dst))
+
+	def stats(self, enable = None):
+		"""
+		call statistics of the hot paths (orbit creation, registration, atmosphere, integrator)
+
+		enable
+			True to instrument the hot paths, False to remove the instrumentation again
+			instrumentation is off by default, and costs nothing while off
+		returns
+			the Stats object; its repr is the report table
+		"""
+		from kerbmath.stats import STATS
+		if enable == True:
+			STATS.enable()
+		elif enable == False:
+			STATS.disable()
+		return STATS
+
+	def profile(self):
+		"""
+		returns
+			a context manager that records the call statistics of a block:
+
+			with profile() as prof:
+				...
+			print(prof)
+		"""
+		from kerbmath.stats import profile
+		return profile()
+
+	def clearorbits(self, filterfun = lambda orb: True, body = None):
 		"""
 		delete orbits
 
 		filterfun
 			orbits are deleted if filterfun(orb) returns True
+			if None, all (selected) orbits are deleted
+		body
+			if given (body or name), only orbits around this body are considered
+		returns
+			number of deleted orbits
 		"""
-		for name in self.orbits:
-			if filterfun == None or filterfun(self.orbits[name]):
-				self.orbits.delete(name)
-				self.__dict__.delete(name)
+		if body == None:
+			candidates = self.orbits
+		else:
+			if not isinstance(body, str):
+				body = body.name
+			candidates = self.bodyorbits.get(body, {})
+
+		if filterfun == None:
+			doomed = list(candidates)
+		else:
+			doomed = [name for name, orb in candidates.items() if filterfun(orb)]
+
+		for name in doomed:
+			orb = self.orbits.pop(name)
+			self.bodyorbits[orb.body.name].pop(name, None)
+			if self.__dict__.get(name) is orb:
+				del self.__dict__[name]
+
+		#freed names may be handed out again
+		self.nameindex.clear()
+
+		return len(doomed)
 
 	def showhelp(self, obj):
 		import inspect
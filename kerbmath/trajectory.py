@@ -0,0 +1,301 @@
+"""
+numerical trajectory simulation
+"""
+import numpy as np
+
+from kerbmath.util import *
+from kerbmath.integrate import DormandPrince, Event
+from kerbmath.vectorarray import norm, rotvvector, gravity
+
+class Trajectory:
+	"""
+	result of a numerical simulation
+	"""
+	def __init__(self, body, times, states, outcome, exitorbit = None, hmin = None, events = None):
+		"""
+		body
+			central body
+		times
+			sample times (s), shape (M,)
+		states
+			sample states (IRF; x, y, z in m, vx, vy, vz in m/s), shape (M, 6)
+		outcome
+			why the simulation stopped ("exited", "crashed" or "timeout")
+		exitorbit
+			the orbit after the simulation, if any
+		hmin
+			minimum height over surface (m); calculated from the states if None
+		events
+			list of (event name, t, state) of the events during the simulation
+		"""
+		self.body = body
+		self.times = times
+		self.states = states
+		self.outcome = outcome
+		self.exitorbit = exitorbit
+		if events == None:
+			events = []
+		self.events = events
+
+		if hmin == None:
+			hmin = float(np.min(self.h()))
+		self.hmin = hmin
+
+	def __repr__(self):
+		rep = "Trajectory: " + self.body.name + ", " + self.outcome
+		rep += " after %.1fs" % (self.times[-1] - self.times[0])
+		rep += ", " + str(len(self.times)) + " steps"
+		rep += ", hmin = " + diststr(self.hmin)
+		if self.exitorbit != None:
+			rep += ", exit: " + repr(self.exitorbit)
+
+		return rep
+
+	def r(self):
+		"""
+		returns
+			distances from center of mass (m)
+		"""
+		return np.linalg.norm(self.states[:, :3], axis = 1)
+
+	def h(self):
+		"""
+		returns
+			heights over surface (m)
+		"""
+		return self.r() - self.body.radius
+
+	def v(self):
+		"""
+		returns
+			velocities (m/s, IRF)
+		"""
+		return np.linalg.norm(self.states[:, 3:], axis = 1)
+
+def dragaccel(mu, radius, rotrate, atm, d):
+	"""
+	mu
+		gravitational parameter of the central body (m^3/s^2)
+	radius
+		radius of the central body (m)
+	rotrate
+		angular velocity of the body's rotation around its z axis (rad/s)
+	atm
+		Atmosphere of the body
+	d
+		drag coefficient, or one per state
+	returns
+		in-place derivative function fun(t, y, out) under gravity and atmospheric drag,
+		for states (x, y, z, vx, vy, vz) of shape (6,) or (N, 6)
+		(see DormandPrince, inplace = True)
+	"""
+	halfd = 0.5 * np.asarray(d, dtype = float)
+	#number of states: (air velocities, distances, air speeds, scratch)
+	buffers = {}
+
+	def fun(t, y, out):
+		if y.ndim == 1:
+			return single(y, out)
+
+		n = len(y)
+		if n not in buffers:
+			buffers[n] = (np.empty((n, 3)), np.empty(n), np.empty(n), np.empty(n))
+		vvdelta, r, vdelta, tmp = buffers[n]
+		vr = y[:, :3]
+		vv = y[:, 3:]
+		accel = out[:, 3:]
+
+		#air velocity is the rotation of the body around its z axis
+		rotvvector(rotrate, vr, out = vvdelta)
+		np.subtract(vv, vvdelta, out = vvdelta)
+		norm(vvdelta, out = vdelta)
+		norm(vr, out = r)
+
+		out[:, :3] = vv
+		gravity(mu, vr, out = accel, norms = r, tmp = tmp)
+
+		#drag acceleration divided by air speed, to scale vvdelta
+		r -= radius
+		adrag = atm.rho(r)
+		adrag *= vdelta
+		adrag *= halfd
+		np.multiply(vvdelta, adrag[:, None], out = vvdelta)
+		np.subtract(accel, vvdelta, out = accel)
+
+	def single(y, out):
+		#one state: plain floats are much cheaper than numpy calls on 3-vectors
+		rx, ry, rz, vx, vy, vz = y.tolist()
+		r = sqrt(rx * rx + ry * ry + rz * rz)
+		dvx = vx + rotrate * ry
+		dvy = vy - rotrate * rx
+		vdelta = sqrt(dvx * dvx + dvy * dvy + vz * vz)
+		g = -mu / (r * r * r)
+		adrag = atm.rho(r - radius) * vdelta * float(halfd)
+		out[:] = (vx, vy, vz, g * rx - adrag * dvx, g * ry - adrag * dvy, g * rz - adrag * vz)
+
+	return fun
+
+def aerobrakeaccel(body, d):
+	"""
+	body
+		central body
+	d
+		drag coefficient
+	returns
+		in-place derivative function fun(t, y, out) for a state (x, y, z, vx, vy, vz)
+		under gravity and atmospheric drag, see dragaccel
+	"""
+	return dragaccel(body.mu(), body.radius, 2 * pi / body.rotperiod, body.atm, d)
+
+def radiusevent(r, direction = 0, terminal = False, name = None):
+	"""
+	returns
+		Event at which the distance from the center of mass crosses r (m)
+	"""
+	def radius(t, y):
+		return sqrt(y[0] * y[0] + y[1] * y[1] + y[2] * y[2]) - r
+	return Event(radius, direction, terminal, name)
+
+def exitevent(body, terminal = True):
+	"""
+	returns
+		Event at which the vessel leaves the atmosphere of body ("exited")
+	"""
+	return radiusevent(body.radius + body.atm.cutoff, 1, terminal, "exited")
+
+def impactevent(body, terminal = True):
+	"""
+	returns
+		Event at which the vessel hits the surface of body ("crashed")
+	"""
+	return radiusevent(body.radius, -1, terminal, "crashed")
+
+def radialvelocity(t, y):
+	#proportional to the radial velocity; crosses zero at the apsides
+	return y[0] * y[3] + y[1] * y[4] + y[2] * y[5]
+
+def periapsisevent(terminal = False):
+	"""
+	returns
+		Event at periapsis passage ("periapsis")
+	"""
+	return Event(radialvelocity, 1, terminal, "periapsis")
+
+def apoapsisevent(terminal = False):
+	"""
+	returns
+		Event at apoapsis passage ("apoapsis")
+	"""
+	return Event(radialvelocity, -1, terminal, "apoapsis")
+
+def aerobrakesteps(orb, d = 0.2, rtol = 1e-9, atol = 1e-6, tmax = 86400, events = (), eventlog = None):
+	"""
+	numerically simulates one atmospheric pass of an orbit, step by step
+
+	orb
+		the orbit; must partially lie within the atmosphere
+	d
+		drag coefficient
+	rtol
+		relative error tolerance per integration step
+	atol
+		absolute error tolerance per integration step
+	tmax
+		maximum simulated time (s)
+	events
+		additional Event objects (of t and the state); terminal ones stop the simulation
+	eventlog
+		list that receives (event name, t, state) for each event that occurs,
+		including periapsis and apoapsis passages
+	yields
+		(t, state) for atmospheric entry, each event and after each integration step;
+		each state is a new array that the caller may keep
+		events are located on the dense output of the integrator, so the
+		simulation ends exactly at the atmosphere exit or impact
+	returns
+		the outcome ("exited", "crashed", "timeout" or the name of a terminal user event),
+		as the value of StopIteration
+	"""
+	body = orb.body
+	entryr = body.atm.cutoff + body.radius
+
+	if orb.rp > entryr:
+		raise Exception("Orbit outside atmosphere")
+	if orb.ra > 0 and orb.ra < entryr:
+		raise Exception("Orbit completely within atmosphere")
+
+	#the simulation starts when the vessel enters the atmosphere (r = entryr)
+	y = np.empty(6)
+	y[:3] = orb.rvector(entryr, inbound = True)
+	y[3:] = orb.vvector(entryr, inbound = True)
+
+	solver = DormandPrince(aerobrakeaccel(body, d), 0, y, rtol = rtol, atol = atol, inplace = True)
+	solver.setevents([exitevent(body), impactevent(body), periapsisevent(), apoapsisevent()] + list(events))
+	#the solver reuses its state buffers, so each yielded state is a copy
+	yield 0, solver.y.copy()
+
+	while True:
+		for event, t, y in solver.advance(tmax):
+			if eventlog != None:
+				eventlog.append((event.name, t, y))
+			yield t, y.copy()
+			if event.terminal:
+				return event.name
+
+		yield solver.t, solver.y.copy()
+		if solver.t >= tmax:
+			return "timeout"
+
+def aerobrake(orb, d = 0.2, rtol = 1e-9, atol = 1e-6, tmax = 86400, sink = None, events = ()):
+	"""
+	numerically simulates one atmospheric pass of an orbit
+
+	orb, d, rtol, atol, tmax, events
+		see aerobrakesteps
+	sink
+		Sink that receives the samples; the entry and exit samples are always stored
+		if None, all samples are kept in memory
+	returns
+		Trajectory, starting at atmospheric entry
+		its times and states are those kept by the sink, if it keeps any
+	"""
+	from kerbmath.sink import ListSink
+
+	body = orb.body
+	if sink == None:
+		sink = ListSink()
+
+	eventlog = []
+	steps = aerobrakesteps(orb, d, rtol, atol, tmax, events, eventlog)
+	entry = last = None
+	hmin = inf
+	while True:
+		try:
+			t, y = next(steps)
+		except StopIteration as stop:
+			outcome = stop.value
+			break
+		#each sample is pushed only once the next one exists, so the last one can be forced
+		if last != None:
+			sink.push(*last)
+		else:
+			entry = t, y
+		last = t, y
+		hmin = min(hmin, sqrt(y[:3].dot(y[:3])) - body.radius)
+
+	sink.push(*last, force = True)
+	sink.close()
+
+	if hasattr(sink, "states"):
+		times = sink.times()
+		states = sink.states()
+	else:
+		times = np.array((entry[0], last[0]))
+		states = np.array((entry[1], last[1]))
+
+	exitorbit = None
+	if outcome == "exited":
+		from kerbmath.orbit import Orbit
+		exitorbit = Orbit.fromstate(body, last[1][:3], last[1][3:])
+
+	return Trajectory(body, times, states, outcome, exitorbit, hmin, eventlog)
@@ -89,6 +89,28 @@ class Container:
 		else:
 			return [name for name in names if name in self._vals]
 
+def cached(fun):
+	"""
+	decorator for methods without arguments, which memoizes their result
+	in the dict returned by self.cache()
+
+	the class is responsible for clearing that dict when the attributes
+	that the result depends on are changed (see Body and Orbit)
+	"""
+	name = fun.__name__
+
+	def wrapper(self):
+		cache = self.cache()
+		try:
+			return cache[name]
+		except KeyError:
+			result = cache[name] = fun(self)
+			return result
+
+	wrapper.__name__ = name
+	wrapper.__doc__ = fun.__doc__
+	return wrapper
+
 def colprint(msg, col):
 	"""
 	print colored text
@@ -172,6 +194,24 @@ def velstr(vel):
 	else:
 		return "%.0fkm/s" % (vel / 1e3)
 
+def timestr(t):
+	"""
+	convert a duration to a string
+
+	t
+		duration (s)
+	returns
+		the string
+	"""
+	if t < 1e-6:
+		return "%.1fns" % (t / 1e-9)
+	elif t < 1e-3:
+		return "%.2fµs" % (t / 1e-6)
+	elif t < 1:
+		return "%.2fms" % (t / 1e-3)
+	else:
+		return "%.3fs" % t
+
 def interact(globs, banner = None):
 	"""
 	launch an interactive python console
@@ -199,10 +239,15 @@ def interact(globs, banner = None):
 
 	globs["printdocstrings"] = printdocstrings
 
-	#activate tab completion
-	import rlcompleter, readline, code
+	#activate tab completion; the completer is only imported on the first tab
+	import readline, code
+	def complete(text, state):
+		import rlcompleter
+		completer = rlcompleter.Completer(globs).complete
+		readline.set_completer(completer)
+		return completer(text, state)
 	readline.parse_and_bind("tab: complete")
-	readline.set_completer(rlcompleter.Completer(globs).complete)
+	readline.set_completer(complete)
 
 	class HelpfulInteractiveConsole(code.InteractiveConsole):
 		""""
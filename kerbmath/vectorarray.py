@@ -0,0 +1,127 @@
+"""
+batched 3-dimensional vectors
+
+numpy counterpart of kerbmath.vector: vectors are arrays whose last axis has
+length 3, usually (N, 3) for N vectors. all functions take an optional out
+array (which may be one of the inputs), so hot loops can run on preallocated
+buffers without allocating per call.
+
+the tuple functions of kerbmath.vector remain for interactive use.
+"""
+import numpy as np
+
+def asvectors(vec):
+	"""
+	vec
+		one vector (tuple or array) or a sequence of vectors
+	returns
+		float array of shape (N, 3)
+	"""
+	return np.array(vec, dtype = float, ndmin = 2)
+
+#numpy >= 2 has a ufunc for scalar products, which is cheaper to call than einsum
+VECDOT = getattr(np, "vecdot", None)
+
+def dot(vec0, vec1, out = None):
+	"""
+	returns
+		the scalar products of corresponding vectors, shape (N,)
+	"""
+	if VECDOT != None:
+		return VECDOT(vec0, vec1, out = out)
+	return np.einsum("...i,...i->...", vec0, vec1, out = out)
+
+def norm(vec, out = None):
+	"""
+	returns
+		|vec| of each vector, shape (N,)
+	"""
+	out = dot(vec, vec, out)
+	return np.sqrt(out, out = out)
+
+def normalize(vec, scale = 1, out = None, norms = None):
+	"""
+	fused normalize-and-scale: vec * scale / |vec|
+
+	vec
+		vectors (N, 3)
+	scale
+		the lengths of the results: number or shape (N,)
+	out
+		result array (N, 3); may be vec
+	norms
+		buffer (N,) for the lengths; receives scale / |vec|
+	returns
+		out
+	"""
+	norms = norm(vec, norms)
+	np.divide(scale, norms, out = norms)
+	return np.multiply(vec, norms[..., None], out = out)
+
+def axpy(alpha, x, y, tmp = None):
+	"""
+	in-place update y += alpha * x
+
+	alpha
+		number, or factors of shape (N,) for each vector
+	x
+		vectors (N, 3)
+	y
+		vectors (N, 3), updated in place
+	tmp
+		buffer (N, 3) for alpha * x
+	returns
+		y
+	"""
+	if np.ndim(alpha) > 0:
+		alpha = np.asarray(alpha)[..., None]
+	tmp = np.multiply(x, alpha, out = tmp)
+	y += tmp
+	return y
+
+def rotvvector(rate, rvector, out = None):
+	"""
+	velocities of the points rvector on a body that rotates around the z axis
+
+	rate
+		angular velocity (rad/s), positive for prograde rotation
+	rvector
+		positions (N, 3)
+	out
+		result array (N, 3); must not be rvector
+	returns
+		rate x rvector
+	"""
+	if out is None:
+		out = np.empty_like(rvector, dtype = float)
+	np.multiply(rvector[..., 1], -rate, out = out[..., 0])
+	np.multiply(rvector[..., 0], rate, out = out[..., 1])
+	out[..., 2] = 0
+	return out
+
+def gravity(mu, rvector, out = None, norms = None, tmp = None):
+	"""
+	gravitational accelerations at positions relative to a point mass
+
+	mu
+		gravitational parameter of the mass (m^3/s^2)
+	rvector
+		positions (N, 3)
+	out
+		result array (N, 3); may be rvector
+	norms
+		|rvector| (N,), if known already; it is not modified
+	tmp
+		buffer (N,)
+	returns
+		-mu * rvector / |rvector|^3
+	"""
+	#tmp = -mu / r^3
+	if norms is None:
+		tmp = norm(rvector, tmp)
+		np.power(tmp, 3, out = tmp)
+	else:
+		tmp = np.multiply(norms, norms, out = tmp)
+		tmp *= norms
+	np.divide(-mu, tmp, out = tmp)
+	return np.multiply(rvector, tmp[..., None], out = out)
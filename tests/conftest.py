@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(scope = "session")
+def system():
+	"""
+	the kerbol system, without printing or global names
+	"""
+	from kerbmath.system import System
+	system = System(globalorbits = False, printorbits = False, printbodies = False)
+	system.readconf(os.path.join(ROOT, "kerbol.ini"))
+	return system
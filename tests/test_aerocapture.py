@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from kerbmath.aerocapture import aerocapture, summary, CAPTURED, ESCAPED, CRASHED
+
+def test_outcomes(system):
+	result = aerocapture(system.kerbin, [20, 30, 60, 60], [3000, 3000, 3000, 8000], workers = 0)
+	assert list(result["outcome"]) == [CRASHED, CRASHED, CAPTURED, ESCAPED]
+	assert summary(result) == {"captured": 1, "escaped": 1, "crashed": 2, "timeout": 0}
+
+def test_hmin_and_crossings(system):
+	kerbin = system.kerbin
+	result = aerocapture(kerbin, [30, 60], 3000, workers = 0)
+	crashed, captured = result
+	assert crashed["hmin"] == 0
+	#drag lowers the periapsis below that of the incoming orbit
+	assert 0 < captured["hmin"] < 60e3
+	assert captured["exitra"] > kerbin.radius + kerbin.atm.cutoff
+	assert np.isnan(crashed["exitra"])
+
+def test_independent_of_chunk(system):
+	hp = np.linspace(20, 60, 41)
+	batch = aerocapture(system.kerbin, hp, 3000, workers = 0)
+	single = aerocapture(system.kerbin, hp[25:26], 3000, workers = 0)
+	assert single["t"][0] == pytest.approx(batch["t"][25], abs = 1e-3)
+	assert single["hmin"][0] == pytest.approx(batch["hmin"][25], abs = 1)
+
+def test_rejects_missing_entry_state(system):
+	with pytest.raises(Exception, match = "within atmosphere"):
+		aerocapture(system.kerbin, 30, 500, workers = 0)
+	with pytest.raises(Exception, match = "periapses"):
+		aerocapture(system.kerbin, 80, 3000, workers = 0)
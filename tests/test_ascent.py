@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from kerbmath.ascent import ascent, summary, cheapest, OUTCOMES, ORBIT, FUEL
+
+def test_kerbin(system):
+	orbits, result = ascent(system.kerbin, [1, 8, 0.1], [45, 42, 3], workers = 0)
+	assert [OUTCOMES[o] for o in result["outcome"]] == ["fuel", "orbit", "fuel"]
+	assert summary(result) == {"orbit": 1, "suborbital": 0, "fuel": 2, "crashed": 0, "timeout": 0}
+	assert len(orbits) == 1
+	assert orbits.rp[0] < system.kerbin.minorbitr() <= orbits.ra[0]
+
+	best = cheapest(result)
+	assert best["turnstart"] == 8
+	assert best["total"] == pytest.approx(4525, rel = 1e-3)
+	assert best["total"] == pytest.approx(best["dv"] + best["circdv"])
+	assert isinstance(float(best["t"]), float) and 0 < best["t"] < 3600
+
+def test_pooled(system):
+	#step size control is shared within a chunk, so both runs use the same chunks
+	orbits, result = ascent(system.kerbin, [1, 8, 0.1], [45, 42, 3], workers = 0, chunksize = 1)
+	pooledorbits, pooled = ascent(system.kerbin, [1, 8, 0.1], [45, 42, 3], workers = 2, chunksize = 1)
+	for name in result.dtype.names:
+		assert np.array_equal(pooled[name], result[name], equal_nan = True)
+	assert np.array_equal(pooledorbits.ra, orbits.ra)
+
+def test_mun(system):
+	orbits, result = ascent(system.mun, 2, 10, thrust = 60e3, workers = 0)
+	assert result["outcome"][0] == ORBIT
+	assert cheapest(result)["total"] == pytest.approx(761.6, rel = 1e-3)
+
+def test_validation(system):
+	with pytest.raises(Exception):
+		ascent(system.kerbin, 1, 45, m0 = 4e3, mdry = 5e3, workers = 0)
+	orbits, result = ascent(system.kerbin, 1, 45, m0 = 4.1e3, workers = 0)
+	assert cheapest(result) == None
+	assert result["outcome"][0] == FUEL
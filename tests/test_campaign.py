@@ -0,0 +1,22 @@
+import pytest
+
+from kerbmath.orbit import Orbit
+
+def test_reaches_target(system):
+	kerbin = system.kerbin
+	orb = Orbit.fromapsides(kerbin, kerbin.radius + 55e3, 12e6, register = False)
+	campaign = orb.aerobrakecampaign(ratarget = 3e6)
+	assert campaign.outcome == "target"
+	assert campaign.finalorbit.ra <= 3e6
+	assert campaign.finalorbit is campaign.passes[-1].after
+	#each pass lowers the apoapsis
+	assert all(p.dra() < 0 for p in campaign.passes)
+
+def test_no_exit(system):
+	kerbin = system.kerbin
+	orb = Orbit.fromapsides(kerbin, kerbin.radius + 20e3, 12e6, register = False)
+	campaign = orb.aerobrakecampaign()
+	assert campaign.outcome == "crashed"
+	assert len(campaign) == 1
+	assert campaign.finalorbit == None
+	assert "crashed" in repr(campaign)
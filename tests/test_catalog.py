@@ -0,0 +1,38 @@
+import numpy as np
+
+from kerbmath.orbit import Orbit
+from kerbmath.orbitarray import OrbitArray
+from kerbmath.system import System
+
+def makecatalog(system, tmp_path):
+	kerbin = system.kerbin
+	named = Orbit.fromapsides(kerbin, 700e3, 900e3, name = "foo", register = False)
+	unnamed = Orbit.fromapsides(system.mun, 300e3, 900e3, register = False)
+	batch = OrbitArray(kerbin, np.linspace(700e3, 800e3, 5), 2e6, 0, 0)
+	assert system.save(str(tmp_path), [named, unnamed, batch]) == 7
+
+	loaded = System(globalorbits = False, printorbits = False, printbodies = False)
+	return loaded, loaded.load(str(tmp_path))
+
+def test_roundtrip(system, tmp_path):
+	loaded, catalog = makecatalog(system, tmp_path)
+	assert len(catalog) == 7
+	assert catalog["foo"].rp == 700e3
+	assert "" not in catalog
+	assert loaded.kerbin is catalog.bodies[[body.name for body in catalog.bodies].index("kerbin")]
+	assert len(catalog.select(body = "kerbin")) == 6
+	assert sorted(catalog.array("kerbin", lambda c: c["ra"] > 1e6).rp) == list(np.linspace(700e3, 800e3, 5))
+
+def test_lazy_columns(system, tmp_path):
+	loaded, catalog = makecatalog(system, tmp_path)
+	catalog.select(mask = lambda c: c["ra"] > 1e6)
+	assert sorted(catalog.columns) == ["body", "ra"]
+
+def test_register_twice(system, tmp_path):
+	loaded, catalog = makecatalog(system, tmp_path)
+	first = catalog.register()
+	names = [orb.name for orb in first]
+	second = catalog.register()
+	assert [orb.name for orb in second] == names
+	assert len(loaded.orbits) == 7
+	assert all(loaded.orbits[orb.name] is orb for orb in second)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from kerbmath.elements import stateelements, elementstate, wrap360
+
+MU = 3.5316e12
+
+def test_roundtrip():
+	rp = np.array([700e3, 700e3, 800e3, 700e3])
+	ra = np.array([700e3, 2e6, 5e6, -3e6])
+	incl = np.array([0, 30, 90, 150])
+	omega = np.array([0, 45, 200, 300])
+	theta = np.array([10, 120, 250, 20])
+	vr, vv = elementstate(MU, rp, ra, incl, omega, theta)
+	rp2, ra2, incl2, omega2, e, node, theta2 = stateelements(MU, vr, vv, full = True)
+	assert rp2 == pytest.approx(rp, rel = 1e-9)
+	assert ra2 == pytest.approx(ra, rel = 1e-9)
+	assert incl2 == pytest.approx(incl, abs = 1e-9)
+	assert omega2[1:] == pytest.approx(omega[1:], abs = 1e-6)
+	assert theta2[1:] == pytest.approx(theta[1:], abs = 1e-6)
+	#the ascending node lies on the x axis
+	assert np.all((0 <= node) & (node < 360))
+	assert np.minimum(node, 360 - node)[1:] == pytest.approx(0, abs = 1e-6)
+
+def test_angles_below_360():
+	assert wrap360(np.array(-1e-15)) == 0
+	assert wrap360(np.array(-90.0)) == 270
+	#a node just below the x axis gives a tiny negative angle
+	vr = np.array([7e5, -1e-12, 0])
+	vv = np.array([0, 2000, 3000.0])
+	rp, ra, incl, omega, e, node, theta = stateelements(MU, vr, vv, full = True)
+	for angle in (omega, node, theta):
+		assert 0 <= angle < 360
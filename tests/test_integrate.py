@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from kerbmath.integrate import DormandPrince, Event, hermite, crossings
+
+def oscillator(t, y):
+	return np.array((y[1], -y[0]))
+
+def test_accuracy():
+	solver = DormandPrince(oscillator, 0, (0, 1), rtol = 1e-10, atol = 1e-12)
+	while solver.t < 10:
+		solver.step(10)
+	assert solver.t == 10
+	assert solver.y == pytest.approx((np.sin(10), np.cos(10)), abs = 1e-8)
+
+def test_inplace_batch():
+	def fun(t, y, out):
+		out[:, 0] = y[:, 1]
+		out[:, 1] = -y[:, 0]
+	y0 = np.array(((0, 1), (1, 0), (0, 2)), dtype = float)
+	solver = DormandPrince(fun, 0, y0, rtol = 1e-10, atol = 1e-12, inplace = True)
+	while solver.t < 3:
+		solver.step(3)
+	expected = np.array(((np.sin(3), np.cos(3)), (np.cos(3), -np.sin(3)), (2 * np.sin(3), 2 * np.cos(3))))
+	assert solver.y == pytest.approx(expected, abs = 1e-8)
+
+def test_dense_and_events():
+	solver = DormandPrince(oscillator, 0, (0, 1), rtol = 1e-10, atol = 1e-12)
+	solver.setevents([Event(lambda t, y: y[0], direction = -1, terminal = True, name = "down")])
+	occurrences = []
+	while solver.terminated == None:
+		occurrences += solver.advance(10)
+		tmid = 0.5 * (solver.told + solver.t)
+		assert solver.dense(tmid)[0] == pytest.approx(np.sin(tmid), abs = 1e-8)
+	(event, t, y), = occurrences
+	assert event.name == "down"
+	assert t == pytest.approx(np.pi, abs = 1e-9)
+	assert solver.t == t
+	with pytest.raises(Exception):
+		solver.advance(10)
+
+def test_hermite_crossings():
+	y0 = np.array(((0.0, 1.0),))
+	f0 = np.array(((1.0, 0.0),))
+	y1 = np.array(((np.sin(0.5), np.cos(0.5)),))
+	f1 = np.array(((np.cos(0.5), -np.sin(0.5)),))
+	interp = hermite(y0, f0, y1, f1, 0.5)
+	#error bound of cubic Hermite interpolation: h^4 / 384 * max|y^(4)|
+	assert interp(np.array((0.5,)))[0] == pytest.approx((np.sin(0.25), np.cos(0.25)), abs = 0.5 ** 4 / 384)
+
+	roots = crossings(lambda x: x * x - np.array((2.0, 3.0)), np.zeros(2), np.full(2, 2.0))
+	assert roots == pytest.approx(np.sqrt((2, 3)), abs = 1e-10)
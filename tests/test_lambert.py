@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from kerbmath.lambert import lambert, porkchop
+from kerbmath.propagate import propagatestate
+
+MU = 3.5316e12
+
+def test_reaches_target():
+	r1 = np.array(((1e6, 0, 0), (1e6, 0, 0), (0, 2e6, 0)))
+	r2 = np.array(((0, 2e6, 0), (-1.5e6, 5e5, 1e5), (-3e6, 0, 0)))
+	tof = np.array((1500.0, 3000.0, 4000.0))
+	v1, v2 = lambert(MU, r1, r2, tof)
+	for i in range(3):
+		r, v = propagatestate(MU, r1[i], v1[i], tof[i])
+		assert r == pytest.approx(r2[i], rel = 1e-7, abs = 1e-3)
+		assert v == pytest.approx(v2[i], rel = 1e-6, abs = 1e-6)
+
+def test_porkchop(system):
+	result = porkchop(system.mun, system.minmus, np.linspace(0, 2e5, 8), np.linspace(2e4, 1e5, 8), workers = 0)
+	dep, tof, dv = result.best()
+	assert result.dv.shape == (8, 8)
+	assert np.nanmin(result.dv) == dv
+	assert dep in result.departures and tof in result.tofs
+	assert np.all(result.c3 >= 0)
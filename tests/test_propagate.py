@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from kerbmath.elements import elementstate, stateelements
+from kerbmath.propagate import propagate, propagatestate
+
+MU = 3.5316e12
+
+def test_full_period():
+	rp = np.array([700e3, 700e3])
+	ra = np.array([700e3, 5e6])
+	a = (rp + ra) / 2
+	period = 2 * np.pi * np.sqrt(a ** 3 / MU)
+	r0, v0 = propagate(MU, rp, ra, 20, 30, 0)
+	for i in range(2):
+		r, v = propagate(MU, rp[i], ra[i], 20, 30, [period[i]])
+		assert r[0, 0] == pytest.approx(r0[i, 0], abs = 1e-3)
+		assert v[0, 0] == pytest.approx(v0[i, 0], abs = 1e-6)
+
+def test_conserves_elements():
+	rp, ra = 700e3, 3e6
+	r, v = propagate(MU, rp, ra, 45, 60, np.linspace(0, 20000, 7))
+	rp2, ra2, incl, omega = stateelements(MU, r[0], v[0])
+	assert rp2 == pytest.approx(rp, rel = 1e-9)
+	assert ra2 == pytest.approx(ra, rel = 1e-9)
+	assert incl == pytest.approx(45, abs = 1e-9)
+
+@pytest.mark.parametrize("ra", [5e6, 1e9, -2e6])
+def test_universal_matches_elements(ra):
+	#elliptic, nearly parabolic and hyperbolic orbits, from periapsis
+	r0, v0 = elementstate(MU, 700e3, ra, 10, 0, 0)
+	dt = np.array([100.0, 1000.0])
+	r, v = propagatestate(MU, r0, v0, dt)
+	expected, vexpected = propagate(MU, 700e3, ra, 10, 0, dt)
+	assert r == pytest.approx(expected[0], rel = 1e-7)
+	assert v == pytest.approx(vexpected[0], rel = 1e-7)
@@ -0,0 +1,58 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from conftest import ROOT
+from kerbmath.orbit import Orbit
+from kerbmath.serve import Server, call
+
+@pytest.fixture(scope = "module")
+def url(system):
+	"""
+	a server on a free localhost port, with one worker process
+	"""
+	loop = asyncio.new_event_loop()
+	thread = threading.Thread(target = loop.run_forever, daemon = True)
+	thread.start()
+	server = Server(system, os.path.join(ROOT, "kerbol.ini"), workers = 1)
+	port = asyncio.run_coroutine_threadsafe(server.start("127.0.0.1", 0), loop).result(30)
+	yield "http://127.0.0.1:" + str(port) + "/"
+	asyncio.run_coroutine_threadsafe(server.stop(), loop).result(30)
+	loop.call_soon_threadsafe(loop.stop)
+	thread.join(10)
+
+def test_batched(system, url):
+	kerbin = system.kerbin
+	orb = Orbit.fromapsides(kerbin, 700e3, 2e6, register = False)
+	assert call(url, "orbit.circ", {"body": "kerbin", "rp": 700e3, "ra": 2e6}) == pytest.approx(orb.circ())
+
+	#concurrent requests are coalesced into one vectorized call
+	ras = [1e6 + 1e5 * i for i in range(8)]
+	with ThreadPoolExecutor(8) as pool:
+		results = list(pool.map(lambda ra: call(url, "orbit.vp", {"body": "kerbin", "rp": 700e3, "ra": ra}), ras))
+	for ra, vp in zip(ras, results):
+		assert vp == pytest.approx(Orbit.fromapsides(kerbin, 700e3, ra, register = False).vp())
+
+	#lists of parameters are answered with lists
+	assert len(call(url, "orbit.va", {"body": "kerbin", "rp": [700e3, 710e3], "ra": 2e6})) == 2
+
+def test_pooled(system, url):
+	kerbin = system.kerbin
+	result = call(url, "aerobrake", {"body": "kerbin", "rp": kerbin.radius + 45e3, "ra": 12e6})
+	assert result["outcome"] == "exited"
+	assert result["exitra"] < 12e6
+	#the pass lasts minutes, not one integration step
+	assert result["duration"] > 60
+
+def test_method_not_found(url):
+	with pytest.raises(Exception, match = "Method not found"):
+		call(url, "nosuchmethod")
+
+def test_metrics(url):
+	call(url, "orbit.e", {"body": "kerbin", "rp": 700e3, "ra": 2e6})
+	metrics = call(url, "metrics")
+	assert metrics["methods"]["orbit.e"]["requests"] >= 1
+	assert metrics["batches"] >= 1
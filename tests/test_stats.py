@@ -0,0 +1,30 @@
+import pickle
+
+import numpy as np
+
+from kerbmath.aerocapture import aerocapture
+
+def test_pooled_run_with_stats(system):
+	hp = np.linspace(30, 60, 10)
+	plain = aerocapture(system.kerbin, hp, 3300, chunksize = 5, workers = 2)
+	stats = system.stats(True)
+	try:
+		import kerbmath.aerocapture
+		#the instrumented worker function is still sent to the workers by reference
+		assert pickle.loads(pickle.dumps(kerbmath.aerocapture.simulatechunk)) is kerbmath.aerocapture.simulatechunk
+		instrumented = aerocapture(system.kerbin, hp, 3300, chunksize = 5, workers = 2)
+	finally:
+		system.stats(False)
+	assert np.array_equal(plain["outcome"], instrumented["outcome"])
+	assert np.allclose(plain["t"], instrumented["t"])
+	assert "aerocapture.simulatechunk" in stats.counters
+
+def test_counts_in_process(system):
+	from kerbmath.orbit import Orbit
+	stats = system.stats(True)
+	try:
+		stats.reset()
+		Orbit.fromapsides(system.kerbin, 700e3, 900e3, register = False)
+		assert stats.counters["Orbit.fromapsides"][0] == 1
+	finally:
+		system.stats(False)